@@ -1,19 +1,44 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
+from flask import Flask, Response, g, request, jsonify, render_template, redirect, url_for, session
 import mysql.connector
 import os
 import re
+from contextlib import contextmanager
 from werkzeug.utils import secure_filename
-from groq import Groq
 from dotenv import load_dotenv
 import pandas as pd
 import traceback
+import uuid
 import logging
+import tracing
+from db_pool import PoolRegistry
+from metrics import COUNT_BUCKETS, Registry
+from streaming import (STREAM_FORMATS, EncodedBatches, collect_snapshot, snapshot_frames, stream_cursor,
+                       stream_snapshot, rows_response)
+from columnar import (RESULT_FORMATS, ColumnarBatches, ColumnarEncoder, arrow_available, arrow_response,
+                      columnar_response)
+from schema_loader import SchemaCache, is_ddl
+from nl_cache import NLQueryCache
+from result_cache import QueryResultCache, dependent_tables, is_cacheable, is_read_only, referenced_tables
+from sql_validator import format_issues, validate_sql
+from query_guard import QueryRejected, add_row_limit, add_time_limit, check_estimate, is_select, plan_estimate
+from schema_retrieval import select_tables
+from prompt_budget import PromptStats, compact_row, compact_table, count_tokens, fit_to_budget, summarize_table
+from sql_import import SqlStatementReader, import_dump, ImportCancelled
+from coercion import TableCoercer, get_coercer
+from bulk_load import LOAD_METHODS, BulkLoadError, LoadCancelled, file_format, load_file
+from jobs import JobManager, JobCancelled, SUCCEEDED, FINISHED
+from query_registry import (FETCHING, LLM, PREPARING, QUERY_INTERRUPTED, STREAMING, QueryCancelled,
+                            QueryRegistry, parse_deadlines)
+from llm_gateway import LLMGateway, GroqBackend, StubBackend, LLMUnavailable
+from sql_builder import (build_update, group_statements, encode_cursor, decode_cursor,
+                         build_keyset_select, build_offset_select, build_delete_in, build_delete_match)
 
 load_dotenv()
-groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'Uploads'
+# Created on import so it also exists when served by gunicorn (see gunicorn.conf.py).
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'supersecretkey')  # Load from env
 
@@ -24,87 +49,224 @@ db_config = {
     'user': os.getenv('DB_USER', 'root'),
     'password': os.getenv('DB_PASSWORD', ''),
 }
+# DB_USE_PURE=1 selects mysql.connector's pure-Python protocol, whose socket
+# waits yield under gevent; otherwise the C extension is used when installed.
+if os.getenv('DB_USE_PURE'):
+    db_config['use_pure'] = os.getenv('DB_USE_PURE') == '1'
+
+# Connection pool configuration (one pool per database)
+pool_config = {
+    'size': int(os.getenv('DB_POOL_SIZE', 10)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    'idle_timeout': float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300)),
+    'ping_after': float(os.getenv('DB_POOL_PING_AFTER', 30)),
+}
+db_pools = PoolRegistry(db_config, **pool_config)
+
+# Table editor paging
+TABLE_PAGE_SIZE = int(os.getenv('TABLE_PAGE_SIZE', 200))
+TABLE_PAGE_MAX = int(os.getenv('TABLE_PAGE_MAX', 1000))
+
+# Keys per DELETE ... IN (...) statement for bulk deletes
+DELETE_CHUNK_SIZE = int(os.getenv('DELETE_CHUNK_SIZE', 500))
+
+# Rows fetched per round trip when streaming results
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+
+# Columnar / Arrow responses (format=columnar|arrow) at least this large are
+# gzip- or brotli-compressed for clients that accept it; 0 disables it.
+RESULT_COMPRESS_MIN_BYTES = int(os.getenv('RESULT_COMPRESS_MIN_BYTES', 1024))
+
+# Every SELECT run from the query box gets a MAX_EXECUTION_TIME hint of
+# QUERY_TIMEOUT_MS, and its output stops after QUERY_MAX_ROWS rows or
+# QUERY_MAX_BYTES of row JSON. LLM-generated SELECTs also get a LIMIT when they
+# have none and are checked with EXPLAIN first: above GUARD_MAX_EST_ROWS
+# estimated rows or a cost of GUARD_MAX_COST (0 = no limit) they are rejected
+# (GUARD_MODE=reject) or run with a warning (warn); GUARD_MODE=off skips EXPLAIN.
+QUERY_TIMEOUT_MS = int(os.getenv('QUERY_TIMEOUT_MS', 30000))
+QUERY_MAX_ROWS = int(os.getenv('QUERY_MAX_ROWS', 50000))
+QUERY_MAX_BYTES = int(os.getenv('QUERY_MAX_BYTES', 32 * 1024 * 1024))
+GUARD_MODE = os.getenv('GUARD_MODE', 'reject')
+GUARD_MAX_EST_ROWS = int(os.getenv('GUARD_MAX_EST_ROWS', 5000000))
+GUARD_MAX_COST = float(os.getenv('GUARD_MAX_COST', 0))
+
+# Queries are checked against the cached schema before they run (needs
+# sqlglot); unknown tables/columns go straight to the LLM correction.
+SQL_VALIDATION = os.getenv('SQL_VALIDATION', '1') != '0'
+
+# "Show everything" snapshots: tables are read by SNAPSHOT_WORKERS threads
+# (at most half the pool) and each table is capped at SNAPSHOT_MAX_ROWS rows.
+SNAPSHOT_WORKERS = int(os.getenv('SNAPSHOT_WORKERS', 4))
+SNAPSHOT_MAX_ROWS = int(os.getenv('SNAPSHOT_MAX_ROWS', 1000))
+
+# Schema context for natural-language prompts: databases with more than
+# SCHEMA_PRUNE_MIN_TABLES tables only send the SCHEMA_TOP_K most relevant tables
+# (plus their foreign-key neighbours) within SCHEMA_TOKEN_BUDGET tokens.
+SCHEMA_TOP_K = int(os.getenv('SCHEMA_TOP_K', 8))
+SCHEMA_TOKEN_BUDGET = int(os.getenv('SCHEMA_TOKEN_BUDGET', 6000))
+SCHEMA_PRUNE_MIN_TABLES = int(os.getenv('SCHEMA_PRUNE_MIN_TABLES', 12))
+
+# SQL dump imports: consecutive INSERTs are merged into multi-row statements of
+# at most IMPORT_BATCH_BYTES and work is committed every IMPORT_COMMIT_EVERY
+# source statements.
+IMPORT_BATCH_BYTES = int(os.getenv('IMPORT_BATCH_BYTES', 1024 * 1024))
+IMPORT_COMMIT_EVERY = int(os.getenv('IMPORT_COMMIT_EVERY', 5000))
+
+# CSV / Parquet bulk loads: rows per chunk (one commit each) and how rows are
+# sent: LOAD DATA LOCAL INFILE, executemany INSERTs, or "auto" to try the former.
+BULK_CHUNK_ROWS = int(os.getenv('BULK_CHUNK_ROWS', 10000))
+BULK_LOAD_METHOD = os.getenv('BULK_LOAD_METHOD', 'auto')
+
+# Uploads are imported by background workers; the browser polls /api/jobs/<id>.
+jobs = JobManager(max_workers=int(os.getenv('IMPORT_WORKERS', 2)))
+
+# Queries run from the query box and the table editor are listed at
+# /api/queries and can be cancelled with KILL QUERY. QUERY_DEADLINES sets
+# optional per-route deadlines in milliseconds, counted from the start of the
+# request, e.g. "/api/query=60000,/api/table/<table_name>=15000"; queries
+# still running past theirs are cancelled.
+QUERY_DEADLINES = parse_deadlines(os.getenv('QUERY_DEADLINES', ''))
+
+# Each browser session only sees and cancels its own queries and jobs.
+# SHOW_ALL_SESSIONS=1 lets /api/queries?all=1 and /api/jobs?all=1 list
+# everyone's, for an operator watching a shared install.
+SHOW_ALL_SESSIONS = os.getenv('SHOW_ALL_SESSIONS', '0') == '1'
+
+def kill_query(connection_id):
+    # On a connection of its own: the pool may be exhausted by the very
+    # queries being cancelled.
+    conn = mysql.connector.connect(**db_config, connection_timeout=5)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"KILL QUERY {int(connection_id)}")
+        cursor.close()
+    finally:
+        conn.close()
+
+running_queries = QueryRegistry(kill_query, QUERY_DEADLINES)
+
+# LLM access: every completion goes through one gateway that bounds
+# concurrency, retries transient upstream failures and coalesces identical
+# in-flight prompts. LLM_BASE_URL points the Groq client at a compatible
+# server; LLM_BACKEND=stub answers locally without any network call.
+LLM_MODEL = os.getenv('LLM_MODEL', 'llama3-70b-8192')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 30))
+if os.getenv('LLM_BACKEND', 'groq') == 'stub':
+    llm_backend = StubBackend()
+else:
+    llm_backend = GroqBackend(os.getenv('GROQ_API_KEY'), LLM_MODEL, base_url=os.getenv('LLM_BASE_URL'), timeout=LLM_TIMEOUT)
+llm = LLMGateway(
+    llm_backend,
+    timeout=LLM_TIMEOUT,
+    max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 4)),
+    max_retries=int(os.getenv('LLM_MAX_RETRIES', 3)),
+    backoff=float(os.getenv('LLM_RETRY_BACKOFF', 0.5)),
+)
+
+# Prompt sizes are counted with tiktoken's cl100k_base when it is available
+# (a close estimate otherwise) and logged per request. Schema text is trimmed,
+# or cut down to column names, so a prompt leaves LLM_RESPONSE_TOKENS of the
+# model's LLM_CONTEXT_TOKENS window free for the answer.
+LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', 8192))
+LLM_RESPONSE_TOKENS = int(os.getenv('LLM_RESPONSE_TOKENS', 1024))
+prompt_stats = PromptStats(LLM_CONTEXT_TOKENS)
+
+# Request tracing: each request's time is split into phases (connect, schema,
+# llm, execute, fetch, serialize), sent back in a Server-Timing header, logged
+# with the request (at WARNING from SLOW_REQUEST_MS) and aggregated per route
+# at GET /metrics in the Prometheus text format.
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 2000))
+metrics = Registry()
+request_count = metrics.counter('sql_assistant_requests_total', 'HTTP requests by route, method and status.',
+                                ('route', 'method', 'status'))
+request_latency = metrics.histogram('sql_assistant_request_duration_seconds',
+                                    'Request latency by route, including streamed bodies.', ('route',))
+phase_latency = metrics.histogram('sql_assistant_request_phase_seconds',
+                                  'Time a request spent in each phase.', ('route', 'phase'))
+db_round_trips = metrics.histogram('sql_assistant_db_round_trips', 'Database round trips per request.',
+                                   ('route',), buckets=COUNT_BUCKETS)
+llm_tokens = metrics.counter('sql_assistant_llm_tokens_total', 'LLM tokens by prompt kind and direction.',
+                             ('kind', 'direction'))
+pool_connections = metrics.gauge('sql_assistant_db_pool_connections', 'Pooled connections by database and state.',
+                                 ('database', 'state'))
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def clean_sql_file(file_content):
-    file_content = file_content.decode('utf-8') if isinstance(file_content, bytes) else file_content
-    file_content = re.sub(r'/\*.*?\*/', '', file_content, flags=re.DOTALL)
-    cleaned_lines = []
-    for line in file_content.splitlines():
-        line_strip = line.strip()
-        if not line_strip or line_strip.startswith('--') or line_strip.startswith('#'):
-            continue
-        cleaned_lines.append(line)
-    return '\n'.join(cleaned_lines)
-
 def execute_sql(sql):
     try:
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
-        for statement in sql.split(';'):
-            statement = statement.strip()
-            if statement:
-                cursor.execute(statement)
-        conn.commit()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for statement in sql.split(';'):
+                    statement = statement.strip()
+                    if statement:
+                        cursor.execute(statement)
+                conn.commit()
+            finally:
+                cursor.close()
         return True, 'SQL executed successfully.'
     except mysql.connector.Error as err:
         return False, f"Error: {err}"
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 def get_db_connection(db_name=None):
-    config = db_config.copy()
-    if db_name:
-        config['database'] = db_name
     try:
-        conn = mysql.connector.connect(**config)
-        return conn, None
+        return db_pools.get(db_name).acquire(), None
     except mysql.connector.Error as e:
         return None, f"Database connection failed: {str(e)}"
 
-def get_schema_for_groq(db_name):
+@contextmanager
+def db_connection(db_name=None):
+    conn = db_pools.get(db_name).acquire()
     try:
-        conn, error = get_db_connection(db_name)
-        if error:
-            return None, error
-        cursor = conn.cursor()
-        cursor.execute(f"USE `{db_name}`")
-        cursor.execute("SHOW TABLES")
-        tables = [row[0] for row in cursor.fetchall()]
-        schema = {}
-        for table in tables:
-            cursor.execute(f"DESCRIBE `{table}`")
-            columns = [row[0] for row in cursor.fetchall()]
-            schema[table] = columns
-        cursor.close()
+        yield conn
+    finally:
         conn.close()
-        return schema, None
-    except Exception as e:
-        return None, str(e)
 
-def get_create_table_statements(db_name):
+# Schema metadata is re-validated against information_schema at most this often
+schema_cache = SchemaCache(db_connection, check_interval=float(os.getenv('SCHEMA_CHECK_INTERVAL', 5)))
+
+# Generated SQL for repeated natural-language questions (optionally persisted to SQLite)
+nl_cache = NLQueryCache(
+    max_entries=int(os.getenv('NL_CACHE_SIZE', 1000)),
+    ttl=float(os.getenv('NL_CACHE_TTL', 86400)),
+    db_path=os.getenv('NL_CACHE_DB') or None,
+)
+
+# Results of read-only queries, keyed on database and normalized SQL. Writes
+# made through the app invalidate the tables they touch; RESULT_CACHE_TTL bounds
+# staleness from writes made elsewhere. RESULT_CACHE_MAX_BYTES=0 disables it.
+result_cache = QueryResultCache(
+    max_bytes=int(os.getenv('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    max_entry_bytes=int(os.getenv('RESULT_CACHE_MAX_ENTRY_BYTES', 2 * 1024 * 1024)),
+    ttl=float(os.getenv('RESULT_CACHE_TTL', 300)),
+)
+
+def invalidate_results(db_name, tables=None):
+    # Drops cached results reading `tables` or tables that cascade from them;
+    # None drops everything cached for the database.
+    if tables is not None:
+        try:
+            tables = dependent_tables(schema_cache.get(db_name), tables)
+        except Exception:
+            tables = None
+    result_cache.invalidate(db_name, tables)
+
+def invalidate_written(db_name, sql):
+    if is_ddl(sql):
+        invalidate_results(db_name)
+        return
     try:
-        conn, error = get_db_connection(db_name)
-        if error:
-            return None, error
-        cursor = conn.cursor()
-        cursor.execute(f"USE `{db_name}`")
-        cursor.execute("SHOW TABLES")
-        tables = [row[0] for row in cursor.fetchall()]
-        create_stmts = []
-        for table in tables:
-            cursor.execute(f"SHOW CREATE TABLE `{table}`")
-            create_stmt = cursor.fetchone()[1]
-            create_stmts.append(create_stmt)
-        cursor.close()
-        conn.close()
-        return create_stmts, None
+        tables = referenced_tables(sql, schema_cache.get(db_name).table_names)
+    except Exception:
+        tables = None
+    invalidate_results(db_name, tables or None)
+
+def get_schema_for_groq(db_name):
+    try:
+        entry = schema_cache.get(db_name)
+        return {name: table.column_names for name, table in entry.tables.items()}, None
     except Exception as e:
         return None, str(e)
 
@@ -117,9 +279,234 @@ def extract_sql_from_response(response_text):
         return sql_match.group(0).strip()
     return response_text.strip()
 
+def schema_token_budget(prompt_without_schema):
+    # Tokens left for schema text once the rest of the prompt and the answer
+    # are accounted for.
+    room = LLM_CONTEXT_TOKENS - LLM_RESPONSE_TOKENS - count_tokens(prompt_without_schema)
+    return max(0, min(SCHEMA_TOKEN_BUDGET, room))
+
+def ask_llm_for_sql(prompt, kind='query'):
+    prompt_tokens = count_tokens(prompt)
+    if prompt_tokens > LLM_CONTEXT_TOKENS - LLM_RESPONSE_TOKENS:
+        logger.warning(f"LLM {kind} prompt is {prompt_tokens} tokens; the context window is {LLM_CONTEXT_TOKENS}")
+    with tracing.span('llm'):
+        response = llm.complete(prompt).strip()
+    completion_tokens = count_tokens(response)
+    prompt_stats.record(kind, prompt_tokens, completion_tokens)
+    llm_tokens.inc(prompt_tokens, kind=kind, direction='prompt')
+    llm_tokens.inc(completion_tokens, kind=kind, direction='completion')
+    logger.info(f"LLM {kind} prompt: {prompt_tokens} tokens, completion: {completion_tokens} tokens")
+    return extract_sql_from_response(response)
+
 def strip_use_statements(sql):
     return re.sub(r"USE\s+[`'\"]?\w+[`'\"]?;?", "", sql, flags=re.IGNORECASE).strip()
 
+def guard_select(conn, sql, payload, generated):
+    # Returns the SQL to execute and the payload, which carries a warning if
+    # the plan is over the limits in GUARD_MODE=warn.
+    if generated:
+        sql, _ = add_row_limit(sql, QUERY_MAX_ROWS + 1)
+        if GUARD_MODE != 'off':
+            cursor = conn.cursor()
+            try:
+                estimate = plan_estimate(cursor, sql)
+            finally:
+                cursor.close()
+            reasons = check_estimate(estimate, GUARD_MAX_EST_ROWS, GUARD_MAX_COST)
+            if reasons:
+                message = f"Query looks too expensive: {'; '.join(reasons)}"
+                logger.warning(f"{message} ({sql[:200]})")
+                if GUARD_MODE == 'reject':
+                    raise QueryRejected(message, estimate)
+                payload = dict(payload, guard_warning=message, estimate=estimate)
+    return add_time_limit(sql, QUERY_TIMEOUT_MS), payload
+
+def guard_error_response(e, sql):
+    # Errors the execution guard produced, which no LLM correction can fix.
+    if isinstance(e, QueryCancelled) or getattr(e, 'errno', None) == QUERY_INTERRUPTED:
+        return cancelled_response(sql)
+    if isinstance(e, QueryRejected):
+        return jsonify({'error': str(e), 'estimate': e.estimate, 'query': sql}), 422
+    if getattr(e, 'errno', None) == 3024:
+        return jsonify({'error': f"Query stopped after the {QUERY_TIMEOUT_MS} ms time limit", 'query': sql}), 504
+    return None
+
+def cancelled_response(sql=None):
+    # A query stopped through /api/queries/<id>/cancel (409) or by its
+    # route's deadline (504); also used when KILL QUERY came from elsewhere.
+    running = g.get('running_query')
+    if running is not None and running.cancel_reason == 'deadline':
+        return jsonify({'error': str(QueryCancelled(running)), 'query': sql}), 504
+    return jsonify({'error': 'Query cancelled', 'query': sql}), 409
+
+def client_id():
+    # Tells the browser sessions apart in /api/queries and /api/jobs.
+    if 'client_id' not in session:
+        session['client_id'] = uuid.uuid4().hex
+    return session['client_id']
+
+def owned_by_session(owner):
+    return owner is not None and owner == session.get('client_id')
+
+def list_all_sessions():
+    # True for ?all=1; raises PermissionError unless SHOW_ALL_SESSIONS is on.
+    if request.args.get('all', '').lower() not in ('1', 'true'):
+        return False
+    if not SHOW_ALL_SESSIONS:
+        raise PermissionError('Listing other sessions is disabled; set SHOW_ALL_SESSIONS=1 to allow it')
+    return True
+
+def track_query(db_name, query_id=None, question=None):
+    # Lists the current request in running_queries until its response has
+    # been sent (see finish_running_query). Raises ValueError for a bad query_id.
+    running = running_queries.start(db_name, request.url_rule.rule, client_id(), query_id,
+                                    question, LLM if question else PREPARING)
+    g.running_query = running
+    return running
+
+def attach_query(conn, sql):
+    # Records that conn is about to run sql for the tracked request, if any.
+    running = g.get('running_query')
+    if running is not None:
+        running_queries.executing(running, conn, sql)
+    return running
+
+def result_format_error(result_format, stream_format):
+    if result_format not in RESULT_FORMATS:
+        return f"Unsupported format: {result_format}"
+    if result_format != 'rows' and stream_format:
+        return f"format={result_format} cannot be combined with stream"
+    if result_format == 'arrow' and not arrow_available():
+        return 'Arrow output requires pyarrow (pip install pyarrow)'
+    return None
+
+def run_query(db_name, sql, payload, stream_format=None, generated=False, result_format='rows'):
+    # Executes sql and returns the response for it. Statement errors are raised
+    # before anything is sent, so callers can still fall back to LLM correction.
+    # Rows are read in fetchmany batches from an unbuffered cursor; with
+    # stream_format they are written out as they arrive. result_format
+    # 'columnar' / 'arrow' reads tuples into columns instead (see columnar.py).
+    # SELECTs go through guard_select (generated=True for LLM output) and
+    # read-only results are served from / stored in result_cache.
+    cacheable = result_cache.enabled and result_format != 'arrow' and is_cacheable(sql)
+    if cacheable:
+        hit = result_cache.get(db_name, sql, result_format)
+        if hit is not None:
+            if result_format == 'columnar':
+                return columnar_response(dict(payload, cached_result=True), hit.rows_json, RESULT_COMPRESS_MIN_BYTES)
+            return rows_response(dict(payload, cached_result=True), hit.columns, hit.rows_json, hit.row_count, stream_format)
+        version = result_cache.version(db_name)
+        tables = referenced_tables(sql, schema_cache.get(db_name).table_names)
+    conn = db_pools.get(db_name).acquire()
+    try:
+        running = attach_query(conn, sql)
+        statement = sql
+        if is_select(sql):
+            statement, payload = guard_select(conn, sql, payload, generated)
+        cursor = conn.cursor(dictionary=result_format == 'rows', buffered=False)
+        cursor.execute(statement)
+        if running is not None:
+            running_queries.set_phase(running, FETCHING)
+        if not cursor.with_rows:
+            conn.commit()
+            if is_ddl(sql):
+                schema_cache.invalidate(db_name)
+            if not is_read_only(sql):
+                invalidate_written(db_name, sql)
+            payload = dict(payload, data=[], affected_rows=cursor.rowcount)
+            cursor.close()
+            conn.close()
+            return jsonify(payload)
+    except Exception:
+        conn.close()
+        raise
+    if not is_read_only(sql):
+        # e.g. CALL: it returned rows, but may also have written.
+        invalidate_results(db_name)
+    if stream_format:
+        if running is not None:
+            running_queries.set_phase(running, STREAMING)
+        collector = result_cache.collector(db_name, sql, tables, version) if cacheable else None
+        return stream_cursor(conn, cursor, payload, stream_format, STREAM_BATCH_SIZE, collector,
+                             max_rows=QUERY_MAX_ROWS, max_bytes=QUERY_MAX_BYTES)
+    if result_format != 'rows':
+        return columnar_query_response(conn, cursor, payload, result_format,
+                                       (db_name, sql, tables, version) if cacheable else None)
+    batches = EncodedBatches(cursor, STREAM_BATCH_SIZE, max_rows=QUERY_MAX_ROWS, max_bytes=QUERY_MAX_BYTES)
+    try:
+        rows_json = '[' + ','.join(data for data, _ in batches) + ']'
+    finally:
+        if batches.exhausted:
+            cursor.close()
+            conn.close()
+        else:
+            conn.discard()
+    if batches.truncated:
+        payload = dict(payload, truncated=True, row_count=batches.count)
+    elif cacheable:
+        result_cache.put(db_name, sql, tables, batches.columns, rows_json, batches.count, version)
+    return rows_response(payload, batches.columns, rows_json, batches.count)
+
+def columnar_query_response(conn, cursor, payload, result_format, cache_key=None):
+    # The buffered columnar / Arrow counterpart of the end of run_query;
+    # cache_key is (db_name, sql, tables, version) for cacheable results.
+    batches = ColumnarBatches(cursor, STREAM_BATCH_SIZE, QUERY_MAX_ROWS, QUERY_MAX_BYTES,
+                              keep_values=result_format == 'arrow')
+    try:
+        batches.read()
+    finally:
+        if batches.exhausted:
+            cursor.close()
+            conn.close()
+        else:
+            conn.discard()
+    if batches.truncated:
+        payload = dict(payload, truncated=True)
+    if result_format == 'arrow':
+        return arrow_response(payload, batches, RESULT_COMPRESS_MIN_BYTES)
+    fragment = batches.fragment()
+    if cache_key and not batches.truncated:
+        db_name, sql, tables, version = cache_key
+        result_cache.put(db_name, sql, tables, batches.columns, fragment, batches.count, version, 'columnar')
+    return columnar_response(payload, fragment, RESULT_COMPRESS_MIN_BYTES)
+
+@app.before_request
+def start_request_trace():
+    tracing.start(request.url_rule.rule if request.url_rule else 'unmatched')
+
+@app.after_request
+def add_server_timing(response):
+    trace = tracing.current()
+    if trace is not None:
+        response.headers['Server-Timing'] = trace.server_timing()
+        method = request.method
+        response.call_on_close(lambda: finish_request_trace(trace, method, response.status_code))
+    return response
+
+@app.after_request
+def finish_running_query(response):
+    running = g.pop('running_query', None)
+    if running is not None:
+        response.call_on_close(lambda: running_queries.finish(running))
+    return response
+
+def finish_request_trace(trace, method, status):
+    # Runs once the body has been sent, so streamed responses are measured whole.
+    tracing.stop()
+    elapsed = trace.elapsed()
+    phases, round_trips = trace.snapshot()
+    request_count.inc(route=trace.name, method=method, status=status)
+    request_latency.observe(elapsed, route=trace.name)
+    for phase, (seconds, _) in phases.items():
+        phase_latency.observe(seconds, route=trace.name, phase=phase)
+    db_round_trips.observe(round_trips, route=trace.name)
+    if trace.name.startswith('/static/'):
+        return
+    breakdown = ', '.join(f"{phase}={seconds * 1000:.1f}ms" for phase, (seconds, _) in phases.items())
+    level = logging.WARNING if elapsed * 1000 >= SLOW_REQUEST_MS else logging.INFO
+    logger.log(level, f"{method} {trace.name} {status} in {elapsed * 1000:.1f}ms "
+                      f"({breakdown or 'no phases'}; {round_trips} DB round trips)")
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     logger.info(f"Entered index route. Method: {request.method}")
@@ -128,31 +515,115 @@ def index():
     error = None
     results = None
     query = None
+    adopt_finished_import()
     db_name = session.get('db_name')
     logger.info(f"Session db_name: {db_name}")
     if request.method == 'POST':
         logger.info("Handling POST request.")
     elif db_name:
         logger.info(f"Loading tables for database: {db_name}")
-        conn, db_error = get_db_connection(db_name)
-        if db_error:
-            logger.error(f"Database error: {db_error}")
-            error = db_error
-        else:
-            try:
-                cursor = conn.cursor()
-                cursor.execute(f"USE `{db_name}`")
-                cursor.execute("SHOW TABLES")
-                tables = [row[0] for row in cursor.fetchall()]
-                logger.info(f"Tables loaded: {tables}")
-                cursor.close()
-                conn.close()
-            except Exception as e:
-                logger.error(f"Error loading tables: {str(e)}")
-                error = str(e)
+        try:
+            tables = schema_cache.get(db_name).table_names
+            logger.info(f"Tables loaded: {tables}")
+        except Exception as e:
+            logger.error(f"Error loading tables: {str(e)}")
+            error = str(e)
     logger.info("Rendering template.")
     return render_template('index.html', summary=summary, tables=tables, error=error, results=results, query=query)
 
+_CREATE_DATABASE_RE = re.compile(r"CREATE\s+(?:DATABASE|SCHEMA)\s+(?:IF\s+NOT\s+EXISTS\s+)?[`']?([^`';\s]+)[`']?", re.IGNORECASE)
+_DROP_DATABASE_RE = re.compile(r"DROP\s+(?:DATABASE|SCHEMA)\s+(?:IF\s+EXISTS\s+)?[`']?([^`';\s]+)[`']?", re.IGNORECASE)
+
+def run_sql_import(filepath, progress=None, cancelled=None):
+    # Streams the dump into MySQL over one dedicated connection. The first
+    # CREATE DATABASE selects the database that the rest of the dump is loaded
+    # into; the dump's own USE statements are skipped, as before.
+    total_bytes = os.path.getsize(filepath)
+    state = {'db_name': None}
+
+    def handle_statement(cursor, sql):
+        if re.match(r"USE\s", sql, re.IGNORECASE):
+            logger.debug(f"Skipping statement: {sql[:80]}")
+            return True
+        dropped = _DROP_DATABASE_RE.match(sql)
+        created = _CREATE_DATABASE_RE.match(sql)
+        if not (dropped or created):
+            return False
+        logger.info(f"Executing DB statement: {sql[:80]}")
+        cursor.execute(sql)
+        name = (dropped or created).group(1)
+        # Pooled connections may still point at the dropped copy of the database.
+        db_pools.drop(name)
+        schema_cache.invalidate(name)
+        result_cache.invalidate(name)
+        if created and state['db_name'] in (None, name):
+            state['db_name'] = name
+            logger.info(f"Database name extracted: {name}")
+            cursor.execute(f"USE `{name}`")
+        return True
+
+    def report(stats):
+        percent = 100.0 * stats['bytes_read'] / total_bytes if total_bytes else 100.0
+        logger.info(f"Import progress: {percent:.1f}% ({stats['bytes_read']}/{total_bytes} bytes, "
+                    f"{stats['statements']} statements, {stats['elapsed']}s)")
+        if progress:
+            progress(dict(stats, total_bytes=total_bytes, percent=round(percent, 1), db_name=state['db_name']))
+
+    conn = mysql.connector.connect(**db_config)
+    try:
+        with open(filepath, 'rb') as f:
+            stats = import_dump(conn, SqlStatementReader(f), handle_statement,
+                                commit_every=IMPORT_COMMIT_EVERY, batch_bytes=IMPORT_BATCH_BYTES, progress=report,
+                                cancelled=cancelled)
+    finally:
+        conn.close()
+        if state['db_name']:
+            schema_cache.invalidate(state['db_name'])
+            result_cache.invalidate(state['db_name'])
+    stats['db_name'] = state['db_name']
+    return stats
+
+def import_job(filepath):
+    def run(job):
+        try:
+            stats = run_sql_import(filepath, progress=job.update, cancelled=lambda: job.cancelled)
+        except ImportCancelled:
+            raise JobCancelled()
+        if stats['db_name']:
+            tables = schema_cache.get(stats['db_name']).table_names
+            logger.info(f"Tables loaded: {tables}")
+        return stats
+    return run
+
+def bulk_load_job(db_name, filepath, fmt, table_name, if_exists, method):
+    def run(job):
+        table = schema_cache.table(db_name, table_name)
+        conn = mysql.connector.connect(**db_config, database=db_name, allow_local_infile=method != 'executemany')
+        try:
+            return load_file(conn, filepath, fmt, table_name, table.columns if table else None,
+                             if_exists=if_exists, method=method, chunk_rows=BULK_CHUNK_ROWS,
+                             progress=job.update, cancelled=lambda: job.cancelled)
+        except LoadCancelled:
+            raise JobCancelled()
+        finally:
+            conn.close()
+            invalidate_results(db_name, [table_name])
+            schema_cache.invalidate(db_name)
+    return run
+
+def adopt_finished_import():
+    # The import runs outside any request, so the session switches to the new
+    # database the first time a request from it sees the job succeed.
+    job_id = session.get('import_job')
+    if not job_id:
+        return
+    job = jobs.get(job_id)
+    if job is not None and job.status not in FINISHED:
+        return
+    if job is not None and job.status == SUCCEEDED and job.result.get('db_name'):
+        session['db_name'] = job.result['db_name']
+    session.pop('import_job', None)
+
 @app.route('/upload', methods=['POST'])
 def upload():
     logger.info("Handling file upload at /upload.")
@@ -167,94 +638,53 @@ def upload():
         if file.filename:
             logger.info(f"File upload received: {file.filename}")
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            # Unique per upload so a queued import never reads a file that a later upload overwrote.
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex[:8]}_{filename}")
             file.save(filepath)
             logger.info(f"File saved to: {filepath}")
-            with open(filepath, 'rb') as f:
-                file_content = f.read()
-            logger.info(f"SQL file read, size: {len(file_content)} bytes")
-            cleaned_sql = clean_sql_file(file_content)
-            logger.info("SQL file cleaned")
-            statements = [stmt.strip() for stmt in cleaned_sql.split(';') if stmt.strip()]
-            logger.info(f"Parsed {len(statements)} SQL statements.")
-            db_name = None
-            for stmt in statements:
-                match = re.match(r"CREATE\s+DATABASE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`']?([^`';\s]+)[`']?", stmt, re.IGNORECASE)
-                if match:
-                    db_name = match.group(1)
-                    session['db_name'] = db_name
-                    logger.info(f"Database name extracted: {db_name}")
-                    break
-            try:
-                conn, exec_error = get_db_connection()
-                if exec_error:
-                    logger.error(f"Database error: {exec_error}")
-                    error = exec_error
-                else:
-                    conn.autocommit = True
-                    cursor = conn.cursor()
-                    for statement in statements:
-                        upper_stmt = statement.upper()
-                        if upper_stmt.startswith('CREATE DATABASE') or upper_stmt.startswith('DROP DATABASE'):
-                            logger.info(f"Executing DB statement: {statement[:80]}")
-                            cursor.execute(statement)
-                    conn.commit()
-                    if db_name:
-                        logger.info(f"Checking if database '{db_name}' exists...")
-                        cursor.execute("SELECT SCHEMA_NAME FROM information_schema.schemata WHERE SCHEMA_NAME = %s", (db_name,))
-                        db_exists = cursor.fetchone()
-                        if not db_exists:
-                            logger.error(f"Database '{db_name}' was NOT created!")
-                            error = f"Database '{db_name}' was NOT created!"
-                            cursor.close()
-                            conn.close()
-                            return redirect(url_for('index'))
-                    cursor.close()
-                    conn.close()
-                    logger.info("Database created/dropped as needed.")
-                if db_name:
-                    logger.info(f"Connecting to new database: {db_name}")
-                    conn, db_error = get_db_connection(db_name)
-                    if db_error:
-                        logger.error(f"Database error: {db_error}")
-                        error = db_error
-                    else:
-                        cursor = conn.cursor()
-                        cursor.execute(f"USE `{db_name}`")
-                        for statement in statements:
-                            upper_stmt = statement.upper()
-                            if upper_stmt.startswith('CREATE DATABASE') or upper_stmt.startswith('DROP DATABASE') or upper_stmt.startswith('USE '):
-                                logger.debug(f"Skipping statement: {statement[:80]}")
-                                continue
-                            logger.info(f"Executing SQL statement: {statement[:80]}")
-                            cursor.execute(statement)
-                        conn.commit()
-                        logger.info("All SQL statements executed.")
-                        cursor.execute("SHOW TABLES")
-                        tables = [row[0] for row in cursor.fetchall()]
-                        logger.info(f"Tables loaded: {tables}")
-                        cursor.close()
-                        conn.close()
-            except Exception as e:
-                logger.error(f"Failed to execute SQL: {str(e)}")
-                error = f"Failed to execute SQL: {str(e)}"
+            job = jobs.submit('import', import_job(filepath), description=filename, owner=client_id())
+            session['import_job'] = job.id
+            logger.info(f"Import queued as job {job.id}")
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({'job_id': job.id, 'status_url': url_for('api_job', job_id=job.id)}), 202
     return redirect(url_for('index'))
 
+@app.route('/api/bulk-load', methods=['POST'])
+def api_bulk_load():
+    db_name = session.get('db_name')
+    if not db_name:
+        return jsonify({'error': 'No database selected'}), 400
+    file = request.files.get('file')
+    if file is None or not file.filename:
+        return jsonify({'error': 'No file provided'}), 400
+    try:
+        fmt = file_format(file.filename)
+    except BulkLoadError as e:
+        return jsonify({'error': str(e)}), 400
+    filename = secure_filename(file.filename)
+    table_name = request.form.get('table') or re.sub(r'\W+', '_', os.path.splitext(filename)[0]).strip('_')
+    if_exists = request.form.get('if_exists', 'append')
+    method = request.form.get('method', BULK_LOAD_METHOD)
+    if not table_name:
+        return jsonify({'error': 'No table name provided'}), 400
+    if if_exists not in ('append', 'replace', 'fail'):
+        return jsonify({'error': f"Invalid if_exists: {if_exists}"}), 400
+    if method not in LOAD_METHODS:
+        return jsonify({'error': f"Invalid method: {method}"}), 400
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex[:8]}_{filename}")
+    file.save(filepath)
+    job = jobs.submit('bulk_load', bulk_load_job(db_name, filepath, fmt, table_name, if_exists, method),
+                      description=f"{filename} -> {table_name}", owner=client_id())
+    logger.info(f"Bulk load of {filename} into {db_name}.{table_name} queued as job {job.id}")
+    return jsonify({'job_id': job.id, 'status_url': url_for('api_job', job_id=job.id), 'table': table_name}), 202
+
 @app.route('/tables', methods=['GET'])
 def list_tables():
     db_name = session.get('db_name')
     if not db_name:
         return jsonify({'success': False, 'message': 'No database selected'}), 400
-    conn, error = get_db_connection(db_name)
-    if error:
-        return jsonify({'success': False, 'message': error}), 500
     try:
-        cursor = conn.cursor()
-        cursor.execute(f"USE `{db_name}`")
-        cursor.execute("SHOW TABLES")
-        tables = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        conn.close()
+        tables = schema_cache.get(db_name).table_names
         return jsonify({'success': True, 'tables': tables})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -265,16 +695,204 @@ def api_table_data(table_name):
     if not db_name:
         return jsonify({'error': 'No database selected'}), 400
     try:
-        conn, error = get_db_connection(db_name)
-        if error:
-            return jsonify({'error': error}), 500
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(f"SELECT * FROM `{table_name}`")
+        limit = min(max(int(request.args.get('limit', TABLE_PAGE_SIZE)), 1), TABLE_PAGE_MAX)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    order_by = request.args.get('order_by')
+    descending = request.args.get('order', 'asc').lower() == 'desc'
+    cursor_token = request.args.get('cursor')
+    want_count = request.args.get('count', '').lower() in ('1', 'true', 'approx')
+    stream_format = request.args.get('stream')
+    if stream_format and stream_format not in STREAM_FORMATS:
+        return jsonify({'error': f"Unsupported stream format: {stream_format}"}), 400
+    result_format = request.args.get('format', 'rows')
+    format_error = result_format_error(result_format, stream_format)
+    if format_error:
+        return jsonify({'error': format_error}), 400
+    try:
+        track_query(db_name, request.args.get('query_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    state = {}
+    if cursor_token:
+        try:
+            state = decode_cursor(cursor_token)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    try:
+        conn = db_pools.get(db_name).acquire()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    try:
+        schema, pk_columns = describe_table(db_name, table_name)
+        if not schema:
+            conn.close()
+            return jsonify({'error': f"Table '{table_name}' does not exist or has no schema"}), 404
+        columns = [col['Field'] for col in schema]
+        if order_by and order_by not in columns:
+            conn.close()
+            return jsonify({'error': f"Unknown column for order_by: {order_by}"}), 400
+        if not order_by and pk_columns:
+            order_by = pk_columns[0]
+        if state and (state.get('o') != order_by or bool(state.get('d')) != descending):
+            conn.close()
+            return jsonify({'error': 'Cursor does not match the requested ordering'}), 400
+        head = {'primary_key': pk_columns, 'order_by': order_by, 'order': 'desc' if descending else 'asc'}
+        # Streaming is an export: everything from the cursor position on, in
+        # page order, without materialising it server-side. Paged reads fetch
+        # one extra row to learn whether another page exists.
+        fetch_limit = None if stream_format else limit + 1
+        offset = int(state.get('offset', 0))
+        if pk_columns:
+            sql, params, key_columns = build_keyset_select(table_name, order_by, pk_columns, descending, state.get('after'), fetch_limit)
+        else:
+            sql, params = build_offset_select(table_name, order_by, descending, offset, fetch_limit)
+        running = attach_query(conn, sql)
+        if stream_format:
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            cursor.execute(sql, params)
+            running_queries.set_phase(running, STREAMING)
+            return stream_cursor(conn, cursor, head, stream_format, STREAM_BATCH_SIZE)
+        columnar = result_format != 'rows'
+        cursor = conn.cursor(dictionary=not columnar)
+        cursor.execute(sql, params)
+        running_queries.set_phase(running, FETCHING)
         rows = cursor.fetchall()
+        description = cursor.description
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more:
+            if pk_columns:
+                last = rows[-1]
+                if columnar:
+                    names = [d[0] for d in description]
+                    last = {col: last[names.index(col)] for col in key_columns}
+                next_cursor = encode_cursor({'o': order_by, 'd': descending, 'after': [last[col] for col in key_columns]})
+            else:
+                next_cursor = encode_cursor({'o': order_by, 'd': descending, 'offset': offset + limit})
+        result = dict(head, next_cursor=next_cursor, has_more=has_more)
+        if want_count:
+            # TABLE_ROWS is an estimate for InnoDB but costs no table scan.
+            cursor.execute("SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s", (db_name, table_name))
+            count_row = cursor.fetchone()
+            result['approx_total'] = (count_row[0] if columnar else count_row['TABLE_ROWS']) if count_row else None
         cursor.close()
         conn.close()
-        return jsonify({'data': rows})
+        if columnar:
+            encoder = ColumnarEncoder(description, keep_values=result_format == 'arrow')
+            encoder.add(rows)
+            if result_format == 'arrow':
+                return arrow_response(result, encoder, RESULT_COMPRESS_MIN_BYTES)
+            return columnar_response(result, encoder.fragment(), RESULT_COMPRESS_MIN_BYTES)
+        return jsonify(dict(result, data=rows))
     except Exception as e:
+        conn.close()
+        if isinstance(e, QueryCancelled) or getattr(e, 'errno', None) == QUERY_INTERRUPTED:
+            return cancelled_response(sql)
+        return jsonify({'error': str(e)}), 500
+
+def check_sql(db_name, sql):
+    # Validation issues for sql against the cached schema; None when it could
+    # not be checked (validation off, sqlglot missing, unparsable SQL).
+    if not SQL_VALIDATION:
+        return None
+    try:
+        return validate_sql(sql, schema_cache.get(db_name), db_name)
+    except Exception as e:
+        logger.warning(f"SQL validation skipped: {str(e)}")
+        return None
+
+def certain_issues(issues):
+    return [issue for issue in issues or [] if issue['kind'] in ('unknown_table', 'unknown_column')]
+
+def precheck_sql(db_name, sql):
+    # The issues in SQL typed by the user that MySQL would certainly reject:
+    # unknown tables and columns, still unknown after a fresh schema check
+    # (the table may have been created elsewhere since the last load).
+    # Ambiguous columns, and scripts with DDL whose later statements may use
+    # what it creates, are left to MySQL.
+    if any(is_ddl(part) for part in sql.split(';')):
+        return None
+    if not certain_issues(check_sql(db_name, sql)):
+        return None
+    try:
+        schema_cache.get(db_name, force_check=True)
+    except Exception as e:
+        logger.warning(f"SQL validation skipped: {str(e)}")
+        return None
+    return certain_issues(check_sql(db_name, sql)) or None
+
+def validation_error_response(issues, sql, original_error=None):
+    payload = {'error': f"Query references unknown tables or columns:\n{format_issues(issues)}",
+               'validation_errors': issues, 'query': sql}
+    if original_error:
+        payload['original_error'] = original_error
+    return jsonify(payload), 400
+
+def correct_sql(db_name, sql, error_str, issues=None):
+    # Asks the LLM to fix sql given the MySQL error (or validation issues) and
+    # the compact schema of the tables involved.
+    table_names = re.findall(r'FROM\s+`?(\w+)`?|INTO\s+`?(\w+)`?|UPDATE\s+`?(\w+)`?', sql, re.IGNORECASE)
+    flat_tables = [item for sublist in table_names for item in sublist if item]
+    known = schema_cache.get(db_name).tables
+    for issue in issues or []:
+        if issue['kind'] == 'unknown_table':
+            flat_tables.extend(issue.get('suggestions', []))
+        elif issue.get('table'):
+            flat_tables.append(issue['table'])
+    flat_tables = [name for name in dict.fromkeys(flat_tables) if name in known]
+    problem = 'references tables or columns that do not exist' if issues else 'failed with this error'
+    running = g.get('running_query')
+    if running is not None:
+        running_queries.set_phase(running, LLM)
+    head = f"The following SQL query {problem}:\nQuery: {sql}\nError: {error_str}\nTables, as table(column type, ...):\n"
+    tail = "\nPlease correct the query so it works in MySQL and return only the corrected SQL."
+    _, texts, _, _ = fit_to_budget(flat_tables, [compact_table(known[t]) for t in flat_tables],
+                                   schema_token_budget(head + tail), lambda t: summarize_table(known[t]))
+    prompt = head + '\n'.join(texts) + tail
+    return strip_use_statements(ask_llm_for_sql(prompt, 'correction'))
+
+def snapshot_response(db_name, tables, max_rows, stream):
+    # First max_rows rows of every table, read in parallel over pooled connections.
+    pool = db_pools.get(db_name)
+    workers = max(1, min(SNAPSHOT_WORKERS, pool.size // 2))
+    frames = snapshot_frames(pool.acquire, tables, max_rows, workers, STREAM_BATCH_SIZE)
+    note = f"First {max_rows} rows of each table returned."
+    if stream:
+        return stream_snapshot(frames, {'status': 'Query executed', 'note': note, 'tables': tables, 'max_rows': max_rows})
+    data, truncated, errors = collect_snapshot(frames)
+    payload = {'status': 'Query executed', 'data': data, 'note': note, 'truncated': truncated}
+    if errors:
+        payload['errors'] = errors
+    return jsonify(payload)
+
+@app.route('/api/snapshot', methods=['GET'])
+def api_snapshot():
+    db_name = session.get('db_name')
+    if not db_name:
+        return jsonify({'error': 'No database selected'}), 400
+    try:
+        max_rows = int(request.args.get('max_rows', SNAPSHOT_MAX_ROWS))
+    except ValueError:
+        return jsonify({'error': 'max_rows must be an integer'}), 400
+    if not 1 <= max_rows <= SNAPSHOT_MAX_ROWS:
+        return jsonify({'error': f"max_rows must be between 1 and {SNAPSHOT_MAX_ROWS}"}), 400
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        return jsonify({'error': f"Unsupported format: {fmt}"}), 400
+    try:
+        tables = schema_cache.get(db_name).table_names
+        wanted = request.args.get('tables')
+        if wanted:
+            names = [name.strip() for name in wanted.split(',') if name.strip()]
+            unknown = [name for name in names if name not in tables]
+            if unknown:
+                return jsonify({'error': f"Unknown tables: {', '.join(unknown)}"}), 404
+            tables = names
+        return snapshot_response(db_name, tables, max_rows, fmt == 'ndjson')
+    except Exception as e:
+        logger.error(f"Error in /api/snapshot: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/query', methods=['POST'])
@@ -285,8 +903,20 @@ def api_query():
     data = request.get_json()
     question = data.get('query')
     is_nl = data.get('is_natural_language', False)
+    stream_format = data.get('stream')
+    result_format = data.get('format', 'rows')
+    bypass_cache = bool(data.get('bypass_cache', False))
     if not question:
         return jsonify({'error': 'No query provided'}), 400
+    if stream_format and stream_format not in STREAM_FORMATS:
+        return jsonify({'error': f"Unsupported stream format: {stream_format}"}), 400
+    format_error = result_format_error(result_format, stream_format)
+    if format_error:
+        return jsonify({'error': format_error}), 400
+    try:
+        track_query(db_name, data.get('query_id'), question if is_nl else None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     use_warning = None
     if is_nl and re.sub(r'[^a-zA-Z]', '', question).lower() in [
         'showalldatafromalltables', 'showmealltables', 'showeverything',
@@ -294,20 +924,8 @@ def api_query():
         'showfulldatabase', 'showfulldb', 'showentiredatabase', 'showentiredb'
     ]:
         try:
-            conn, error = get_db_connection(db_name)
-            if error:
-                return jsonify({'error': error}), 500
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(f"SHOW TABLES")
-            tables = [row[0] for row in cursor.fetchall()]
-            all_data = {}
-            for table in tables:
-                cursor.execute(f"SELECT * FROM `{table}`")
-                rows = cursor.fetchall()
-                all_data[table] = rows
-            cursor.close()
-            conn.close()
-            return jsonify({'status': 'Query executed', 'data': all_data, 'note': 'All data from all tables returned.'})
+            tables = schema_cache.get(db_name).table_names
+            return snapshot_response(db_name, tables, SNAPSHOT_MAX_ROWS, bool(stream_format))
         except Exception as e:
             tb = traceback.format_exc()
             return jsonify({'error': str(e), 'traceback': tb}), 500
@@ -315,78 +933,106 @@ def api_query():
         sql = strip_use_statements(question)
         if sql != question:
             use_warning = 'A USE statement was removed from your query.'
-        try:
-            conn, error = get_db_connection(db_name)
-            if error:
-                return jsonify({'error': error}), 500
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            return jsonify({'status': 'Query executed', 'data': rows, 'warning': use_warning} if use_warning else {'status': 'Query executed', 'data': rows})
-        except Exception as e:
-            error_str = str(e)
-            table_names = re.findall(r'FROM\s+`?(\w+)`?|INTO\s+`?(\w+)`?|UPDATE\s+`?(\w+)`?', sql, re.IGNORECASE)
-            flat_tables = [item for sublist in table_names for item in sublist if item]
-            schema_text = ''
-            if flat_tables:
-                create_stmts = []
-                for t in flat_tables:
-                    stmts, schema_error = get_create_table_statements(db_name)
-                    if not schema_error and stmts:
-                        for stmt in stmts:
-                            if f'CREATE TABLE `{t}`' in stmt or f'CREATE TABLE {t}' in stmt:
-                                create_stmts.append(stmt)
-                schema_text = '\n\n'.join(create_stmts)
-            prompt = f"The following SQL query failed with this error:\nQuery: {sql}\nError: {error_str}\nTable schema: {schema_text}\nPlease correct the query so it works in MySQL and return only the corrected SQL."
+        issues = precheck_sql(db_name, sql)
+        tb = ''
+        if issues:
+            # Known to fail: go straight to the correction without a round trip.
+            error_str = hint = format_issues(issues)
+            logger.info(f"Query failed validation, not executed: {error_str}")
+        else:
             try:
-                groq_response = groq_client.chat.completions.create(
-                    model="llama3-70b-8192",
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                corrected_sql = extract_sql_from_response(groq_response.choices[0].message.content.strip())
-                corrected_sql_clean = strip_use_statements(corrected_sql)
-                conn2, error2 = get_db_connection(db_name)
-                if error2:
-                    return jsonify({'error': error2}), 500
-                cursor2 = conn2.cursor(dictionary=True)
-                cursor2.execute(corrected_sql_clean)
-                rows2 = cursor2.fetchall()
-                cursor2.close()
-                conn2.close()
-                return jsonify({'status': 'Query executed (corrected by LLM)', 'query': corrected_sql_clean, 'data': rows2, 'original_error': error_str})
-            except Exception as e2:
-                tb2 = traceback.format_exc()
-                return jsonify({'error': f'Original error: {error_str}\nLLM correction failed: {str(e2)}', 'traceback': tb + '\n' + tb2}), 500
-    create_stmts, schema_error = get_create_table_statements(db_name)
-    if schema_error:
-        return jsonify({'error': schema_error}), 500
-    schema_text = '\n\n'.join(create_stmts)
-    prompt = f"Given the following MySQL table definitions:\n{schema_text}\n\nConvert this request to a SQL query. Only return the SQL query, nothing else.\nRequest: {question}"
-    try:
-        groq_response = groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        sql_query = extract_sql_from_response(groq_response.choices[0].message.content.strip())
+                return run_query(db_name, sql, {'status': 'Query executed', 'warning': use_warning} if use_warning else {'status': 'Query executed'}, stream_format,
+                                 result_format=result_format)
+            except Exception as e:
+                guarded = guard_error_response(e, sql)
+                if guarded:
+                    return guarded
+                tb = traceback.format_exc()
+                error_str = str(e)
+            # Anything else the schema check finds is advice for the correction.
+            issues = check_sql(db_name, sql)
+            hint = f"{error_str}\n{format_issues(issues)}" if issues else error_str
+        corrected_sql_clean = None
+        try:
+            corrected_sql_clean = correct_sql(db_name, sql, hint, issues)
+            payload = {'status': 'Query executed (corrected by LLM)', 'query': corrected_sql_clean, 'original_error': error_str}
+            if issues:
+                payload['validation_errors'] = issues
+            remaining = check_sql(db_name, corrected_sql_clean)
+            if remaining:
+                return validation_error_response(remaining, corrected_sql_clean, error_str)
+            return run_query(db_name, corrected_sql_clean, payload, stream_format, generated=True,
+                             result_format=result_format)
+        except Exception as e2:
+            guarded = guard_error_response(e2, corrected_sql_clean)
+            if guarded:
+                return guarded
+            tb2 = traceback.format_exc()
+            return jsonify({'error': f'Original error: {error_str}\nLLM correction failed: {str(e2)}', 'traceback': tb + '\n' + tb2}), 500
+    try:
+        schema = schema_cache.get(db_name)
+        head = ("Given the following MySQL tables, written as table(column type, ...) where pk marks the "
+                "primary key and fk a foreign key:\n")
+        tail = f"\n\nConvert this request to a SQL query. Only return the SQL query, nothing else.\nRequest: {question}"
+        _, table_texts, schema_report = select_tables(
+            schema, question, lambda tables: [compact_table(schema.tables[t]) for t in tables],
+            top_k=SCHEMA_TOP_K, token_budget=schema_token_budget(head + tail), min_tables=SCHEMA_PRUNE_MIN_TABLES,
+            summarize=lambda t: summarize_table(schema.tables[t]))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    logger.info(f"Schema context: {len(schema_report['included'])}/{schema_report['total_tables']} tables "
+                f"({len(schema_report['summarized'])} summarized), {schema_report['estimated_tokens']} tokens")
+    schema_text = '\n'.join(table_texts)
+    cached_sql = None if bypass_cache else nl_cache.get(schema_text, question)
+    sql_query_clean = None
+    try:
+        if cached_sql is not None:
+            logger.info("Natural-language query served from cache")
+            sql_query = cached_sql
+        else:
+            sql_query = ask_llm_for_sql(head + schema_text + tail, 'nl_query')
         sql_query_clean = strip_use_statements(sql_query)
         if sql_query_clean != sql_query:
             use_warning = 'A USE statement was removed from the AI-generated query.'
         logger.info(f"Generated SQL: {sql_query_clean}")
-        conn, error = get_db_connection(db_name)
-        if error:
-            return jsonify({'error': error}), 500
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(sql_query_clean)
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify({'status': 'Query executed', 'query': sql_query_clean, 'data': rows, 'warning': use_warning} if use_warning else {'status': 'Query executed', 'query': sql_query_clean, 'data': rows})
+        payload = {'status': 'Query executed', 'query': sql_query_clean}
+        issues = check_sql(db_name, sql_query_clean)
+        if issues:
+            # One correction round with the exact problems instead of a failed execution.
+            error_str = format_issues(issues)
+            logger.info(f"Generated SQL failed validation: {error_str}")
+            if cached_sql is not None:
+                nl_cache.discard(schema_text, question)
+                cached_sql = None
+            sql_query = sql_query_clean = correct_sql(db_name, sql_query_clean, error_str, issues)
+            remaining = check_sql(db_name, sql_query_clean)
+            if remaining:
+                return validation_error_response(remaining, sql_query_clean, error_str)
+            payload = {'status': 'Query executed (corrected by LLM)', 'query': sql_query_clean, 'validation_errors': issues}
+        if use_warning:
+            payload['warning'] = use_warning
+        if cached_sql is not None:
+            payload['cached'] = True
+        payload['schema_tables'] = schema_report['included']
+        if schema_report['pruned']:
+            payload['schema_omitted'] = schema_report['omitted']
+        if schema_report['summarized']:
+            payload['schema_summarized'] = schema_report['summarized']
+        response = run_query(db_name, sql_query_clean, payload, stream_format, generated=True,
+                             result_format=result_format)
+        # Only SQL that actually ran is worth remembering.
+        if cached_sql is None:
+            nl_cache.put(schema_text, question, sql_query)
+        return response
     except Exception as e:
+        if cached_sql is not None:
+            nl_cache.discard(schema_text, question)
+        guarded = guard_error_response(e, sql_query_clean) if sql_query_clean else None
+        if guarded:
+            return guarded
         tb = traceback.format_exc()
         error_str = str(e)
-        if '503' in error_str or 'Service unavailable' in error_str:
+        if isinstance(e, LLMUnavailable) or '503' in error_str or 'Service unavailable' in error_str:
             return jsonify({'error': 'Groq service is temporarily unavailable.', 'traceback': tb}), 503
         return jsonify({'error': f'Groq or SQL error: {error_str}', 'traceback': tb}), 500
 
@@ -395,73 +1041,29 @@ def api_tables():
     db_name = session.get('db_name')
     if not db_name:
         return jsonify({'success': False, 'message': 'No database selected'}), 400
-    conn, error = get_db_connection(db_name)
-    if error:
-        return jsonify({'success': False, 'message': error}), 500
     try:
-        cursor = conn.cursor()
-        cursor.execute(f"USE `{db_name}`")
-        cursor.execute("SHOW TABLES")
-        tables = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        conn.close()
+        tables = schema_cache.get(db_name).table_names
         return jsonify({'success': True, 'tables': tables})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 def preprocess_row_data(row_data, schema):
-    processed = {}
-    for col in schema:
-        name = col['Field']
-        typ = col['Type'].lower()
-        val = row_data.get(name)
-        if val is None or val == '':
-            processed[name] = None
-        elif 'int' in typ:
-            try:
-                processed[name] = int(val)
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid integer value for {name}: {val}, setting to None")
-                processed[name] = None
-        elif 'double' in typ or 'float' in typ or 'decimal' in typ:
-            try:
-                processed[name] = float(val)
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid numeric value for {name}: {val}, setting to None")
-                processed[name] = None
-        elif 'date' in typ or 'datetime' in typ:
-            if isinstance(val, str):
-                try:
-                    from datetime import datetime
-                    d = datetime.fromisoformat(val.replace('Z', '+00:00') if 'Z' in val else val)
-                    processed[name] = d.strftime('%Y-%m-%d') if 'date' in typ else d.strftime('%Y-%m-%d %H:%M:%S')
-                except (ValueError, TypeError):
-                    logger.warning(f"Invalid date value for {name}: {val}, setting to None")
-                    processed[name] = None
-            else:
-                processed[name] = None
-        else:
-            processed[name] = str(val)
-    return processed
+    # Single-row convenience over TableCoercer; converters are compiled once
+    # per column type, so this no longer re-parses the type on every cell.
+    processed, report = TableCoercer(schema).coerce_rows([row_data])
+    if report:
+        logger.warning(f"Invalid values set to NULL: {report.summary()}")
+    return processed[0]
 
 def try_llm_correction(original_sql, error_str, table_name, row_data, db_name, columns, pk_columns):
-    conn, _ = get_db_connection(db_name)
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(f"DESCRIBE `{table_name}`")
-    schema = cursor.fetchall()
-    cursor.execute(f"SHOW CREATE TABLE `{table_name}`")
-    create_stmt = cursor.fetchone()['Create Table']
-    cursor.close()
-    conn.close()
-    column_types = {col['Field']: col['Type'] for col in schema}
+    table = schema_cache.table(db_name, table_name)
     prompt = (
         f"The following SQL query failed with this error:\n"
         f"Query: {original_sql}\n"
         f"Error: {error_str}\n"
-        f"Table schema: {create_stmt}\n"
-        f"Column types: {column_types}\n"
-        f"Row data: {row_data}\n"
-        f"Primary keys: {pk_columns}\n"
+        f"Table, as table(column type, ...): {compact_table(table)}\n"
+        f"Row data: {compact_row(row_data)}\n"
+        f"Primary keys: {', '.join(pk_columns) or 'none'}\n"
         f"Generate a corrected MySQL UPDATE query. Use %s placeholders for values in the SET and WHERE clauses, "
         f"matching the order of non-primary key columns ({len([col for col in columns if col not in pk_columns])}) "
         f"followed by primary key columns ({len(pk_columns)}) if primary keys are provided, or all columns ({len(columns)}) twice if no primary keys. "
@@ -470,15 +1072,92 @@ def try_llm_correction(original_sql, error_str, table_name, row_data, db_name, c
         f"Return only the SQL query."
     )
     try:
-        groq_response = groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return extract_sql_from_response(groq_response.choices[0].message.content.strip())
+        return ask_llm_for_sql(prompt, 'row_correction')
     except Exception as e:
         logger.error(f"LLM correction request failed: {str(e)}")
         raise
 
+def describe_table(db_name, table_name):
+    table = schema_cache.table(db_name, table_name)
+    if table is None:
+        return [], []
+    return table.columns, table.primary_key
+
+def build_row_update(table_name, item, processed_row, columns, pk_columns):
+    # processed_row is item['row'] (or item['row_data']) already coerced.
+    if pk_columns and 'pk' in item and 'row' in item:
+        pk = item['pk']
+        # Filter out NULL or incompatible values for SET clause
+        set_columns = [col for col in columns if col not in pk_columns and processed_row.get(col) is not None]
+        key_columns = pk_columns
+        where_columns = pk_columns
+        where_values = [pk.get(col) for col in pk_columns]
+    elif 'row_data' in item:
+        set_columns = [col for col in columns if processed_row.get(col) is not None]
+        key_columns = []
+        where_columns = set_columns
+        where_values = [processed_row.get(col) for col in set_columns]
+    else:
+        raise ValueError("Invalid row format: missing pk or row_data")
+    if not set_columns:
+        return None
+    set_values = [processed_row.get(col) for col in set_columns]
+    sql = build_update(table_name, set_columns, where_columns)
+    return sql, tuple(set_values + where_values), processed_row, key_columns
+
+def build_delta_update(table_name, change, processed_set, match, schema, pk_columns):
+    # Column-level delta sent by the grid: {'pk': {...}, 'set': {...}} for keyed
+    # tables, or {'match': {...original row...}, 'set': {...}} otherwise. Only
+    # the columns present in 'set' are written. processed_set and match are
+    # the coerced 'set' and 'match' values.
+    changed = change.get('set')
+    if not isinstance(changed, dict) or not changed:
+        return None
+    schema_by_name = {col['Field']: col for col in schema}
+    unknown = [col for col in changed if col not in schema_by_name]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for table '{table_name}': {', '.join(unknown)}")
+    set_columns = [col['Field'] for col in schema if col['Field'] in changed]
+    set_values = [processed_set[col] for col in set_columns]
+    if pk_columns and isinstance(change.get('pk'), dict):
+        pk = change['pk']
+        missing = [col for col in pk_columns if pk.get(col) in (None, '')]
+        if missing:
+            raise ValueError(f"Missing primary key value(s): {', '.join(missing)}")
+        sql = build_update(table_name, set_columns, pk_columns)
+        return sql, tuple(set_values + [pk[col] for col in pk_columns]), processed_set, pk_columns
+    if isinstance(change.get('match'), dict):
+        match_columns = [col for col in match]
+        if not match_columns:
+            raise ValueError("Invalid change format: empty match")
+        sql = build_update(table_name, set_columns, match_columns, null_safe=True, limit=1)
+        return sql, tuple(set_values + [match[col] for col in match_columns]), processed_set, []
+    raise ValueError("Invalid change format: missing pk or match")
+
+def execute_with_llm_fallback(cursor, sql, params, table_name, processed_row, db_name, columns, pk_columns):
+    try:
+        cursor.execute(sql, params)
+        return False
+    except Exception as e:
+        error_str = str(e)
+        logger.error(f"UPDATE failed: {error_str}")
+        corrected_sql = strip_use_statements(try_llm_correction(sql, error_str, table_name, processed_row, db_name, columns, pk_columns))
+        logger.info(f"Corrected UPDATE SQL: {corrected_sql}")
+        placeholder_count = corrected_sql.count('%s')
+        if placeholder_count != len(params):
+            logger.error(f"Corrected SQL placeholder mismatch: expected {len(params)}, found {placeholder_count}")
+            raise ValueError(f"Corrected SQL has {placeholder_count} placeholders, expected {len(params)}")
+        try:
+            cursor.execute(corrected_sql, params)
+        except Exception as e2:
+            logger.error(f"LLM correction failed: {str(e2)}")
+            raise Exception(f"Original error: {error_str}\nLLM correction failed: {str(e2)}")
+        return True
+
+def _dict_or_empty(item, key):
+    value = item.get(key) if isinstance(item, dict) else None
+    return value if isinstance(value, dict) else {}
+
 @app.route('/api/update/<table_name>', methods=['PUT'])
 def api_update_table(table_name):
     db_name = session.get('db_name')
@@ -490,210 +1169,212 @@ def api_update_table(table_name):
         if not data:
             logger.error("No JSON data received")
             return jsonify({'error': 'No JSON data provided'}), 400
+        changes = data.get('changes')
         rows = data.get('data')
-        if not rows or not isinstance(rows, list):
+        if changes is not None:
+            if not isinstance(changes, list):
+                logger.error("Invalid changes format")
+                return jsonify({'error': 'Invalid changes format'}), 400
+            if not changes:
+                return jsonify({'status': 'No changes to save', 'updated': 0, 'statements': 0})
+        elif not rows or not isinstance(rows, list):
             logger.error("No data provided or invalid data format")
             return jsonify({'error': 'No data provided or invalid format'}), 400
-        conn, error = get_db_connection(db_name)
-        if error:
-            logger.error(f"Database connection error: {error}")
-            return jsonify({'error': error}), 500
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(f"DESCRIBE `{table_name}`")
-        schema = cursor.fetchall()
+        llm_fallback = bool(data.get('llm_fallback', False))
+        schema, pk_columns = describe_table(db_name, table_name)
         if not schema:
-            cursor.close()
-            conn.close()
             logger.error(f"Table '{table_name}' does not exist or has no schema")
             return jsonify({'error': f"Table '{table_name}' does not exist or has no schema"}), 404
         columns = [row['Field'] for row in schema]
-        cursor.execute(f"SHOW KEYS FROM `{table_name}` WHERE Key_name = 'PRIMARY'")
-        pk_info = cursor.fetchall()
-        pk_columns = [row['Column_name'] for row in pk_info] if pk_info else []
         logger.info(f"Table '{table_name}' schema: {columns}, primary keys: {pk_columns}")
 
-        # Get schema for LLM
-        cursor.execute(f"SHOW CREATE TABLE `{table_name}`")
-        create_stmt = cursor.fetchone()['Create Table']
-        column_types = {col['Field']: col['Type'] for col in schema}
-        for item in rows:
-            if pk_columns and 'pk' in item and 'row' in item:
-                pk = item['pk']
-                row = item['row']
-                processed_row = preprocess_row_data(row, schema)
-                # Filter out NULL or incompatible values for SET clause
-                valid_set_columns = [col for col in columns if col not in pk_columns and processed_row.get(col) is not None]
-                if not valid_set_columns:
-                    logger.warning("No valid columns to update")
-                    continue
-                prompt = (
-                    f"Given the following MySQL table schema:\n{create_stmt}\n"
-                    f"Column types: {column_types}\n"
-                    f"Primary keys: {pk_columns}\n"
-                    f"Row data to update: {processed_row}\n"
-                    f"Primary key values: {pk}\n"
-                    f"Generate a MySQL UPDATE query to update the row with the given primary key values. "
-                    f"Use %s placeholders for values in the SET clause (for non-primary key columns: {valid_set_columns}) "
-                    f"and WHERE clause (for primary key columns: {pk_columns}). "
-                    f"Ensure the number of %s placeholders matches the number of non-primary key columns to update ({len(valid_set_columns)}) "
-                    f"plus primary key columns ({len(pk_columns)}). "
-                    f"Ensure values match column types (e.g., 'YYYY-MM-DD' for DATE, numbers for DOUBLE/INT). "
-                    f"Exclude NULL or incompatible values from the SET clause. "
-                    f"Return only the SQL query."
-                )
+        # Coerce the whole batch column by column before building statements.
+        coercer = get_coercer(schema_cache.table(db_name, table_name))
+        items = changes if changes is not None else rows
+        if changes is not None:
+            processed_sets, report = coercer.coerce_rows([_dict_or_empty(item, 'set') for item in items], fill_missing=False)
+            matches, _ = coercer.coerce_rows([_dict_or_empty(item, 'match') for item in items], fill_missing=False, report=report)
+        else:
+            processed, report = coercer.coerce_rows([
+                _dict_or_empty(item, 'row' if pk_columns and 'pk' in item and 'row' in item else 'row_data')
+                for item in items])
+        # Nothing is written when a value does not fit its column: writing it
+        # as NULL would lose the edit, and a NULL in 'match' could update a
+        # different row.
+        if report:
+            logger.warning(f"Invalid values in update of '{table_name}': {report.summary()}")
+            return jsonify({'error': 'Some values do not fit their column types', 'invalid_values': report.to_dict()}), 400
+
+        statements = []
+        processed_rows = {}
+        for i, item in enumerate(items):
+            if changes is not None:
+                built = build_delta_update(table_name, item, processed_sets[i], matches[i], schema, pk_columns)
+            else:
+                built = build_row_update(table_name, item, processed[i], columns, pk_columns)
+            if built is None:
+                logger.warning("No valid columns to update")
+                continue
+            sql, params, processed_row, key_columns = built
+            statements.append((sql, params))
+            processed_rows[(sql, params)] = (processed_row, key_columns)
+        batches = group_statements(statements)
+
+        with db_connection(db_name) as conn:
+            cursor = conn.cursor()
+            updated = 0
+            corrected = 0
+            try:
+                for sql, params_list in batches:
+                    logger.info(f"Executing UPDATE batch of {len(params_list)} row(s): {sql}")
+                    try:
+                        cursor.executemany(sql, params_list)
+                        updated += max(cursor.rowcount, 0)
+                    except Exception as e:
+                        if not llm_fallback:
+                            raise
+                        # Replay the batch row by row so only the rows that actually
+                        # fail are sent to the LLM. UPDATEs by key are idempotent, so
+                        # rows already applied by the failed executemany are harmless.
+                        logger.warning(f"UPDATE batch failed, retrying row by row: {str(e)}")
+                        for params in params_list:
+                            processed_row, key_columns = processed_rows[(sql, params)]
+                            if execute_with_llm_fallback(cursor, sql, params, table_name, processed_row, db_name, columns, key_columns):
+                                corrected += 1
+                            updated += max(cursor.rowcount, 0)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        invalidate_results(db_name, [table_name])
+        logger.info(f"Table '{table_name}' updated successfully ({updated} row(s), {len(batches)} statement(s))")
+        result = {'status': 'Table updated successfully', 'updated': updated, 'statements': len(batches)}
+        if corrected:
+            result['corrected_by_llm'] = corrected
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Update error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/delete/<table_name>', methods=['DELETE'])
+def api_delete_row(table_name):
+    db_name = session.get('db_name')
+    if not db_name:
+        return jsonify({'error': 'No database selected'}), 400
+    data = request.get_json()
+    pk = data.get('pk')
+    row_data = data.get('row_data')
+    try:
+        schema, pk_columns = describe_table(db_name, table_name)
+        columns = [col['Field'] for col in schema]
+        with db_connection(db_name) as conn:
+            cursor = conn.cursor()
+            if pk and pk_columns:
+                where_clause = ' AND '.join([f"`{col}` = %s" for col in pk.keys()])
+                values = list(pk.values())
+                sql = f"DELETE FROM `{table_name}` WHERE {where_clause}"
                 try:
-                    groq_response = groq_client.chat.completions.create(
-                        model="llama3-70b-8192",
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    sql = extract_sql_from_response(groq_response.choices[0].message.content.strip())
-                    sql = strip_use_statements(sql)
-                    logger.info(f"Generated UPDATE SQL: {sql}")
-                    set_values = [processed_row.get(col) for col in valid_set_columns]
-                    pk_values = [pk.get(col) for col in pk_columns]
-                    placeholder_count = sql.count('%s')
-                    expected_count = len(set_values) + len(pk_values)
-                    if placeholder_count != expected_count:
-                        logger.error(f"Placeholder mismatch: expected {expected_count}, found {placeholder_count}")
-                        raise ValueError(f"SQL query has {placeholder_count} placeholders, but {expected_count} values provided")
-                    cursor.execute(sql, set_values + pk_values)
+                    cursor.execute(sql, values)
                 except Exception as e:
                     error_str = str(e)
-                    logger.error(f"UPDATE failed: {error_str}")
+                    processed_row = preprocess_row_data(pk, schema)
                     corrected_sql = try_llm_correction(sql, error_str, table_name, processed_row, db_name, columns, pk_columns)
-                    logger.info(f"Corrected UPDATE SQL: {corrected_sql}")
-                    placeholder_count = corrected_sql.count('%s')
-                    if placeholder_count != expected_count:
-                        logger.error(f"Corrected SQL placeholder mismatch: expected {expected_count}, found {placeholder_count}")
-                        raise ValueError(f"Corrected SQL has {placeholder_count} placeholders, expected {expected_count}")
                     try:
-                        cursor.execute(corrected_sql, set_values + pk_values)
+                        if '%s' in corrected_sql:
+                            cursor.execute(corrected_sql, values)
+                        else:
+                            cursor.execute(corrected_sql)
                     except Exception as e2:
-                        logger.error(f"LLM correction failed: {str(e2)}")
-                        raise Exception(f"Original error: {error_str}\nLLM correction failed: {str(e2)}")
-            elif 'row_data' in item:
-                row_data = item['row_data']
-                processed_row = preprocess_row_data(row_data, schema)
-                valid_set_columns = [col for col in columns if processed_row.get(col) is not None]
-                if not valid_set_columns:
-                    logger.warning("No valid columns to update")
-                    continue
-                prompt = (
-                    f"Given the following MySQL table schema:\n{create_stmt}\n"
-                    f"Column types: {column_types}\n"
-                    f"Row data to update: {processed_row}\n"
-                    f"Generate a MySQL UPDATE query to update the row where all column values match the provided data. "
-                    f"Use %s placeholders for values in the SET clause and WHERE clause (for columns: {valid_set_columns}). "
-                    f"Ensure the number of %s placeholders matches the number of columns to update ({len(valid_set_columns)}) "
-                    f"for SET and ({len(valid_set_columns)}) for WHERE. "
-                    f"Ensure values match column types (e.g., 'YYYY-MM-DD' for DATE, numbers for DOUBLE/INT). "
-                    f"Exclude NULL or incompatible values from the SET clause. "
-                    f"Return only the SQL query."
-                )
+                        return jsonify({'error': f'Original error: {error_str}\nLLM correction failed: {str(e2)}'})
+            elif row_data:
+                processed_row = preprocess_row_data(row_data, [col for col in schema if col['Field'] in row_data])
+                where_clause = ' AND '.join([f"`{col}` = %s" for col in row_data.keys()])
+                values = list(processed_row.values())
+                sql = f"DELETE FROM `{table_name}` WHERE {where_clause}"
                 try:
-                    groq_response = groq_client.chat.completions.create(
-                        model="llama3-70b-8192",
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    sql = extract_sql_from_response(groq_response.choices[0].message.content.strip())
-                    sql = strip_use_statements(sql)
-                    logger.info(f"Generated UPDATE SQL: {sql}")
-                    set_values = [processed_row.get(col) for col in valid_set_columns]
-                    where_values = [processed_row.get(col) for col in valid_set_columns]
-                    placeholder_count = sql.count('%s')
-                    expected_count = len(set_values) + len(where_values)
-                    if placeholder_count != expected_count:
-                        logger.error(f"Placeholder mismatch: expected {expected_count}, found {placeholder_count}")
-                        raise ValueError(f"SQL query has {placeholder_count} placeholders, but {expected_count} values provided")
-                    cursor.execute(sql, set_values + where_values)
+                    cursor.execute(sql, values)
                 except Exception as e:
                     error_str = str(e)
-                    logger.error(f"UPDATE failed: {error_str}")
                     corrected_sql = try_llm_correction(sql, error_str, table_name, processed_row, db_name, columns, [])
-                    logger.info(f"Corrected UPDATE SQL: {corrected_sql}")
-                    placeholder_count = corrected_sql.count('%s')
-                    if placeholder_count != expected_count:
-                        logger.error(f"Corrected SQL placeholder mismatch: expected {expected_count}, found {placeholder_count}")
-                        raise ValueError(f"Corrected SQL has {placeholder_count} placeholders, expected {expected_count}")
                     try:
-                        cursor.execute(corrected_sql, set_values + where_values)
+                        if '%s' in corrected_sql:
+                            cursor.execute(corrected_sql, values)
+                        else:
+                            cursor.execute(corrected_sql)
                     except Exception as e2:
-                        logger.error(f"LLM correction failed: {str(e2)}")
-                        raise Exception(f"Original error: {error_str}\nLLM correction failed: {str(e2)}")
+                        return jsonify({'error': f'Original error: {error_str}\nLLM correction failed: {str(e2)}'})
             else:
-                logger.error("Invalid row format: missing pk or row_data")
-                raise ValueError("Invalid row format: missing pk or row_data")
-        conn.commit()
-        logger.info(f"Table '{table_name}' updated successfully")
-        return jsonify({'status': 'Table updated successfully'})
+                return jsonify({'error': 'No identifier provided'}), 400
+            conn.commit()
+            cursor.close()
+        invalidate_results(db_name, [table_name])
+        return jsonify({'status': 'Row deleted successfully'})
     except Exception as e:
-        logger.error(f"Update error: {str(e)}")
         return jsonify({'error': str(e)}), 500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
-@app.route('/api/delete/<table_name>', methods=['DELETE'])
-def api_delete_row(table_name):
+@app.route('/api/delete/<table_name>/bulk', methods=['POST'])
+def api_bulk_delete(table_name):
+    # {'pks': [{pk...}, ...]} for keyed tables or {'matches': [{full row}, ...]}
+    # otherwise; everything is deleted in one transaction.
     db_name = session.get('db_name')
     if not db_name:
         return jsonify({'error': 'No database selected'}), 400
-    data = request.get_json()
-    pk = data.get('pk')
-    row_data = data.get('row_data')
+    data = request.get_json(silent=True) or {}
+    pks = data.get('pks') or []
+    matches = data.get('matches') or []
+    if not isinstance(pks, list) or not isinstance(matches, list) or \
+            not all(isinstance(item, dict) and item for item in pks + matches):
+        return jsonify({'error': 'pks and matches must be lists of objects'}), 400
+    if not pks and not matches:
+        return jsonify({'error': 'No identifier provided'}), 400
     try:
-        conn, error = get_db_connection(db_name)
-        if error:
-            return jsonify({'error': error}), 500
-        cursor = conn.cursor()
-        cursor.execute(f"DESCRIBE `{table_name}`")
-        schema = cursor.fetchall()
-        cursor.execute(f"SHOW KEYS FROM `{table_name}` WHERE Key_name = 'PRIMARY'")
-        pk_info = cursor.fetchall()
-        pk_columns = [row[4] for row in pk_info] if pk_info else []
-        if pk and pk_columns:
-            where_clause = ' AND '.join([f"`{col}` = %s" for col in pk.keys()])
-            values = list(pk.values())
-            sql = f"DELETE FROM `{table_name}` WHERE {where_clause}"
-            try:
-                cursor.execute(sql, values)
-            except Exception as e:
-                error_str = str(e)
-                processed_row = preprocess_row_data(pk, [dict(zip([desc[0] for desc in cursor.description], s)) for s in schema])
-                corrected_sql = try_llm_correction(sql, error_str, table_name, processed_row, db_name, values)
-                try:
-                    if '%s' in corrected_sql:
-                        cursor.execute(corrected_sql, values)
-                    else:
-                        cursor.execute(corrected_sql)
-                except Exception as e2:
-                    return jsonify({'error': f'Original error: {error_str}\nLLM correction failed: {str(e2)}'})
-        elif row_data:
-            processed_row = preprocess_row_data(row_data, [dict(zip([desc[0] for desc in cursor.description], s)) for s in schema])
-            where_clause = ' AND '.join([f"`{col}` = %s" for col in row_data.keys()])
-            values = list(processed_row.values())
-            sql = f"DELETE FROM `{table_name}` WHERE {where_clause}"
+        table = schema_cache.table(db_name, table_name)
+        if table is None:
+            return jsonify({'error': f"Table '{table_name}' does not exist"}), 404
+        pk_columns = table.primary_key
+        if pks and not pk_columns:
+            return jsonify({'error': f"Table '{table_name}' has no primary key; send matches instead"}), 400
+        coercer = get_coercer(table)
+        keys, report = coercer.coerce_rows(pks, columns=pk_columns)
+        match_rows, _ = coercer.coerce_rows(matches, fill_missing=False, report=report)
+        # A value that cannot be converted would match the wrong row (or none).
+        if report:
+            return jsonify({'error': 'Some identifiers do not fit their column types', 'invalid_values': report.to_dict()}), 400
+        missing = [i for i, key in enumerate(keys) if any(key[col] is None for col in pk_columns)]
+        if missing:
+            return jsonify({'error': f"Missing primary key value(s) in item(s): {missing[:10]}"}), 400
+        key_params = list(dict.fromkeys(tuple(key[col] for col in pk_columns) for key in keys))
+        match_groups = group_statements(
+            (build_delete_match(table_name, list(row)), tuple(row.values())) for row in match_rows if row)
+
+        chunks = []
+        with db_connection(db_name) as conn:
+            cursor = conn.cursor()
             try:
-                cursor.execute(sql, values)
-            except Exception as e:
-                error_str = str(e)
-                corrected_sql = try_llm_correction(sql, error_str, table_name, processed_row, db_name, values)
-                try:
-                    if '%s' in corrected_sql:
-                        cursor.execute(corrected_sql, values)
-                    else:
-                        cursor.execute(corrected_sql)
-                except Exception as e2:
-                    return jsonify({'error': f'Original error: {error_str}\nLLM correction failed: {str(e2)}'})
-        else:
-            return jsonify({'error': 'No identifier provided'}), 400
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return jsonify({'status': 'Row deleted successfully'})
+                for start in range(0, len(key_params), DELETE_CHUNK_SIZE):
+                    part = key_params[start:start + DELETE_CHUNK_SIZE]
+                    cursor.execute(build_delete_in(table_name, pk_columns, len(part)), [v for key in part for v in key])
+                    chunks.append({'by': 'primary_key', 'rows': len(part), 'deleted': max(cursor.rowcount, 0)})
+                for sql, params_list in match_groups:
+                    for start in range(0, len(params_list), DELETE_CHUNK_SIZE):
+                        part = params_list[start:start + DELETE_CHUNK_SIZE]
+                        cursor.executemany(sql, part)
+                        chunks.append({'by': 'match', 'rows': len(part), 'deleted': max(cursor.rowcount, 0)})
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        invalidate_results(db_name, [table_name])
+        deleted = sum(chunk['deleted'] for chunk in chunks)
+        logger.info(f"Bulk delete on '{table_name}': {deleted} row(s) in {len(chunks)} chunk(s)")
+        return jsonify({'status': 'Rows deleted successfully', 'deleted': deleted,
+                        'requested': len(key_params) + len(match_rows), 'chunks': chunks})
     except Exception as e:
+        logger.error(f"Bulk delete error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/pk/<table_name>', methods=['GET'])
@@ -702,15 +1383,7 @@ def api_get_primary_key(table_name):
     if not db_name:
         return jsonify({'error': 'No database selected'}), 400
     try:
-        conn, error = get_db_connection(db_name)
-        if error:
-            return jsonify({'error': error}), 500
-        cursor = conn.cursor()
-        cursor.execute(f"SHOW KEYS FROM `{table_name}` WHERE Key_name = 'PRIMARY'")
-        pk_info = cursor.fetchall()
-        pk_columns = [row[4] for row in pk_info]
-        cursor.close()
-        conn.close()
+        _, pk_columns = describe_table(db_name, table_name)
         return jsonify({'primary_key': pk_columns})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -721,19 +1394,90 @@ def api_describe_table(table_name):
     if not db_name:
         return jsonify({'error': 'No database selected'}), 400
     try:
-        conn, error = get_db_connection(db_name)
-        if error:
-            return jsonify({'error': error}), 500
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(f"DESCRIBE `{table_name}`")
-        schema = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        schema, _ = describe_table(db_name, table_name)
+        if not schema:
+            return jsonify({'error': f"Table '{table_name}' doesn't exist"}), 404
         return jsonify(schema)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs', methods=['GET'])
+def api_jobs():
+    # This session's jobs; every session's with ?all=1 when SHOW_ALL_SESSIONS is on.
+    try:
+        everyone = list_all_sessions()
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    return jsonify({'jobs': [dict(job.to_dict(), mine=owned_by_session(job.owner)) for job in jobs.list()
+                             if everyone or owned_by_session(job.owner)]})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job(job_id):
+    job = jobs.get(job_id)
+    if job is None or not owned_by_session(job.owner):
+        return jsonify({'error': 'Job not found'}), 404
+    if job_id == session.get('import_job'):
+        adopt_finished_import()
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    job = jobs.get(job_id)
+    if job is None or not owned_by_session(job.owner):
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(jobs.cancel(job_id).to_dict())
+
+@app.route('/api/queries', methods=['GET'])
+def api_queries():
+    # This session's in-flight queries; every session's with ?all=1 when
+    # SHOW_ALL_SESSIONS is on.
+    try:
+        everyone = list_all_sessions()
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    queries = [dict(query.to_dict(), mine=owned_by_session(query.session_id)) for query in running_queries.list()
+               if everyone or owned_by_session(query.session_id)]
+    return jsonify({'queries': queries, 'stats': running_queries.stats()})
+
+@app.route('/api/queries/<query_id>/cancel', methods=['POST'])
+def api_cancel_query(query_id):
+    # Only the session that started a query may cancel it.
+    query = running_queries.get(query_id)
+    if query is None or not owned_by_session(query.session_id):
+        return jsonify({'error': 'Query not found'}), 404
+    running_queries.cancel(query_id)
+    return jsonify(query.to_dict())
+
+@app.route('/api/pool/stats', methods=['GET'])
+def api_pool_stats():
+    return jsonify({'pools': db_pools.stats(), 'config': pool_config})
+
+@app.route('/api/schema/stats', methods=['GET'])
+def api_schema_stats():
+    return jsonify(schema_cache.stats())
+
+@app.route('/api/llm/stats', methods=['GET'])
+def api_llm_stats():
+    stats = llm.stats()
+    stats['prompts'] = prompt_stats.stats()
+    return jsonify(stats)
+
+@app.route('/api/result-cache/stats', methods=['GET'])
+def api_result_cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/api/nl-cache/stats', methods=['GET'])
+def api_nl_cache_stats():
+    return jsonify(nl_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def api_metrics():
+    pool_connections.clear()
+    for name, stats in db_pools.stats().items():
+        for state in ('in_use', 'idle'):
+            pool_connections.set(stats[state], database=name, state=state)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
-    if not os.path.exists(app.config['UPLOAD_FOLDER']):
-        os.makedirs(app.config['UPLOAD_FOLDER'])
+    # Development server; see gunicorn.conf.py for production serving.
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
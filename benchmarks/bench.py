@@ -0,0 +1,364 @@
+"""Load test of the hot routes against a seeded hospital database and a stub LLM.
+
+    python benchmarks/bench.py --rows 100000 --seed-db --concurrency 1,8,32
+    python benchmarks/bench.py --rows 100000 --save-baseline benchmarks/baseline.json
+    python benchmarks/bench.py --rows 100000 --baseline benchmarks/baseline.json
+
+The app runs in this process behind werkzeug's threaded server, so peak RSS
+is the server's (plus the small client threads). MySQL settings come from the
+same DB_* environment variables / .env as the app.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import seed  # noqa: E402
+
+SCENARIOS = ('query_raw', 'query_nl', 'table', 'update', 'delete', 'upload')
+
+# Questions for the NL scenario and the SQL the stub LLM answers them with.
+NL_ANSWERS = {
+    'How many patients are there?': 'SELECT COUNT(*) AS patients FROM patient',
+    'Total billed amount per bill status': 'SELECT status, SUM(amount) AS total FROM bill GROUP BY status',
+    'The 20 most recent appointments with the doctor name':
+        'SELECT a.appt_id, a.appt_date, d.first_name, d.last_name FROM appointment a '
+        'JOIN doctor d ON d.doc_id = a.doc_id ORDER BY a.appt_date DESC LIMIT 20',
+    'Number of appointments per department':
+        'SELECT dp.name, COUNT(*) AS appointments FROM appointment a JOIN doctor d ON d.doc_id = a.doc_id '
+        'JOIN department dp ON dp.dept_id = d.dept_id GROUP BY dp.name',
+    'Patients born before 1950': "SELECT patient_id, first_name, last_name FROM patient WHERE dob < '1950-01-01' LIMIT 100",
+}
+_REQUEST = re.compile(r"Request:\s*(.*)\s*$", re.DOTALL)
+_ROUND_TRIPS = re.compile(r'db;desc="round trips: (\d+)"')
+
+
+def stub_responder(prompt):
+    match = _REQUEST.search(prompt)
+    question = match.group(1).strip() if match else ''
+    return NL_ANSWERS.get(question, 'SELECT 1')
+
+
+class Client:
+    # Minimal HTTP client with the session cookie that selects the database.
+    def __init__(self, base_url, cookie):
+        self.base_url = base_url
+        self.cookie = cookie
+
+    def request(self, method, path, body=None, content_type='application/json', accept='application/json'):
+        if body is not None and content_type == 'application/json':
+            body = json.dumps(body).encode('utf-8')
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        req.add_header('Cookie', self.cookie)
+        req.add_header('Accept', accept)
+        if body is not None:
+            req.add_header('Content-Type', content_type)
+        try:
+            with urllib.request.urlopen(req, timeout=300) as resp:
+                return resp.status, resp.headers, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+
+def _multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/sql\r\n\r\n").encode('utf-8') + data + f"\r\n--{boundary}--\r\n".encode('utf-8')
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Workload:
+    # Builds the request for the i-th call of each scenario. Deletes consume
+    # prescription ids in order, so re-seed (--seed-db) before repeating a run
+    # that deleted more rows than the table has.
+    def __init__(self, sizes, upload_rows, rng_seed=7):
+        self.sizes = sizes
+        self.rng = random.Random(rng_seed)
+        self.lock = threading.Lock()
+        self.next_delete = 0
+        self.uploads = []
+        fd, self.upload_path = tempfile.mkstemp(suffix='.sql')
+        os.close(fd)
+        seed.write_dump(self.upload_path, '__DB__', upload_rows)
+        with open(self.upload_path, 'rb') as f:
+            self.upload_template = f.read()
+
+    def _randint(self, table):
+        with self.lock:
+            return self.rng.randint(1, self.sizes[table])
+
+    def call(self, client, scenario):
+        if scenario == 'query_raw':
+            sql = self.rng.choice([
+                f"SELECT * FROM patient WHERE patient_id = {self._randint('patient')}",
+                f"SELECT * FROM appointment WHERE patient_id = {self._randint('patient')}",
+                "SELECT status, COUNT(*) AS n, SUM(amount) AS total FROM bill GROUP BY status",
+                "SELECT appt_id, appt_date, reason FROM appointment ORDER BY appt_id DESC LIMIT 100",
+            ])
+            return client.request('POST', '/api/query', {'query': sql})
+        if scenario == 'query_nl':
+            question = self.rng.choice(list(NL_ANSWERS))
+            return client.request('POST', '/api/query', {'query': question, 'is_natural_language': True,
+                                                         'bypass_cache': True})
+        if scenario == 'table':
+            table = self.rng.choice(['patient', 'appointment', 'bill'])
+            return client.request('GET', f"/api/table/{table}?limit=100")
+        if scenario == 'update':
+            change = {'pk': {'patient_id': self._randint('patient')},
+                      'set': {'phone': f"555-{self._randint('patient') % 10000:04d}"}}
+            return client.request('PUT', '/api/update/patient', {'changes': [change]})
+        if scenario == 'delete':
+            with self.lock:
+                self.next_delete += 1
+                presc_id = self.next_delete
+            return client.request('DELETE', '/api/delete/prescription', {'pk': {'presc_id': presc_id}})
+        if scenario == 'upload':
+            return self.upload(client)
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    def upload(self, client):
+        # Queues the import and waits for the job, so the latency covers the load.
+        db_name = f"bench_upload_{uuid.uuid4().hex[:8]}"
+        with self.lock:
+            self.uploads.append(db_name)
+        body, content_type = _multipart('sql_file', f"{db_name}.sql",
+                                        self.upload_template.replace(b'__DB__', db_name.encode('ascii')))
+        status, headers, data = client.request('POST', '/upload', body, content_type)
+        if status != 202:
+            return status, headers, data
+        job_url = json.loads(data)['status_url']
+        while True:
+            status, headers, data = client.request('GET', job_url)
+            job = json.loads(data) if status == 200 else {}
+            if status != 200 or job.get('status') in ('succeeded', 'failed', 'cancelled'):
+                return (status if job.get('status') != 'failed' else 500), headers, data
+            time.sleep(0.05)
+
+    def cleanup(self, app_module):
+        os.remove(self.upload_path)
+        folder = app_module.app.config['UPLOAD_FOLDER']
+        for name in os.listdir(folder) if os.path.isdir(folder) else []:
+            if '_bench_upload_' in name:
+                os.remove(os.path.join(folder, name))
+        if self.uploads:
+            with app_module.db_connection() as conn:
+                cursor = conn.cursor()
+                for db_name in self.uploads:
+                    cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`")
+                cursor.close()
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return None
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(workload, client, scenario, concurrency, requests):
+    latencies = []
+    round_trips = []
+    errors = {}
+    remaining = [requests]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                status, headers, _ = workload.call(client, scenario)
+            except Exception as e:
+                status, headers = type(e).__name__, {}
+            elapsed = time.perf_counter() - started
+            timing = _ROUND_TRIPS.search(headers.get('Server-Timing', '') if headers else '')
+            with lock:
+                latencies.append(elapsed)
+                if timing:
+                    round_trips.append(int(timing.group(1)))
+                if status not in (200, 201, 202):
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        'db_round_trips': round(sum(round_trips) / len(round_trips), 2) if round_trips else None,
+        'rss_mb': round(_rss_mb() or 0, 1),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Regressions: p95 latency up or throughput down by more than `tolerance`.
+    regressions = []
+    for scenario, levels in results.items():
+        for level, current in levels.items():
+            previous = baseline.get('results', {}).get(scenario, {}).get(level)
+            if not previous:
+                continue
+            if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{scenario} c={level}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+            if previous['throughput'] and current['throughput'] < previous['throughput'] * (1 - tolerance):
+                regressions.append(f"{scenario} c={level}: throughput {previous['throughput']}/s -> "
+                                   f"{current['throughput']}/s")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def _database_exists(app_module, db_name):
+    with app_module.db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (db_name,))
+        exists = cursor.fetchone()[0] > 0
+        cursor.close()
+    return exists
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help='approximate rows in the seeded database')
+    parser.add_argument('--db', default='hospital_bench', help='database to seed and query')
+    parser.add_argument('--seed-db', action='store_true', help='(re)seed the database even if it exists')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated client thread counts')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario and concurrency level')
+    parser.add_argument('--upload-rows', type=int, default=1000, help='rows in each uploaded dump')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='stub LLM latency in seconds')
+    parser.add_argument('--warm-caches', action='store_true',
+                        help='keep the result and NL caches on (default: measure the uncached path)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against results saved by --save-baseline')
+    parser.add_argument('--save-baseline', help='write the results to this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed regression, as a fraction')
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(',')]
+
+    # The app reads its configuration at import time.
+    os.environ['LLM_BACKEND'] = 'stub'
+    if not args.warm_caches:
+        os.environ['RESULT_CACHE_MAX_BYTES'] = '0'
+    os.environ.setdefault('DB_POOL_SIZE', str(max(10, max(levels) + 2)))
+    import app as app_module
+    from llm_gateway import StubBackend
+    from werkzeug.serving import make_server
+
+    app_module.llm.backend = StubBackend(stub_responder, latency=args.llm_latency)
+    if args.seed_db or not _database_exists(app_module, args.db):
+        started = time.monotonic()
+        with app_module.db_connection() as conn:
+            seed.seed_database(conn, args.db, args.rows)
+        print(f"Seeded {args.db} with ~{args.rows} rows in {time.monotonic() - started:.1f}s")
+    sizes = seed.table_sizes(args.rows)
+
+    os.makedirs(app_module.app.config['UPLOAD_FOLDER'], exist_ok=True)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    serializer = app_module.app.session_interface.get_signing_serializer(app_module.app)
+    cookie = f"{app_module.app.config['SESSION_COOKIE_NAME']}={serializer.dumps({'db_name': args.db})}"
+    client = Client(base_url, cookie)
+    workload = Workload(sizes, args.upload_rows)
+
+    results = {}
+    try:
+        # Warm-up: pools, schema cache and first-use imports are not measured.
+        for scenario in ('query_raw', 'table'):
+            workload.call(client, scenario)
+        for scenario in scenarios:
+            results[scenario] = {}
+            for level in levels:
+                stats = run_scenario(workload, client, scenario, level, args.requests)
+                results[scenario][str(level)] = stats
+                print(f"{scenario:10} c={level:<4} {stats['throughput']:>8}/s  p50 {stats['p50_ms']:>8}ms  "
+                      f"p95 {stats['p95_ms']:>8}ms  p99 {stats['p99_ms']:>8}ms  "
+                      f"rt {stats['db_round_trips']}  rss {stats['rss_mb']}MB  errors {stats['errors'] or '-'}")
+    finally:
+        server.shutdown()
+        workload.cleanup(app_module)
+
+    report = {
+        'meta': {
+            'rows': args.rows, 'tables': sizes, 'requests': args.requests, 'llm_latency': args.llm_latency,
+            'warm_caches': args.warm_caches, 'commit': _git_commit(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('rows') != args.rows:
+            print(f"Warning: baseline was taken with {baseline['meta'].get('rows')} rows")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
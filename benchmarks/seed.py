@@ -0,0 +1,181 @@
+"""Scaled, reproducible copies of the bundled hospital_db dump for benchmarks."""
+import os
+import random
+import re
+import sys
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sql_builder import quote_identifier  # noqa: E402
+from sql_import import SqlStatementReader  # noqa: E402
+
+SOURCE_DUMP = os.path.join(ROOT, 'uploads', 'hospital_db')
+
+FIRST_NAMES = ['Sara', 'Omar', 'Aisha', 'Bilal', 'Zainab', 'Ahmad', 'Fariha', 'Kamran', 'Mira', 'Usman',
+               'Hassan', 'Mariam', 'Ali', 'Farah', 'Ayesha', 'Laila', 'Zara', 'Imran', 'Nadia', 'Tariq']
+LAST_NAMES = ['Ahmed', 'Khan', 'Ali', 'Hussain', 'Farooq', 'Yousaf', 'Javed', 'Rizvi', 'Saeed', 'Iqbal',
+              'Malik', 'Niazi', 'Fatima', 'Nasir', 'Zafar', 'Raza', 'Shahid', 'Imran', 'Yasir', 'Qureshi']
+DEPARTMENTS = [('Cardiology', 'Building A'), ('Neurology', 'Building B'), ('Pediatrics', 'Building C'),
+               ('Oncology', 'Building D'), ('Orthopedics', 'Building E'), ('Emergency', 'Building A'),
+               ('Radiology', 'Building B'), ('Pathology', 'Building C'), ('Dermatology', 'Building D'),
+               ('Urology', 'Building E')]
+REASONS = ['Chest pain', 'Headache', 'Fever', 'Follow-up', 'Fracture', 'Rash', 'Checkup', 'Back pain',
+           'Cough', 'Allergy']
+MEDICINES = ['Aspirin', 'Ibuprofen', 'Paracetamol', 'Amoxicillin', 'Metformin', 'Atorvastatin',
+             'Omeprazole', 'Cetirizine', 'Lisinopril', 'Prednisone']
+BILL_STATUSES = ['Paid', 'Pending', 'Overdue']
+STREETS = ['Baker St', 'Elm Rd', 'Pine St', 'Oak Ave', 'Maple Dr', 'Cedar Rd', 'Birch St', 'Walnut Ln']
+EPOCH = date(2020, 1, 1)
+
+# Rows per patient for the tables that grow with the data set; the fixed-size
+# tables (department) and the staff tables scale more slowly.
+PER_PATIENT = {'appointment': 2, 'prescription': 2, 'bill': 2, 'admission': 0.5, 'nurse_assignment': 0.5}
+ROWS_PER_PATIENT = 1 + sum(PER_PATIENT.values()) + 1 / 50 + 1 / 25 + 1 / 20
+
+
+def table_sizes(total_rows):
+    # Row counts per table for a data set of roughly total_rows rows.
+    patients = max(10, int(total_rows / ROWS_PER_PATIENT))
+    sizes = {
+        'department': len(DEPARTMENTS),
+        'doctor': max(10, patients // 50),
+        'patient': patients,
+        'room': max(10, patients // 20),
+        'nurse': max(10, patients // 25),
+    }
+    for table, ratio in PER_PATIENT.items():
+        sizes[table] = max(10, int(patients * ratio))
+    return sizes
+
+
+def schema_statements(source=SOURCE_DUMP):
+    # The dump's CREATE TABLE statements, in dump order (parents first).
+    with open(source, 'rb') as f:
+        return [sql for sql in SqlStatementReader(f) if re.match(r"CREATE\s+TABLE\s", sql, re.IGNORECASE)]
+
+
+def _person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _day(rng, span_days=2000):
+    return EPOCH + timedelta(days=rng.randrange(span_days))
+
+
+def table_rows(table, sizes, rng):
+    # Yields the rows of `table` in the dump's column order.
+    n = sizes[table]
+    if table == 'department':
+        for i, (name, location) in enumerate(DEPARTMENTS, 1):
+            yield (i, name, location)
+    elif table == 'doctor':
+        for i in range(1, n + 1):
+            first, last = _person(rng)
+            yield (i, first, last, rng.randint(1, sizes['department']),
+                   f"{first.lower()}.{last.lower()}{i}@hospital.com", f"555-{i % 10000:04d}")
+    elif table == 'patient':
+        for i in range(1, n + 1):
+            first, last = _person(rng)
+            yield (i, first, last, date(1940, 1, 1) + timedelta(days=rng.randrange(30000)),
+                   rng.choice(('Male', 'Female')), f"555-{rng.randrange(10000):04d}",
+                   f"{rng.randint(1, 999)} {rng.choice(STREETS)}, City")
+    elif table == 'appointment':
+        for i in range(1, n + 1):
+            yield (i, rng.randint(1, sizes['patient']), rng.randint(1, sizes['doctor']), _day(rng),
+                   f"{rng.randint(8, 17):02d}:{rng.choice((0, 15, 30, 45)):02d}:00", rng.choice(REASONS))
+    elif table == 'prescription':
+        for i in range(1, n + 1):
+            yield (i, rng.randint(1, sizes['appointment']), rng.choice(MEDICINES),
+                   f"{rng.choice((5, 10, 20, 250, 500))}mg", f"{rng.randint(3, 30)} days")
+    elif table == 'bill':
+        for i in range(1, n + 1):
+            yield (i, rng.randint(1, sizes['appointment']), round(rng.uniform(20, 5000), 2), _day(rng),
+                   rng.choice(BILL_STATUSES))
+    elif table == 'room':
+        for i in range(1, n + 1):
+            yield (i, f"R{i:05d}", rng.randint(1, sizes['department']), rng.randint(1, 4))
+    elif table == 'admission':
+        for i in range(1, n + 1):
+            admitted = _day(rng)
+            yield (i, rng.randint(1, sizes['patient']), rng.randint(1, sizes['room']), admitted,
+                   admitted + timedelta(days=rng.randint(1, 20)))
+    elif table == 'nurse':
+        for i in range(1, n + 1):
+            first, last = _person(rng)
+            yield (i, first, last, rng.randint(1, sizes['department']), f"555-{rng.randrange(10000):04d}")
+    elif table == 'nurse_assignment':
+        for i in range(1, n + 1):
+            yield (i, rng.randint(1, sizes['admission']), rng.randint(1, sizes['nurse']), _day(rng))
+    else:
+        raise ValueError(f"Unknown table: {table}")
+
+
+def _table_name(create_sql):
+    return re.match(r"CREATE\s+TABLE\s+`?(\w+)`?", create_sql, re.IGNORECASE).group(1)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed_database(conn, db_name, total_rows, seed=42, batch_size=5000, log=print):
+    """(Re)create `db_name` with roughly total_rows rows over `conn`.
+
+    The same seed and size always produce the same data. Returns the row
+    count per table.
+    """
+    rng = random.Random(seed)
+    sizes = table_sizes(total_rows)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {quote_identifier(db_name)}")
+    cursor.execute(f"CREATE DATABASE {quote_identifier(db_name)}")
+    cursor.execute(f"USE {quote_identifier(db_name)}")
+    conn.autocommit = False
+    creates = schema_statements()
+    for create_sql in creates:
+        cursor.execute(create_sql)
+        table = _table_name(create_sql)
+        marks = None
+        for batch in _batches(table_rows(table, sizes, rng), batch_size):
+            marks = marks or ', '.join(['%s'] * len(batch[0]))
+            cursor.executemany(f"INSERT INTO {quote_identifier(table)} VALUES ({marks})", batch)
+            conn.commit()
+        log(f"seeded {table}: {sizes[table]} rows")
+    cursor.execute(f"ANALYZE TABLE {', '.join(quote_identifier(_table_name(sql)) for sql in creates)}")
+    cursor.fetchall()
+    cursor.close()
+    return sizes
+
+
+def _literal(value):
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "''") + "'"
+
+
+def write_dump(path, db_name, total_rows, seed=42, rows_per_insert=1000):
+    # The same data as seed_database, as a .sql dump in the bundled file's
+    # layout (DROP/CREATE DATABASE, USE, then CREATE TABLE + INSERTs).
+    rng = random.Random(seed)
+    sizes = table_sizes(total_rows)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"DROP DATABASE IF EXISTS {db_name};\nCREATE DATABASE {db_name};\nUSE {db_name};\n\n")
+        for create_sql in schema_statements():
+            table = _table_name(create_sql)
+            f.write(create_sql + ';\n')
+            for batch in _batches(table_rows(table, sizes, rng), rows_per_insert):
+                f.write(f"INSERT INTO {table} VALUES\n")
+                f.write(',\n'.join('(' + ','.join(_literal(v) for v in row) + ')' for row in batch))
+                f.write(';\n')
+            f.write('\n')
+    return sizes
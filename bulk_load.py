@@ -0,0 +1,310 @@
+"""CSV / Parquet ingestion: schema inference, column-wise coercion and bulk loading."""
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+import pandas as pd
+
+from coercion import CoercionReport, compile_column
+from sql_builder import quote_identifier
+
+logger = logging.getLogger(__name__)
+
+# Cell values read as NULL from CSV files.
+NULL_MARKERS = ['', 'NULL', 'null', '\\N']
+LOAD_METHODS = ('auto', 'load_data', 'executemany')
+
+_INTEGER = r'[+-]?\d+'
+_TZ_SUFFIX = r'(?:Z|[+-]\d{2}:?\d{2})$'
+
+
+class BulkLoadError(Exception):
+    pass
+
+
+class LoadCancelled(BulkLoadError):
+    pass
+
+
+def file_format(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in ('.csv', '.txt'):
+        return 'csv'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    raise BulkLoadError(f"Unsupported file type: {ext or filename}")
+
+
+def read_frames(path, fmt, chunk_rows=10000):
+    # Yields DataFrames of at most chunk_rows rows. CSV cells stay strings so
+    # type inference and coercion see exactly what was in the file.
+    if fmt == 'csv':
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, na_values=NULL_MARKERS,
+                               chunksize=chunk_rows)
+        return
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise BulkLoadError('Parquet support requires pyarrow (pip install pyarrow)')
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def infer_column_type(series):
+    if pd.api.types.is_bool_dtype(series):
+        return 'TINYINT(1)'
+    if pd.api.types.is_integer_dtype(series):
+        return 'BIGINT'
+    if pd.api.types.is_float_dtype(series):
+        return 'DOUBLE'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'DATETIME'
+    text = series.dropna().astype(str).str.strip()
+    if text.empty:
+        return 'TEXT'
+    # Leading zeros (zip codes, account numbers) mean the value is an identifier.
+    if not text.str.match(r'[+-]?0\d').any():
+        if text.str.fullmatch(_INTEGER).all():
+            numbers = pd.to_numeric(text, errors='coerce')
+            if numbers.notna().all() and numbers.abs().max() < 2 ** 31:
+                return 'INT'
+            return 'BIGINT' if text.str.len().max() <= 18 else 'DECIMAL(65,0)'
+        if pd.to_numeric(text, errors='coerce').notna().all():
+            return 'DOUBLE'
+    if text.str.lower().isin(['true', 'false']).all():
+        return 'TINYINT(1)'
+    dates = pd.to_datetime(text.str.replace(_TZ_SUFFIX, '', regex=True), errors='coerce', format='ISO8601')
+    if dates.notna().all():
+        return 'DATE' if (text.str.len() <= 10).all() else 'DATETIME'
+    longest = int(text.str.len().max())
+    if longest <= 255:
+        return 'VARCHAR(255)'
+    return 'TEXT' if longest <= 16383 else 'MEDIUMTEXT'
+
+
+def infer_schema(frame):
+    return [(str(name), infer_column_type(frame[name])) for name in frame.columns]
+
+
+# Inferred types from narrowest to widest, per family.
+_NUMERIC = ['TINYINT(1)', 'INT', 'BIGINT', 'DECIMAL(65,0)', 'DOUBLE']
+_TEMPORAL = ['DATE', 'DATETIME']
+_TEXT = ['VARCHAR(255)', 'TEXT', 'MEDIUMTEXT']
+
+
+def widen_type(current, new):
+    # A type that holds the values of both: the wider of the two within a
+    # family, and text once the families differ (e.g. ids that turn out to
+    # contain letters).
+    if current == new:
+        return current
+    for family in (_NUMERIC, _TEMPORAL, _TEXT):
+        if current in family and new in family:
+            return family[max(family.index(current), family.index(new))]
+    text = [typ for typ in (current, new) if typ in _TEXT]
+    return max(text, key=_TEXT.index) if text else 'VARCHAR(255)'
+
+
+def widen_schema(schema, frame):
+    # schema with each column widened to fit frame as well; columns that are
+    # absent or all NULL in frame keep their type.
+    by_name = {str(name): name for name in frame.columns}
+    widened = []
+    for name, typ in schema:
+        series = frame[by_name[name]] if name in by_name else None
+        if series is not None and series.notna().any():
+            typ = widen_type(typ, infer_column_type(series))
+        widened.append((name, typ))
+    return widened
+
+
+def _scratch_name(table_name, label):
+    # MySQL identifiers are at most 64 characters.
+    return f"{table_name[:48]}__{label}_{uuid.uuid4().hex[:6]}"
+
+
+def create_table_sql(table_name, schema):
+    columns = ',\n  '.join(f"{quote_identifier(name)} {typ}" for name, typ in schema)
+    return f"CREATE TABLE {quote_identifier(table_name)} (\n  {columns}\n)"
+
+
+def coerce_frame(frame, mapping, types, report, first_row=0):
+    # Rows of the mapped columns, converted column by column with the same
+    # compiled converters as the table editor. Empty and NULL cells become
+    # None; cells that do not fit their column become None and are added to
+    # report (a CoercionReport) with their row number in the file.
+    columns = []
+    for source, target in mapping.items():
+        convert = compile_column(types[target])
+        series = frame[source]
+        present = series.notna()
+        if series.dtype == object or pd.api.types.is_string_dtype(series):
+            present &= series.astype(str).str.strip() != ''
+        values = []
+        for i, (value, ok) in enumerate(zip(series.tolist(), present.tolist())):
+            if not ok:
+                values.append(None)
+                continue
+            try:
+                values.append(convert(value))
+            except (ValueError, TypeError, ArithmeticError) as e:
+                values.append(None)
+                report.add(target, types[target], first_row + i, value, str(e) or type(e).__name__)
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def _tsv_value(value):
+    if value is None:
+        return '\\N'
+    text = str(value)
+    if '\\' in text or '\t' in text or '\n' in text or '\r' in text:
+        text = text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return text
+
+
+def _load_data(cursor, table_name, columns, rows):
+    # LOAD DATA LOCAL INFILE from a temporary TSV written in MySQL's default
+    # escaping; much faster than INSERTs when the server allows local_infile.
+    fd, path = tempfile.mkstemp(suffix='.tsv')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='\n') as f:
+            for row in rows:
+                f.write('\t'.join(_tsv_value(v) for v in row))
+                f.write('\n')
+        cols = ', '.join(quote_identifier(c) for c in columns)
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {quote_identifier(table_name)} CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({cols})",
+            (path,))
+    finally:
+        os.remove(path)
+
+
+def _executemany(cursor, table_name, columns, rows):
+    cols = ', '.join(quote_identifier(c) for c in columns)
+    marks = ', '.join(['%s'] * len(columns))
+    cursor.executemany(f"INSERT INTO {quote_identifier(table_name)} ({cols}) VALUES ({marks})", rows)
+
+
+def map_columns(frame_columns, table_columns):
+    # Case-insensitive match of file headers to table columns.
+    by_lower = {col.lower(): col for col in table_columns}
+    mapping = {}
+    ignored = []
+    for name in frame_columns:
+        target = by_lower.get(str(name).strip().lower())
+        if target is None or target in mapping.values():
+            ignored.append(str(name))
+        else:
+            mapping[name] = target
+    return mapping, ignored
+
+
+def load_file(conn, path, fmt, table_name, table_columns=None, if_exists='append', method='auto',
+              chunk_rows=10000, progress=None, cancelled=None):
+    """Load a CSV/Parquet file into `table_name` over `conn`.
+
+    table_columns is the existing table's DESCRIBE-shaped column list, or
+    None when the table does not exist yet. Rows are committed chunk by
+    chunk. New and replaced tables are created from the types inferred on
+    the first chunk, widened as later chunks need, and filled under a
+    staging name that is renamed into place once every row is in; a failed
+    or cancelled load drops the staging table and leaves any existing table
+    as it was.
+    """
+    frames = read_frames(path, fmt, chunk_rows)
+    try:
+        first = next(frames)
+    except StopIteration:
+        raise BulkLoadError('The file contains no rows')
+    report = {'table': table_name, 'rows_loaded': 0, 'chunks': 0, 'created': False,
+              'method': None, 'ignored_columns': [], 'invalid_values': {}, 'elapsed': 0.0}
+    started = time.monotonic()
+    cursor = conn.cursor()
+    target = table_name
+    try:
+        if table_columns is not None and if_exists == 'fail':
+            raise BulkLoadError(f"Table {table_name} already exists")
+        replacing = table_columns is not None and if_exists == 'replace'
+        if table_columns is None or replacing:
+            schema = infer_schema(first)
+            target = _scratch_name(table_name, 'load')
+            cursor.execute(create_table_sql(target, schema))
+            report['created'] = True
+            report['schema'] = schema
+            table_columns = [{'Field': name, 'Type': typ} for name, typ in schema]
+        types = {col['Field']: col['Type'] for col in table_columns}
+        mapping, report['ignored_columns'] = map_columns(first.columns, list(types))
+        if not mapping:
+            raise BulkLoadError('None of the file columns match the table columns')
+        columns = list(mapping.values())
+        invalid = CoercionReport()
+        use_load_data = method in ('auto', 'load_data')
+        conn.autocommit = False
+
+        for frame in _chain(first, frames):
+            if cancelled and cancelled():
+                conn.rollback()
+                raise LoadCancelled(f"Load cancelled after {report['rows_loaded']} rows")
+            if target != table_name and frame is not first:
+                schema = widen_schema(report['schema'], frame)
+                for (name, typ), (_, old_typ) in zip(schema, report['schema']):
+                    if typ != old_typ:
+                        logger.info(f"Widening {table_name}.{name} from {old_typ} to {typ}")
+                        cursor.execute(f"ALTER TABLE {quote_identifier(target)} "
+                                       f"MODIFY {quote_identifier(name)} {typ}")
+                        types[name] = typ
+                report['schema'] = schema
+            rows = coerce_frame(frame, mapping, types, invalid, report['rows_loaded'])
+            if invalid:
+                report['invalid_values'] = invalid.to_dict()
+            if use_load_data:
+                try:
+                    _load_data(cursor, target, columns, rows)
+                    report['method'] = 'load_data'
+                except Exception as e:
+                    if method == 'load_data' or report['method'] == 'load_data':
+                        raise
+                    # Server or client has local_infile disabled; INSERT instead.
+                    logger.info(f"LOAD DATA LOCAL INFILE unavailable ({e}); using executemany")
+                    conn.rollback()
+                    use_load_data = False
+            if not use_load_data:
+                _executemany(cursor, target, columns, rows)
+                report['method'] = 'executemany'
+            conn.commit()
+            report['rows_loaded'] += len(rows)
+            report['chunks'] += 1
+            report['elapsed'] = round(time.monotonic() - started, 3)
+            if progress:
+                progress(dict(report))
+        if target != table_name:
+            if replacing:
+                # One RENAME swaps both tables atomically.
+                old = _scratch_name(table_name, 'old')
+                cursor.execute(f"RENAME TABLE {quote_identifier(table_name)} TO {quote_identifier(old)}, "
+                               f"{quote_identifier(target)} TO {quote_identifier(table_name)}")
+                cursor.execute(f"DROP TABLE {quote_identifier(old)}")
+            else:
+                cursor.execute(f"RENAME TABLE {quote_identifier(target)} TO {quote_identifier(table_name)}")
+            target = table_name
+    except Exception:
+        conn.rollback()
+        if target != table_name:
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(target)}")
+            except Exception as e:
+                logger.error(f"Could not drop staging table {target}: {str(e)}")
+        raise
+    finally:
+        cursor.close()
+    report['elapsed'] = round(time.monotonic() - started, 3)
+    return report
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
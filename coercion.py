@@ -0,0 +1,289 @@
+"""Per-table value coercion compiled from DESCRIBE output."""
+import json
+import re
+from datetime import date, datetime
+from decimal import Context, Decimal, InvalidOperation, ROUND_HALF_UP
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+_TYPE = re.compile(r"\s*(\w+)\s*(?:\((.*)\))?\s*(.*)$", re.DOTALL)
+_QUOTED = re.compile(r"'((?:[^'\\]|''|\\.)*)'")
+
+_INT_BITS = {'tinyint': 8, 'smallint': 16, 'mediumint': 24, 'int': 32, 'integer': 32, 'bigint': 64}
+_TRUE = {'true', 't', 'yes', 'y', 'on'}
+_FALSE = {'false', 'f', 'no', 'n', 'off'}
+_BOOLEAN = _TRUE | _FALSE
+# TIMESTAMP's documented range, compared on the naive value.
+_TIMESTAMP_MIN = datetime(1970, 1, 1, 0, 0, 1)
+_TIMESTAMP_MAX = datetime(2038, 1, 19, 3, 14, 7)
+
+
+def parse_type(type_str):
+    # 'decimal(10,2) unsigned' -> ('decimal', ['10', '2'], 'unsigned')
+    m = _TYPE.match(type_str or '')
+    if not m:
+        return (type_str or '').lower(), [], ''
+    base, args, rest = m.groups()
+    base = base.lower()
+    if args is None:
+        values = []
+    elif base in ('enum', 'set'):
+        values = [v.replace("''", "'").replace("\\'", "'") for v in _QUOTED.findall(args)]
+    else:
+        values = [a.strip() for a in args.split(',')]
+    return base, values, rest.lower()
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def _integer(bits, unsigned, boolean):
+    low, high = (0, 2 ** bits - 1) if unsigned else (-2 ** (bits - 1), 2 ** (bits - 1) - 1)
+
+    def convert(value):
+        value = _text(value)
+        if boolean and isinstance(value, str) and value.lower() in _BOOLEAN:
+            return 1 if value.lower() in _TRUE else 0
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError('not an integer')
+            value = int(value)
+        number = int(value)
+        if not low <= number <= high:
+            raise ValueError(f"out of range {low}..{high}")
+        return number
+    return convert
+
+
+def _decimal(precision, scale, unsigned):
+    quantum = Decimal(1).scaleb(-scale)
+    limit = Decimal(10) ** (precision - scale)
+    # DECIMAL allows 65 digits; the default context only keeps 28.
+    context = Context(prec=max(precision + 1, 28))
+
+    def convert(value):
+        try:
+            number = Decimal(str(_text(value)))
+        except InvalidOperation:
+            raise ValueError('not a number')
+        if not number.is_finite():
+            raise ValueError('not a finite number')
+        try:
+            number = number.quantize(quantum, rounding=ROUND_HALF_UP, context=context)
+        except InvalidOperation:
+            raise ValueError(f"out of range for DECIMAL({precision},{scale})")
+        if abs(number) >= limit or unsigned and number < 0:
+            raise ValueError(f"out of range for DECIMAL({precision},{scale})")
+        return number
+    return convert
+
+
+def _float(unsigned):
+    def convert(value):
+        number = float(_text(value))
+        if number != number or number in (float('inf'), float('-inf')):
+            raise ValueError('not a finite number')
+        if unsigned and number < 0:
+            raise ValueError('negative value for an unsigned column')
+        return number
+    return convert
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime):
+        result = value
+    elif isinstance(value, date):
+        result = datetime(value.year, value.month, value.day)
+    else:
+        text = str(value).strip()
+        try:
+            result = datetime.fromisoformat(text[:-1] + '+00:00' if text.endswith('Z') else text)
+        except ValueError:
+            # jsonify renders DATE/DATETIME cells as HTTP dates.
+            try:
+                result = parsedate_to_datetime(text)
+            except (TypeError, ValueError, IndexError):
+                raise ValueError('not a date/time')
+    # Offsets are dropped: values are stored as the wall-clock time given.
+    return result.replace(tzinfo=None)
+
+
+def _date():
+    def convert(value):
+        return _parse_datetime(value).strftime('%Y-%m-%d')
+    return convert
+
+
+def _datetime(fsp, timestamp):
+    fmt = '%Y-%m-%d %H:%M:%S' + ('.%f' if fsp else '')
+
+    def convert(value):
+        result = _parse_datetime(value)
+        if timestamp and not _TIMESTAMP_MIN <= result <= _TIMESTAMP_MAX:
+            raise ValueError('outside the TIMESTAMP range 1970-2038')
+        text = result.strftime(fmt)
+        return text[:len(text) - (6 - fsp)] if fsp else text
+    return convert
+
+
+def _year():
+    def convert(value):
+        year = int(_text(value))
+        if year != 0 and not 1901 <= year <= 2155:
+            raise ValueError('out of range 1901..2155')
+        return year
+    return convert
+
+
+def _enum(options):
+    by_lower = {opt.lower(): opt for opt in options}
+
+    def convert(value):
+        text = str(value)
+        match = by_lower.get(text.lower())
+        if match is None:
+            raise ValueError(f"not one of {', '.join(options)}")
+        return match
+    return convert
+
+
+def _set(options):
+    by_lower = {opt.lower(): opt for opt in options}
+
+    def convert(value):
+        items = value if isinstance(value, (list, tuple)) else str(value).split(',')
+        chosen = []
+        for item in items:
+            match = by_lower.get(str(item).strip().lower())
+            if match is None:
+                raise ValueError(f"{item!r} is not one of {', '.join(options)}")
+            chosen.append(match)
+        return ','.join(chosen)
+    return convert
+
+
+def _json():
+    def convert(value):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        json.loads(value)
+        return value
+    return convert
+
+
+def _string(value):
+    return str(value)
+
+
+def _passthrough(value):
+    return value
+
+
+@lru_cache(maxsize=4096)
+def compile_column(type_str):
+    # Returns convert(value) for a column type; convert raises ValueError or
+    # TypeError for values the column cannot hold.
+    base, args, rest = parse_type(type_str)
+    unsigned = 'unsigned' in rest
+    if base in _INT_BITS:
+        return _integer(_INT_BITS[base], unsigned, base == 'tinyint' and args == ['1'])
+    if base in ('bool', 'boolean'):
+        return _integer(8, False, True)
+    if base == 'bit':
+        return _integer(int(args[0]) if args else 1, True, False)
+    if base in ('decimal', 'numeric', 'dec', 'fixed'):
+        precision = int(args[0]) if args else 10
+        scale = int(args[1]) if len(args) > 1 else 0
+        return _decimal(precision, scale, unsigned)
+    if base in ('float', 'double', 'real'):
+        return _float(unsigned)
+    if base == 'date':
+        return _date()
+    if base in ('datetime', 'timestamp'):
+        return _datetime(int(args[0]) if args else 0, base == 'timestamp')
+    if base == 'year':
+        return _year()
+    if base == 'enum':
+        return _enum(args)
+    if base == 'set':
+        return _set(args)
+    if base == 'json':
+        return _json()
+    if 'blob' in base or 'binary' in base:
+        return _passthrough
+    return _string
+
+
+class CoercionReport:
+    # Aggregated conversion failures: one entry per column with a count and
+    # a few example cells, instead of a log line per bad cell.
+    max_examples = 3
+
+    def __init__(self):
+        self.errors = {}
+
+    def __bool__(self):
+        return bool(self.errors)
+
+    def add(self, column, type_str, row, value, reason):
+        entry = self.errors.setdefault(column, {'type': type_str, 'count': 0, 'examples': []})
+        entry['count'] += 1
+        if len(entry['examples']) < self.max_examples:
+            entry['examples'].append({'row': row, 'value': str(value)[:100], 'reason': reason})
+
+    @property
+    def total(self):
+        return sum(entry['count'] for entry in self.errors.values())
+
+    def to_dict(self):
+        return self.errors
+
+    def summary(self):
+        return ', '.join(f"{col} ({entry['type']}): {entry['count']}" for col, entry in self.errors.items())
+
+
+class TableCoercer:
+    def __init__(self, schema):
+        # schema: DESCRIBE-shaped dicts (Field, Type, ...)
+        self.types = {col['Field']: col['Type'] for col in schema}
+        self.converters = {name: compile_column(typ) for name, typ in self.types.items()}
+
+    def coerce_rows(self, rows, columns=None, fill_missing=True, report=None):
+        """Convert a batch of row dicts column by column.
+
+        Empty strings and missing/None values become None; values that do not
+        fit their column become None and are recorded in the report. With
+        fill_missing=False only the columns present in each row are returned.
+        Returns (rows, report).
+        """
+        report = report if report is not None else CoercionReport()
+        names = [name for name in (columns or self.types) if name in self.converters]
+        out = [{} for _ in rows]
+        for name in names:
+            convert = self.converters[name]
+            for i, row in enumerate(rows):
+                if name in row:
+                    value = row[name]
+                elif fill_missing:
+                    value = None
+                else:
+                    continue
+                if value is None or value == '':
+                    out[i][name] = None
+                    continue
+                try:
+                    out[i][name] = convert(value)
+                except (ValueError, TypeError, ArithmeticError) as e:
+                    out[i][name] = None
+                    report.add(name, self.types[name], i, value, str(e) or type(e).__name__)
+        return out, report
+
+
+def get_coercer(table):
+    # Built once per loaded TableSchema; a schema reload produces a new one.
+    coercer = getattr(table, 'coercer', None)
+    if coercer is None:
+        coercer = TableCoercer(table.columns)
+        table.coercer = coercer
+    return coercer
@@ -0,0 +1,257 @@
+"""Columnar result encoding: typed value arrays with null bitmaps, as JSON or Arrow IPC."""
+import base64
+import gzip
+import importlib.util
+import json
+from datetime import date, datetime, timedelta
+
+from flask import Response, current_app, request
+from mysql.connector.constants import FieldType
+
+import tracing
+from streaming import iter_batches
+
+# Brotli is optional; without it responses are gzip-compressed.
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+RESULT_FORMATS = ('rows', 'columnar', 'arrow')
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+_BINARY_CHARSET = 63
+
+_KINDS = {}
+for _kind, _names in {
+    'int': ('TINY', 'SHORT', 'LONG', 'LONGLONG', 'INT24', 'YEAR', 'BIT'),
+    'float': ('FLOAT', 'DOUBLE'),
+    'decimal': ('DECIMAL', 'NEWDECIMAL'),
+    'date': ('DATE', 'NEWDATE'),
+    'datetime': ('DATETIME', 'TIMESTAMP'),
+    'time': ('TIME',),
+    'json': ('JSON',),
+    'set': ('SET',),
+    'binary': ('GEOMETRY', 'VECTOR'),
+}.items():
+    for _name in _names:
+        if hasattr(FieldType, _name):
+            _KINDS[getattr(FieldType, _name)] = _kind
+
+
+def arrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def column_kind(description):
+    # Logical type of a cursor.description entry: int, float, decimal, date,
+    # datetime, time, json, set, binary or string. Strings and blobs with the
+    # binary character set are binary.
+    kind = _KINDS.get(description[1] if len(description) > 1 else None, 'string')
+    if kind == 'string' and len(description) > 8 and description[8] == _BINARY_CHARSET:
+        return 'binary'
+    return kind
+
+
+def _datetime_text(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+def _time_text(value):
+    # TIME columns arrive as timedelta and may be negative or over 24 hours.
+    if not isinstance(value, timedelta):
+        return str(value)
+    micros = abs(value) // timedelta(microseconds=1)
+    seconds, micros = divmod(micros, 1000000)
+    text = f"{'-' if value < timedelta(0) else ''}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return text + (f".{micros:06d}" if micros else '')
+
+
+def _binary_text(value):
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    return str(value)
+
+
+def _text(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    return value
+
+
+def _set_text(value):
+    return ','.join(sorted(value)) if isinstance(value, (set, frozenset)) else _text(value)
+
+
+# Per-kind conversion to a JSON value; kinds without one are dumped as they
+# come from the driver (int, float, str).
+_CONVERTERS = {
+    'decimal': str,
+    'date': _datetime_text,
+    'datetime': _datetime_text,
+    'time': _time_text,
+    'binary': _binary_text,
+    'json': _text,
+    'set': _set_text,
+}
+# What a NULL slot holds in the value array, so every array keeps one type.
+_ZERO = {'int': 0, 'float': 0}
+
+
+def _dump_values(values):
+    try:
+        return json.dumps(values, separators=(',', ':'))
+    except TypeError:
+        # e.g. bytes in a column the driver described as text.
+        return json.dumps(values, separators=(',', ':'), default=_binary_text)
+
+
+def null_bitmap(null_rows, row_count):
+    # Base64 of one bit per row, least significant bit first, set for NULL;
+    # None when the column has no NULLs.
+    if not null_rows:
+        return None
+    bits = bytearray((row_count + 7) // 8)
+    for i in null_rows:
+        bits[i >> 3] |= 1 << (i & 7)
+    return base64.b64encode(bits).decode('ascii')
+
+
+class ColumnarEncoder:
+    # Accumulates tuple rows column by column. Each added batch is serialized
+    # straight away into one JSON fragment per column, so the result is held
+    # as text rather than as Python row objects. With keep_values the raw
+    # values are kept instead, for Arrow output.
+    def __init__(self, description, keep_values=False):
+        self.columns = [d[0] for d in description or []]
+        self.kinds = [column_kind(d) for d in description or []]
+        self.keep_values = keep_values
+        self.parts = [[] for _ in self.columns]
+        self.values = [[] for _ in self.columns]
+        self.null_rows = [[] for _ in self.columns]
+        self.count = 0
+        self.bytes = 0
+        self.trace = tracing.current()
+
+    def add(self, rows):
+        if not rows:
+            return
+        with tracing.span('serialize', trace=self.trace):
+            for c, values in enumerate(zip(*rows)):
+                if self.keep_values:
+                    self.values[c].extend(values)
+                    continue
+                kind = self.kinds[c]
+                convert = _CONVERTERS.get(kind)
+                if None in values:
+                    zero = _ZERO.get(kind, '')
+                    self.null_rows[c].extend(self.count + i for i, v in enumerate(values) if v is None)
+                    values = [zero if v is None else (convert(v) if convert else v) for v in values]
+                elif convert:
+                    values = [convert(v) for v in values]
+                data = _dump_values(list(values))[1:-1]
+                self.parts[c].append(data)
+                self.bytes += len(data) + 1
+        self.count += len(rows)
+
+    def fragment(self):
+        # The columnar keys of a response object, without braces, e.g.
+        # '"format":"columnar","columns":["id"],"types":["int"],"row_count":2,"nulls":[null],"values":[[1,2]]'
+        nulls = [null_bitmap(rows, self.count) for rows in self.null_rows]
+        values = ','.join('[' + ','.join(parts) + ']' for parts in self.parts)
+        return ('"format":"columnar","columns":' + json.dumps(self.columns) +
+                ',"types":' + json.dumps(self.kinds) + ',"row_count":' + str(self.count) +
+                ',"nulls":' + json.dumps(nulls) + ',"values":[' + values + ']')
+
+    def arrow(self, head):
+        # Arrow IPC stream of the kept values; `head` travels as JSON in the
+        # schema metadata under b'result'.
+        import pyarrow as pa
+        arrays = [_arrow_array(pa, values, kind) for values, kind in zip(self.values, self.kinds)]
+        table = pa.Table.from_arrays(arrays, names=self.columns)
+        table = table.replace_schema_metadata({'result': _head_json(head)})
+        sink = pa.BufferOutputStream()
+        with tracing.span('serialize', trace=self.trace):
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+def _arrow_array(pa, values, kind):
+    # Native Arrow types where pyarrow can infer them (decimal, date,
+    # timestamp, duration, binary); anything else as text.
+    if kind != 'set':
+        try:
+            return pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            pass
+    convert = _CONVERTERS.get(kind, str)
+    return pa.array([None if v is None else str(convert(v)) for v in values], type=pa.string())
+
+
+class ColumnarBatches(ColumnarEncoder):
+    # Reads an executed tuple cursor in fetchmany batches until it is
+    # exhausted or max_rows / max_bytes is reached, like EncodedBatches.
+    # max_bytes only applies to JSON output.
+    def __init__(self, cursor, batch_size, max_rows=None, max_bytes=None, keep_values=False):
+        super().__init__(cursor.description, keep_values)
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_bytes = None if keep_values else max_bytes
+        self.truncated = False
+        self.exhausted = False
+
+    def read(self):
+        for rows in iter_batches(self.cursor, self.batch_size):
+            if self.max_rows is not None and self.count + len(rows) > self.max_rows:
+                rows = rows[:self.max_rows - self.count]
+                self.truncated = True
+            self.add(rows)
+            if self.truncated:
+                return
+            if self.max_bytes is not None and self.bytes >= self.max_bytes:
+                self.truncated = bool(self.cursor.fetchmany(1))
+                self.exhausted = not self.truncated
+                return
+        self.exhausted = True
+
+
+def _head_json(head):
+    # Same encoders as jsonify for the non-row part of the response.
+    return json.dumps(head, default=current_app.json.default, separators=(',', ':'))
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compressed_response(body, mimetype, min_bytes=1024):
+    # Compressed with brotli or gzip when the client accepts it and the body
+    # is at least min_bytes (0 disables compression).
+    data = body.encode('utf-8') if isinstance(body, str) else body
+    encoding = _encoding() if min_bytes and len(data) >= min_bytes else None
+    if encoding:
+        with tracing.span('serialize'):
+            data = brotli.compress(data, quality=4) if encoding == 'br' else gzip.compress(data, compresslevel=5)
+    response = Response(data, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def columnar_response(head, fragment, min_bytes=1024):
+    # `fragment` from ColumnarEncoder.fragment(), possibly from the result cache.
+    prefix = _head_json(head)[:-1]
+    return compressed_response(prefix + (',' if head else '') + fragment + '}', 'application/json', min_bytes)
+
+
+def arrow_response(head, encoder, min_bytes=1024):
+    return compressed_response(encoder.arrow(head), ARROW_MIMETYPE, min_bytes)
@@ -0,0 +1,270 @@
+"""Per-database MySQL connection pooling for the Flask routes."""
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import errors
+
+import tracing
+
+
+class PoolTimeout(errors.PoolError):
+    pass
+
+
+class PooledConnection:
+    # Thin proxy around a mysql.connector connection. close() hands the
+    # connection back to its pool instead of tearing down the socket, so the
+    # existing `conn.close()` calls in the routes keep working unchanged.
+    def __init__(self, pool, conn):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_on_release', None)
+
+    def _live(self):
+        conn = self._conn
+        if conn is None:
+            raise errors.OperationalError('Connection has already been returned to the pool')
+        return conn
+
+    def __getattr__(self, name):
+        return getattr(self._live(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def cursor(self, *args, **kwargs):
+        return tracing.traced_cursor(self._live().cursor(*args, **kwargs))
+
+    def commit(self):
+        with tracing.span('execute', round_trip=True):
+            self._live().commit()
+
+    def rollback(self):
+        with tracing.span('execute', round_trip=True):
+            self._live().rollback()
+
+    def on_release(self, callback):
+        # callback() runs before the connection leaves this proxy; when it
+        # returns True the connection is closed instead of pooled.
+        object.__setattr__(self, '_on_release', callback)
+
+    def _released(self):
+        callback = self._on_release
+        object.__setattr__(self, '_on_release', None)
+        return bool(callback and callback())
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        if self._released():
+            self.discard()
+            return
+        object.__setattr__(self, '_conn', None)
+        self._pool.release(conn)
+
+    def discard(self):
+        # Closes the socket instead of returning it to the pool.
+        conn = self._conn
+        if conn is None:
+            return
+        self._released()
+        object.__setattr__(self, '_conn', None)
+        self._pool._discard(conn)
+
+
+class ConnectionPool:
+    def __init__(self, config, size=10, timeout=10.0, idle_timeout=300.0, ping_after=30.0):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._idle = deque()
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'created': 0,
+            'closed': 0,
+            'health_check_failures': 0,
+            'idle_evictions': 0,
+        }
+
+    def _connect(self):
+        return mysql.connector.connect(**self.config)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._cond:
+            self._open -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+
+    def _evict_idle(self, now):
+        # Called with the lock held. Idle connections are kept most-recently
+        # used on the right, so stale ones accumulate on the left. The caller
+        # closes the returned sockets once the lock is released.
+        stale = []
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            stale.append(self._idle.popleft()[0])
+        self._open -= len(stale)
+        self._stats['idle_evictions'] += len(stale)
+        self._stats['closed'] += len(stale)
+        return stale
+
+    def _healthy(self, conn, last_used):
+        # A connection released less than ping_after seconds ago is trusted
+        # as is: is_connected() would itself ping the server, costing the
+        # round trip the window is meant to save.
+        if time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        # Time spent waiting for, health-checking or opening a connection is
+        # the request's connect phase.
+        with tracing.span('connect'):
+            return self._acquire()
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            conn = None
+            last_used = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise errors.PoolError('Connection pool is closed')
+                stale = self._evict_idle(time.monotonic())
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        break
+                    if not waited:
+                        self._stats['waits'] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                elif self._open < self.size:
+                    self._open += 1
+                    create = True
+                if conn is not None or create:
+                    self._stats['checkouts'] += 1
+            for s in stale:
+                self._close_quietly(s)
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._stats['checkouts'] -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                return PooledConnection(self, conn)
+            if conn is None:
+                raise PoolTimeout(f'Timed out after {self.timeout}s waiting for a database connection')
+            if self._healthy(conn, last_used):
+                return PooledConnection(self, conn)
+            with self._cond:
+                self._stats['health_check_failures'] += 1
+                self._stats['checkouts'] -= 1
+            self._discard(conn)
+
+    def release(self, conn):
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                closing = True
+            else:
+                closing = False
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+        if closing:
+            self._discard(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = [c for c, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['open'] = self._open
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._open - len(self._idle)
+        return stats
+
+
+class PoolRegistry:
+    # One pool per database name; None is the server-level pool used by
+    # /upload before the target database exists.
+    def __init__(self, config, **pool_kwargs):
+        self.config = config
+        self.pool_kwargs = pool_kwargs
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, db_name=None):
+        with self._lock:
+            pool = self._pools.get(db_name)
+            if pool is None:
+                config = dict(self.config)
+                if db_name:
+                    config['database'] = db_name
+                pool = ConnectionPool(config, **self.pool_kwargs)
+                self._pools[db_name] = pool
+            return pool
+
+    def drop(self, db_name):
+        with self._lock:
+            pool = self._pools.pop(db_name, None)
+        if pool is not None:
+            pool.close()
+
+    def stats(self):
+        with self._lock:
+            pools = dict(self._pools)
+        return {(name or ''): pool.stats() for name, pool in pools.items()}
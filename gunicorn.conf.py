@@ -0,0 +1,41 @@
+"""Production serving configuration: gunicorn -c gunicorn.conf.py app:app"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# SERVER_WORKER_CLASS picks how concurrent requests are carried:
+#   gthread (default)  one OS thread per in-flight request, SERVER_THREADS per
+#                      worker. Safe for everything, including CPU-heavy CSV /
+#                      Parquet loads.
+#   gevent             one greenlet per request, up to SERVER_WORKER_CONNECTIONS
+#                      per worker. Requests waiting on Groq or MySQL cost a few KB
+#                      each instead of a thread, so hundreds of NL queries can be
+#                      in flight at once. Needs `pip install gevent`; MySQL is
+#                      then reached through mysql.connector's pure-Python
+#                      protocol so its socket waits yield to other requests.
+worker_class = os.getenv('SERVER_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    os.environ.setdefault('DB_USE_PURE', '1')
+
+# Import jobs, caches, connection pools and metrics live in the worker process,
+# and /api/jobs/<id> must reach the worker that runs the job, so one worker is
+# the default; scale with threads / greenlets first. More workers need sticky
+# sessions and multiply every pool (WEB_CONCURRENCY x DB_POOL_SIZE connections
+# per database).
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('SERVER_THREADS', min(64, 8 * multiprocessing.cpu_count())))
+worker_connections = int(os.getenv('SERVER_WORKER_CONNECTIONS', 500))
+
+bind = os.getenv('SERVER_BIND', '0.0.0.0:5001')
+# A request can wait for an LLM completion with retries plus a full query
+# time limit, so the worker timeout has to cover both.
+timeout = int(os.getenv('SERVER_TIMEOUT', 180))
+graceful_timeout = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('SERVER_KEEPALIVE', 5))
+
+accesslog = os.getenv('SERVER_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('SERVER_LOG_LEVEL', 'info')
@@ -0,0 +1,132 @@
+"""Background job runner with progress reporting and cooperative cancellation."""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, description=None, owner=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.description = description
+        # Opaque id of whoever started the job (the browser session in app.py).
+        self.owner = owner
+        self.status = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def update(self, progress):
+        with self._lock:
+            self.progress = dict(progress)
+
+    def to_dict(self):
+        with self._lock:
+            data = {
+                'id': self.id,
+                'kind': self.kind,
+                'description': self.description,
+                'status': self.status,
+                'progress': dict(self.progress),
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'cancel_requested': self.cancelled,
+            }
+        end = self.finished_at or time.time()
+        data['elapsed'] = round(end - self.started_at, 3) if self.started_at else 0.0
+        return data
+
+
+class JobManager:
+    def __init__(self, max_workers=2, keep_finished=100):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.keep_finished = keep_finished
+
+    def submit(self, kind, fn, description=None, owner=None):
+        # fn(job) does the work; it should call job.update() as it goes and
+        # raise JobCancelled once it notices job.cancelled.
+        job = Job(kind, description, owner)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        with job._lock:
+            if job.cancelled:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            result = fn(job)
+        except JobCancelled:
+            status, result, error = CANCELLED, None, None
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            status, result, error = FAILED, None, str(e)
+        else:
+            status, error = SUCCEEDED, None
+        with job._lock:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+        logger.info(f"Job {job.id} ({job.kind}) {status}")
+
+    def _prune(self):
+        # Called with the lock held; forgets the oldest finished jobs.
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        with job._lock:
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        return job
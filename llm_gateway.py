@@ -0,0 +1,183 @@
+"""Shared gateway for LLM completions: timeouts, retries, bounded concurrency and coalescing."""
+import hashlib
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth retrying; everything else is returned to the caller.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMUnavailable(LLMError):
+    # Upstream kept failing (or the gateway was saturated) after all retries.
+    pass
+
+
+class LLMTimeout(LLMUnavailable):
+    pass
+
+
+# A backend is any object with a `model` name, `complete(prompt) -> str` and
+# `classify(error)` returning 'timeout', 'retry' or None for a failure.
+class GroqBackend:
+    def __init__(self, api_key, model, base_url=None, timeout=30.0):
+        from groq import Groq
+        self.model = model
+        # Retries are done by the gateway so they can be counted and coalesced.
+        self.client = Groq(api_key=api_key, base_url=base_url or None, timeout=timeout, max_retries=0)
+
+    def complete(self, prompt):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content
+
+    @staticmethod
+    def classify(error):
+        import groq
+        if isinstance(error, groq.APITimeoutError):
+            return 'timeout'
+        if isinstance(error, groq.APIConnectionError):
+            return 'retry'
+        if isinstance(error, groq.APIStatusError) and error.status_code in RETRY_STATUSES:
+            return 'retry'
+        return None
+
+
+class StubBackend:
+    # In-process stand-in for tests and benchmarks. `responder(prompt)` returns
+    # the completion text; the default answers every prompt with a trivial query.
+    def __init__(self, responder=None, latency=0.0):
+        self.model = 'stub'
+        self.responder = responder or (lambda prompt: 'SELECT 1')
+        self.latency = latency
+
+    def complete(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.responder(prompt)
+
+    @staticmethod
+    def classify(error):
+        return 'timeout' if isinstance(error, TimeoutError) else None
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMGateway:
+    def __init__(self, backend, timeout=30.0, max_concurrency=4, max_retries=3,
+                 backoff=0.5, max_backoff=8.0, queue_timeout=None):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # How long a request may wait for a free slot before giving up.
+        self.queue_timeout = timeout if queue_timeout is None else queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'upstream_calls': 0,
+            'coalesced': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'failures': 0,
+            'rejected': 0,
+            'upstream_seconds': 0.0,
+        }
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _key(self, prompt):
+        return hashlib.sha256(f"{self.backend.model}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def complete(self, prompt):
+        # Identical prompts already in flight share the leader's result instead
+        # of issuing a second upstream call.
+        key = self._key(prompt)
+        with self._lock:
+            self._stats['requests'] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+        if leader:
+            try:
+                flight.result = self._call(prompt)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        elif not flight.done.wait(self.queue_timeout + self.timeout * (self.max_retries + 1)):
+            self._count('timeouts')
+            raise LLMTimeout('Timed out waiting for an identical LLM request')
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _call(self, prompt):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count('rejected')
+            raise LLMUnavailable('LLM gateway is saturated; try again shortly')
+        try:
+            attempt = 0
+            while True:
+                started = time.monotonic()
+                self._count('upstream_calls')
+                try:
+                    result = self.backend.complete(prompt)
+                except Exception as e:
+                    self._count('upstream_seconds', time.monotonic() - started)
+                    kind = self.backend.classify(e)
+                    if kind == 'timeout':
+                        self._count('timeouts')
+                    if kind is None:
+                        self._count('failures')
+                        raise
+                    if attempt >= self.max_retries:
+                        self._count('failures')
+                        exc = LLMTimeout if kind == 'timeout' else LLMUnavailable
+                        raise exc(f"LLM service unavailable after {attempt + 1} attempts: {e}") from e
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                    delay *= random.uniform(0.5, 1.0)
+                    logger.warning(f"LLM request failed ({e}); retrying in {delay:.2f}s")
+                    self._count('retries')
+                    attempt += 1
+                    time.sleep(delay)
+                else:
+                    self._count('upstream_seconds', time.monotonic() - started)
+                    return result
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+        stats['upstream_seconds'] = round(stats['upstream_seconds'], 3)
+        stats['backend'] = type(self.backend).__name__
+        stats['model'] = self.backend.model
+        stats['max_concurrency'] = self.max_concurrency
+        return stats
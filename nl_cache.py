@@ -0,0 +1,128 @@
+"""Cache of LLM-generated SQL keyed on (schema fingerprint, normalized question)."""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_QUOTED = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")")
+
+
+def normalize_question(question):
+    # Case and spacing outside quoted literals do not change what the user
+    # asked for; the literals themselves are kept verbatim.
+    parts = _QUOTED.split(question.strip())
+    out = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            out.append(part)
+        else:
+            out.append(re.sub(r'\s+', ' ', part.lower()))
+    return ''.join(out).strip().rstrip('?.!; ').strip()
+
+
+def cache_key(schema_text, question):
+    schema_hash = hashlib.sha256(schema_text.encode('utf-8')).hexdigest()
+    question_hash = hashlib.sha256(normalize_question(question).encode('utf-8')).hexdigest()
+    return f"{schema_hash[:32]}:{question_hash[:32]}"
+
+
+class NLQueryCache:
+    def __init__(self, max_entries=1000, ttl=86400.0, db_path=None, max_disk_entries=100000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'expired': 0, 'discards': 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS nl_sql_cache ("
+                "key TEXT PRIMARY KEY, question TEXT, sql TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS nl_sql_cache_last_used ON nl_sql_cache (last_used)")
+            self._db.commit()
+
+    def _expired(self, created, now):
+        return self.ttl and now - created > self.ttl
+
+    def get(self, schema_text, question):
+        key = cache_key(schema_text, question)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                sql, created = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return sql
+                del self._entries[key]
+                self._stats['expired'] += 1
+            if self._db is not None:
+                row = self._db.execute("SELECT sql, created FROM nl_sql_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    sql, created = row
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE nl_sql_cache SET last_used = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, sql, created)
+                        self._stats['disk_hits'] += 1
+                        return sql
+                    self._db.execute("DELETE FROM nl_sql_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats['expired'] += 1
+            self._stats['misses'] += 1
+            return None
+
+    def _remember(self, key, sql, created):
+        # Called with the lock held.
+        self._entries[key] = (sql, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def put(self, schema_text, question, sql):
+        key = cache_key(schema_text, question)
+        now = time.time()
+        with self._lock:
+            self._remember(key, sql, now)
+            self._stats['stores'] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO nl_sql_cache (key, question, sql, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, normalize_question(question), sql, now, now))
+                if self._stats['stores'] % 100 == 0:
+                    self._db.execute(
+                        "DELETE FROM nl_sql_cache WHERE key IN (SELECT key FROM nl_sql_cache "
+                        "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_disk_entries,))
+                self._db.commit()
+
+    def discard(self, schema_text, question):
+        key = cache_key(schema_text, question)
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM nl_sql_cache WHERE key = ?", (key,))
+                self._db.commit()
+            self._stats['discards'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM nl_sql_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            if self._db is not None:
+                stats['disk_entries'] = self._db.execute("SELECT COUNT(*) FROM nl_sql_cache").fetchone()[0]
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['disk_hits']) / lookups, 4) if lookups else None
+        return stats
@@ -0,0 +1,148 @@
+"""Compact schema text for LLM prompts, token counting and prompt-size statistics."""
+import json
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Display widths are noise to the model: INT(11) is INT. TINYINT(1) is kept
+# because it is how MySQL spells BOOLEAN.
+_INT_WIDTH = re.compile(r"\b(smallint|mediumint|int|integer|bigint)\(\d+\)", re.IGNORECASE)
+_TINYINT_WIDTH = re.compile(r"\btinyint\((?!1\))\d+\)", re.IGNORECASE)
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_loaded = False
+
+
+def _get_encoding():
+    # tiktoken's cl100k_base when it is installed and its BPE file can be
+    # loaded (it is downloaded on first use); loaded once, failures fall back
+    # to the heuristic for the life of the process.
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding('cl100k_base')
+                except Exception as e:
+                    logger.info(f"tiktoken unavailable ({e}); token counts are estimated")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def tokenizer_name():
+    return 'cl100k_base' if _get_encoding() is not None else 'heuristic'
+
+
+def count_tokens(text):
+    # Exact for cl100k_base and close enough for the Llama tokenizers; the
+    # heuristic counts a token per punctuation mark and per ~4 letters of a word.
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(1 if len(piece) <= 4 else (len(piece) + 3) // 4 for piece in _PIECE.findall(text))
+
+
+def compact_type(type_str):
+    # 'int(11) unsigned' -> 'int unsigned'; enum/set value lists are kept.
+    text = type_str or ''
+    if text.lower().startswith(('enum', 'set')):
+        return text
+    return _TINYINT_WIDTH.sub('tinyint', _INT_WIDTH.sub(r'\1', text)).lower()
+
+
+def compact_table(table):
+    """One-line description of a TableSchema for prompts.
+
+    patients(id int pk, name varchar(100), doctor_id int fk doctors.id)
+    Built once per loaded TableSchema, like its coercer.
+    """
+    text = getattr(table, 'prompt_text', None)
+    if text is None:
+        references = {column: f"{ref_table}.{ref_column}" for column, ref_table, ref_column in table.foreign_keys}
+        parts = []
+        for col in table.columns:
+            part = f"{col['Field']} {compact_type(col['Type'])}"
+            if col['Field'] in table.primary_key:
+                part += ' pk'
+            elif col.get('Key') == 'UNI':
+                part += ' unique'
+            if col['Field'] in references:
+                part += f" fk {references[col['Field']]}"
+            parts.append(part)
+        text = f"{table.name}({', '.join(parts)})"
+        table.prompt_text = text
+    return text
+
+
+def summarize_table(table):
+    # Column names only, for tables that do not fit the budget in full.
+    return f"{table.name}({', '.join(table.column_names)})"
+
+
+def compact_row(row, max_value_chars=100):
+    # Row values as JSON with long strings cut short; None is written null.
+    def shorten(value):
+        if value is None or isinstance(value, (int, float, bool)):
+            return value
+        text = str(value)
+        return text if len(text) <= max_value_chars else text[:max_value_chars] + '...'
+    return json.dumps({str(key): shorten(value) for key, value in row.items()}, ensure_ascii=False)
+
+
+def fit_to_budget(names, texts, budget, summarize=None):
+    """Keep the texts that fit within `budget` tokens, in order.
+
+    The first text is always kept. A text that does not fit is replaced by
+    summarize(name) when that fits, and dropped otherwise. Returns
+    (included, texts, summarized, tokens).
+    """
+    included, kept, summarized = [], [], []
+    used = 0
+    for name, text in zip(names, texts):
+        cost = count_tokens(text)
+        if included and used + cost > budget:
+            if summarize is None:
+                continue
+            text = summarize(name)
+            cost = count_tokens(text)
+            if used + cost > budget:
+                continue
+            summarized.append(name)
+        included.append(name)
+        kept.append(text)
+        used += cost
+    return included, kept, summarized, used
+
+
+class PromptStats:
+    # Prompt and completion token totals per prompt kind (nl_query, correction, ...).
+    def __init__(self, context_tokens):
+        self.context_tokens = context_tokens
+        self._kinds = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, prompt_tokens, completion_tokens=0):
+        with self._lock:
+            entry = self._kinds.setdefault(kind, {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                                  'max_prompt_tokens': 0, 'over_context': 0})
+            entry['requests'] += 1
+            entry['prompt_tokens'] += prompt_tokens
+            entry['completion_tokens'] += completion_tokens
+            entry['max_prompt_tokens'] = max(entry['max_prompt_tokens'], prompt_tokens)
+            if self.context_tokens and prompt_tokens > self.context_tokens:
+                entry['over_context'] += 1
+
+    def stats(self):
+        with self._lock:
+            kinds = {kind: dict(entry) for kind, entry in self._kinds.items()}
+        for entry in kinds.values():
+            entry['avg_prompt_tokens'] = round(entry['prompt_tokens'] / entry['requests'], 1)
+        return {'tokenizer': tokenizer_name(), 'context_tokens': self.context_tokens, 'kinds': kinds}
@@ -0,0 +1,170 @@
+"""Execution guard for SELECTs: plan cost checks, time limits and automatic LIMITs."""
+import json
+import re
+
+# Literals, comments, parentheses, words, numbers and any other single
+# character (operators, commas, semicolons), so every non-blank character
+# belongs to a token.
+_TOKEN = re.compile(
+    r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|--[^\n]*|#[^\n]*|/\*.*?\*/|[()]"
+    r"|[A-Za-z_$][\w$]*|(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\w*|\S",
+    re.DOTALL)
+_HINT_START = re.compile(r"\s*/\*\+")
+_LIMIT_ARGS = re.compile(r"\s*(\d+)(?:\s*,\s*(\d+)|\s+OFFSET\s+(\d+))?", re.IGNORECASE)
+# EXPLAIN FORMAT=JSON keys of steps that read all their input before the
+# first row comes out, so a LIMIT does not shorten the scans under them.
+_BLOCKING = ('grouping_operation', 'duplicates_removal', 'windowing', 'materialized_from_subquery')
+# Clauses after which an appended LIMIT would be misplaced or meaningless.
+_NO_LIMIT_AFTER = {'LIMIT', 'INTO', 'FOR', 'LOCK', 'PROCEDURE'}
+_STATEMENTS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'TABLE', 'VALUES'}
+
+
+class QueryRejected(Exception):
+    def __init__(self, message, estimate):
+        super().__init__(message)
+        self.estimate = estimate
+
+
+def _top_level(sql):
+    # (WORD, start, end) for words outside parentheses, literals and comments,
+    # and the end offset of the last token that is neither a comment nor a
+    # statement-terminating semicolon.
+    words = []
+    depth = 0
+    last_end = 0
+    for m in _TOKEN.finditer(sql):
+        token = m.group()
+        if token.startswith(('--', '#', '/*')) or token == ';':
+            continue
+        last_end = m.end()
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and (token[0].isalpha() or token[0] in '_$'):
+            words.append((token.upper(), m.start(), m.end()))
+    return words, last_end
+
+
+def _main_select(words):
+    # The first top-level statement keyword; for WITH queries the CTE bodies
+    # are parenthesized, so this is the statement after them.
+    for word in words:
+        if word[0] in _STATEMENTS:
+            return word if word[0] == 'SELECT' else None
+    return None
+
+
+def is_select(sql):
+    words, _ = _top_level(sql)
+    return _main_select(words) is not None
+
+
+def add_time_limit(sql, milliseconds):
+    # MAX_EXECUTION_TIME is an optimizer hint on the top-level SELECT; merge it
+    # into an existing hint comment rather than adding a second one.
+    if not milliseconds or 'MAX_EXECUTION_TIME' in sql.upper():
+        return sql
+    select = _main_select(_top_level(sql)[0])
+    if select is None:
+        return sql
+    hint = _HINT_START.match(sql, select[2])
+    if hint:
+        return f"{sql[:hint.end()]} MAX_EXECUTION_TIME({int(milliseconds)}){sql[hint.end():]}"
+    return f"{sql[:select[2]]} /*+ MAX_EXECUTION_TIME({int(milliseconds)}) */{sql[select[2]:]}"
+
+
+def add_row_limit(sql, limit):
+    # Adds LIMIT to a SELECT that has no top-level LIMIT of its own, right
+    # after its last token, so a trailing semicolon or comment stays after
+    # it; returns (sql, added).
+    words, last_end = _top_level(sql)
+    if _main_select(words) is None or any(word[0] in _NO_LIMIT_AFTER for word in words):
+        return sql, False
+    return f"{sql[:last_end]} LIMIT {int(limit)}{sql[last_end:]}", True
+
+
+def row_limit(sql):
+    # Rows the top-level LIMIT lets the server stop after (offset included),
+    # or None without a literal one.
+    words, _ = _top_level(sql)
+    limits = [word for word in words if word[0] == 'LIMIT']
+    m = _LIMIT_ARGS.match(sql, limits[-1][2]) if limits else None
+    if not m:
+        return None
+    first, count, offset = m.groups()
+    if count is not None:
+        return int(first) + int(count)
+    return int(first) + int(offset or 0)
+
+
+def _walk(node, join_step=False):
+    # (table, join_step) for every table access; join_step is False for the
+    # first table of a nested loop and for single-table blocks.
+    if isinstance(node, dict):
+        table = node.get('table')
+        if isinstance(table, dict) and 'table_name' in table:
+            yield table, join_step
+        for key, value in node.items():
+            if key == 'nested_loop' and isinstance(value, list):
+                for i, item in enumerate(value):
+                    yield from _walk(item, i > 0)
+            else:
+                yield from _walk(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk(item)
+
+
+def _streams(node):
+    # False if any step of the plan sorts, groups, deduplicates or
+    # materializes through a temporary table.
+    if isinstance(node, dict):
+        if node.get('using_filesort') or node.get('using_temporary_table') or \
+                any(key in node for key in _BLOCKING):
+            return False
+        return all(_streams(value) for value in node.values())
+    if isinstance(node, list):
+        return all(_streams(item) for item in node)
+    return True
+
+
+def plan_estimate(cursor, sql):
+    """Optimizer estimates for `sql` from EXPLAIN FORMAT=JSON.
+
+    rows is the largest row count the plan expects any join step to produce
+    (for a cross join, the size of the product). When the plan streams (no
+    sort, grouping or temporary table) it stops at the LIMIT, so rows is
+    capped there; when it does not, only join fan-out counts, since scanning
+    one table ahead of a sort is bounded by cost rather than by the LIMIT.
+    full_scans lists the tables read without an index.
+    """
+    cursor.execute(f"EXPLAIN FORMAT=JSON {sql}")
+    row = cursor.fetchone()
+    cursor.fetchall()
+    plan = json.loads(row['EXPLAIN'] if isinstance(row, dict) else row[0])
+    block = plan.get('query_block', {})
+    limit = row_limit(sql)
+    streams = _streams(block)
+    estimate = {'cost': float(block.get('cost_info', {}).get('query_cost', 0) or 0), 'rows': 0, 'full_scans': [],
+                'limit': limit, 'streams': streams}
+    for table, join_step in _walk(block):
+        rows = int(float(table.get('rows_produced_per_join', table.get('rows_examined_per_scan', 0)) or 0))
+        if limit is not None and not streams and not join_step:
+            rows = 0
+        estimate['rows'] = max(estimate['rows'], rows)
+        if table.get('access_type') == 'ALL':
+            estimate['full_scans'].append(table['table_name'])
+    if limit is not None and streams:
+        estimate['rows'] = min(estimate['rows'], limit)
+    return estimate
+
+
+def check_estimate(estimate, max_rows=None, max_cost=None):
+    # Human-readable reasons the plan is over the limits (empty when fine).
+    reasons = []
+    if max_rows and estimate['rows'] > max_rows:
+        reasons.append(f"the plan expects about {estimate['rows']} rows (limit {max_rows})")
+    if max_cost and estimate['cost'] > max_cost:
+        reasons.append(f"the estimated cost is {estimate['cost']:.0f} (limit {max_cost:.0f})")
+    return reasons
@@ -0,0 +1,202 @@
+"""Registry of in-flight queries, cancellation with KILL QUERY and per-route deadlines."""
+import logging
+import re
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# ER_QUERY_INTERRUPTED: how a statement stopped by KILL QUERY fails.
+QUERY_INTERRUPTED = 1317
+
+PREPARING = 'preparing'
+LLM = 'llm'
+EXECUTING = 'executing'
+FETCHING = 'fetching'
+STREAMING = 'streaming'
+
+_QUERY_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class QueryCancelled(Exception):
+    def __init__(self, query):
+        self.query = query
+        if query.cancel_reason == 'deadline':
+            message = f"Query cancelled after the {int(query.deadline * 1000)} ms deadline for {query.route}"
+        else:
+            message = 'Query cancelled'
+        super().__init__(message)
+
+
+def parse_deadlines(text):
+    # "/api/query=60000,/api/table/<table_name>=15000" -> {route: seconds}
+    deadlines = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        route, _, ms = item.rpartition('=')
+        if not route or not ms.strip().isdigit():
+            raise ValueError(f"Invalid query deadline '{item}', expected <route>=<milliseconds>")
+        if int(ms) > 0:
+            deadlines[route.strip()] = int(ms) / 1000
+    return deadlines
+
+
+class RunningQuery:
+    def __init__(self, query_id, db_name, route, session_id, deadline=None, question=None, phase=PREPARING):
+        self.id = query_id
+        self.db_name = db_name
+        self.route = route
+        self.session_id = session_id
+        self.deadline = deadline
+        self.question = question
+        self.phase = phase
+        self.sql = None
+        self.connection_id = None
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.cancel_reason = None
+        self.kill_sent = None
+        # Held while a KILL QUERY is sent, so the connection cannot be handed
+        # back to the pool (and to another request) while it is being killed.
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_reason is not None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'database': self.db_name,
+            'route': self.route,
+            'session': self.session_id,
+            'phase': self.phase,
+            'question': self.question,
+            'sql': self.sql,
+            'connection_id': self.connection_id,
+            'started_at': self.started_at,
+            'elapsed': round(time.monotonic() - self.started, 3),
+            'deadline_ms': int(self.deadline * 1000) if self.deadline else None,
+            'cancel_requested': self.cancelled,
+            'cancel_reason': self.cancel_reason,
+        }
+
+
+class QueryRegistry:
+    # kill(connection_id) issues KILL QUERY on a connection of its own. A
+    # watchdog thread cancels queries past their route's deadline (counted
+    # from the start of the request) and repeats the KILL for cancelled
+    # queries that are still attached to a connection, in case it arrived
+    # between two statements.
+    def __init__(self, kill, deadlines=None, check_interval=0.5, kill_retry=2.0):
+        self._kill = kill
+        self.deadlines = dict(deadlines or {})
+        self.check_interval = check_interval
+        self.kill_retry = kill_retry
+        self._queries = {}
+        self._lock = threading.Lock()
+        self._watchdog = None
+        self._stats = {'started': 0, 'finished': 0, 'cancelled': 0, 'deadline_exceeded': 0,
+                       'kills': 0, 'kill_errors': 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def start(self, db_name, route, session_id, query_id=None, question=None, phase=PREPARING):
+        # Raises ValueError for a malformed or already running client-chosen id.
+        if query_id is not None and not _QUERY_ID.match(str(query_id)):
+            raise ValueError('query_id must be 1-64 letters, digits, "-" or "_"')
+        query = RunningQuery(query_id or uuid.uuid4().hex, db_name, route, session_id,
+                             self.deadlines.get(route), question, phase)
+        with self._lock:
+            if query.id in self._queries:
+                raise ValueError(f"Query {query.id} is already running")
+            self._queries[query.id] = query
+            self._stats['started'] += 1
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name='query-watchdog', daemon=True)
+                self._watchdog.start()
+        return query
+
+    def set_phase(self, query, phase):
+        query.phase = phase
+
+    def executing(self, query, conn, sql):
+        # Attaches the pooled connection that is about to run sql; raises
+        # QueryCancelled if the query was cancelled before it got here. The
+        # connection is detached when it goes back to the pool.
+        with query._lock:
+            if query.cancelled:
+                raise QueryCancelled(query)
+            query.connection_id = conn.connection_id
+            query.sql = sql
+            query.phase = EXECUTING
+        conn.on_release(lambda: self._detach(query))
+
+    def _detach(self, query):
+        # True when a KILL was sent on this connection: it is then closed
+        # rather than pooled, in case the KILL landed between statements.
+        with query._lock:
+            query.connection_id = None
+            return query.kill_sent is not None
+
+    def finish(self, query):
+        with self._lock:
+            if self._queries.pop(query.id, None) is not None:
+                self._stats['finished'] += 1
+
+    def get(self, query_id):
+        with self._lock:
+            return self._queries.get(query_id)
+
+    def list(self):
+        with self._lock:
+            return sorted(self._queries.values(), key=lambda query: query.started)
+
+    def cancel(self, query_id, reason='user'):
+        query = self.get(query_id)
+        if query is None:
+            return None
+        self._cancel(query, reason)
+        return query
+
+    def _cancel(self, query, reason):
+        with query._lock:
+            if query.cancel_reason is None:
+                query.cancel_reason = reason
+                self._count('deadline_exceeded' if reason == 'deadline' else 'cancelled')
+                logger.warning(f"Cancelling query {query.id} on {query.route} ({reason}, "
+                               f"{time.monotonic() - query.started:.1f}s, phase {query.phase})")
+            if query.connection_id is not None:
+                self._send_kill(query)
+
+    def _send_kill(self, query):
+        # Called with query._lock held.
+        query.kill_sent = time.monotonic()
+        try:
+            self._kill(query.connection_id)
+            self._count('kills')
+        except Exception as e:
+            self._count('kill_errors')
+            logger.error(f"KILL QUERY {query.connection_id} failed: {str(e)}")
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_interval)
+            now = time.monotonic()
+            for query in self.list():
+                if query.cancel_reason is None:
+                    if query.deadline and now - query.started > query.deadline:
+                        self._cancel(query, 'deadline')
+                elif query.connection_id is not None and now - (query.kill_sent or 0) >= self.kill_retry:
+                    with query._lock:
+                        if query.connection_id is not None:
+                            self._send_kill(query)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['running'] = len(self._queries)
+        stats['deadlines_ms'] = {route: int(seconds * 1000) for route, seconds in self.deadlines.items()}
+        return stats
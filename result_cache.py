@@ -0,0 +1,227 @@
+"""In-memory cache of read-only query results with per-table invalidation."""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_QUOTED = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")")
+_IDENTIFIER = re.compile(r"`((?:[^`]|``)+)`|([A-Za-z_$][\w$]*)")
+_READ = re.compile(r"\s*\(*\s*(?:SELECT|WITH|SHOW|DESC|DESCRIBE|EXPLAIN|TABLE|VALUES)\b", re.IGNORECASE)
+_CACHEABLE = re.compile(r"\s*\(*\s*(?:SELECT|WITH|TABLE)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(?:INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+# Anything whose result depends on more than the tables read (clock, session,
+# randomness, other schemas) or that takes locks is never cached.
+_VOLATILE = re.compile(
+    r"\b(?:NOW|CURDATE|CURTIME|SYSDATE|UNIX_TIMESTAMP|RAND|RANDOM_BYTES|UUID|UUID_SHORT|CONNECTION_ID"
+    r"|LAST_INSERT_ID|FOUND_ROWS|ROW_COUNT|USER|SESSION_USER|SYSTEM_USER|DATABASE|SCHEMA|SLEEP"
+    r"|GET_LOCK|RELEASE_LOCK|IS_FREE_LOCK|IS_USED_LOCK|BENCHMARK)\s*\("
+    r"|\b(?:CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP|UTC_DATE|UTC_TIME"
+    r"|UTC_TIMESTAMP|CURRENT_USER|SQL_NO_CACHE|INTO)\b"
+    r"|\bFOR\s+(?:UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|@"
+    r"|\b(?:information_schema|performance_schema|mysql|sys)\s*\.",
+    re.IGNORECASE)
+
+
+def _split(sql):
+    # Alternating code / quoted-literal parts.
+    return _QUOTED.split(sql)
+
+
+def _code(sql):
+    return ' '.join(_split(sql)[::2])
+
+
+def normalize_sql(sql):
+    # Whitespace outside literals and trailing semicolons do not change the
+    # result; case is kept because table names can be case sensitive.
+    parts = _split(sql.strip())
+    out = [part if i % 2 else re.sub(r'\s+', ' ', part) for i, part in enumerate(parts)]
+    return ''.join(out).strip().rstrip(';').strip()
+
+
+def is_read_only(sql):
+    return bool(_READ.match(sql)) and not _WRITES.search(_code(sql))
+
+
+def is_cacheable(sql):
+    code = _code(normalize_sql(sql))
+    return bool(_CACHEABLE.match(code)) and ';' not in code and not _WRITES.search(code) \
+        and not _VOLATILE.search(code)
+
+
+def referenced_tables(sql, table_names):
+    # Known tables named anywhere in the statement (lower-cased). Aliases that
+    # happen to match a table name only cause extra invalidation.
+    known = {name.lower() for name in table_names}
+    found = set()
+    for m in _IDENTIFIER.finditer(_code(sql)):
+        name = (m.group(1).replace('``', '`') if m.group(1) is not None else m.group(2)).lower()
+        if name in known:
+            found.add(name)
+    return found
+
+
+def dependent_tables(schema, tables):
+    # `tables` plus every table whose foreign keys point (transitively) at one
+    # of them, since ON DELETE/UPDATE CASCADE can change those too.
+    result = {name.lower() for name in tables}
+    changed = True
+    while changed:
+        changed = False
+        for table in schema.tables.values():
+            name = table.name.lower()
+            if name not in result and any(ref.lower() in result for _, ref, _ in table.foreign_keys):
+                result.add(name)
+                changed = True
+    return result
+
+
+class CachedResult:
+    def __init__(self, columns, rows_json, row_count, tables):
+        self.columns = columns
+        self.rows_json = rows_json    # serialized row array (or columnar fragment), sent as-is on a hit
+        self.row_count = row_count
+        self.tables = tables
+        self.size = len(rows_json) + sum(len(c) for c in columns) + 200
+        self.created = time.time()
+
+
+class ResultCollector:
+    # Accumulates the serialized batches of a streamed result and stores them
+    # once the stream ends cleanly; results over max_entry_bytes are dropped.
+    def __init__(self, cache, db_name, sql, tables, version):
+        self.cache = cache
+        self.db_name = db_name
+        self.sql = sql
+        self.tables = tables
+        self.version = version
+        self.parts = []
+        self.size = 0
+        self.row_count = 0
+        self.overflow = False
+
+    def add(self, rows_json, count):
+        # rows_json: comma-separated row objects without the enclosing brackets.
+        if self.overflow:
+            return
+        self.size += len(rows_json) + 1
+        if self.size > self.cache.max_entry_bytes:
+            self.overflow = True
+            self.parts = []
+            return
+        self.parts.append(rows_json)
+        self.row_count += count
+
+    def finish(self, columns):
+        if self.overflow:
+            self.cache._count('too_large')
+            return
+        self.cache.put(self.db_name, self.sql, self.tables, columns,
+                       '[' + ','.join(self.parts) + ']', self.row_count, self.version)
+
+
+class QueryResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=2 * 1024 * 1024, ttl=300.0):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.ttl = ttl
+        self._entries = OrderedDict()     # (db, normalized sql, variant) -> CachedResult
+        self._by_table = {}               # (db, table) -> set of keys
+        self._versions = {}               # db -> bumped on every invalidation
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidated': 0,
+                       'expired': 0, 'too_large': 0, 'stale': 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def version(self, db_name):
+        # Taken before a query runs; put() refuses results that raced a write.
+        with self._lock:
+            return self._versions.get(db_name, 0)
+
+    def get(self, db_name, sql, variant='rows'):
+        # variant: the encoding the result was stored in ('rows' or 'columnar').
+        key = (db_name, normalize_sql(sql), variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry.created > self.ttl:
+                self._remove(key)
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def collector(self, db_name, sql, tables, version):
+        return ResultCollector(self, db_name, sql, tables, version)
+
+    def put(self, db_name, sql, tables, columns, rows_json, row_count, version, variant='rows'):
+        entry = CachedResult(columns, rows_json, row_count, frozenset(tables))
+        key = (db_name, normalize_sql(sql), variant)
+        with self._lock:
+            if entry.size > self.max_entry_bytes:
+                self._stats['too_large'] += 1
+                return False
+            if self._versions.get(db_name, 0) != version:
+                self._stats['stale'] += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            for table in entry.tables:
+                self._by_table.setdefault((db_name, table), set()).add(key)
+            self._stats['stores'] += 1
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+            return True
+
+    def _remove(self, key):
+        # Called with the lock held.
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get((key[0], table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[(key[0], table)]
+
+    def invalidate(self, db_name, tables=None):
+        # Drops the results that read any of `tables`, or every result for the
+        # database when tables is None.
+        with self._lock:
+            self._versions[db_name] = self._versions.get(db_name, 0) + 1
+            if tables is None:
+                keys = [key for key in self._entries if key[0] == db_name]
+            else:
+                keys = set()
+                for table in tables:
+                    keys |= self._by_table.get((db_name, table.lower()), set())
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidated'] += len(keys)
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['max_bytes'] = self.max_bytes
+        stats['max_entry_bytes'] = self.max_entry_bytes
+        stats['ttl'] = self.ttl
+        return stats
@@ -0,0 +1,197 @@
+"""Per-database schema metadata cache used by prompt building and the table editor."""
+import threading
+import time
+
+import tracing
+
+# Cheap fingerprint of a database's schema: table count, newest CREATE_TIME
+# and a checksum over every column definition. Any DDL that adds, drops or
+# changes a table or column moves at least one of them.
+FINGERPRINT_SQL = (
+    "SELECT "
+    "(SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s), "
+    "(SELECT MAX(CREATE_TIME) FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s), "
+    "(SELECT COALESCE(SUM(CRC32(CONCAT_WS(':', TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, COLUMN_TYPE, "
+    "IS_NULLABLE, COLUMN_KEY, COALESCE(COLUMN_DEFAULT, ''), EXTRA))), 0) "
+    "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s)"
+)
+
+DDL_KEYWORDS = ('CREATE', 'ALTER', 'DROP', 'RENAME', 'TRUNCATE')
+
+
+def is_ddl(sql):
+    words = sql.lstrip().split(None, 1)
+    return bool(words) and words[0].upper() in DDL_KEYWORDS
+
+
+class TableSchema:
+    def __init__(self, name):
+        self.name = name
+        # DESCRIBE-shaped dicts: Field, Type, Null, Key, Default, Extra
+        self.columns = []
+        self.primary_key = []
+        # (column, referenced_table, referenced_column)
+        self.foreign_keys = []
+        self.create_statement = None
+
+    @property
+    def column_names(self):
+        return [col['Field'] for col in self.columns]
+
+    def column_types(self):
+        return {col['Field']: col['Type'] for col in self.columns}
+
+
+class DatabaseSchema:
+    def __init__(self, db_name, fingerprint, tables):
+        self.db_name = db_name
+        self.fingerprint = fingerprint
+        self.tables = tables
+        self.loaded_at = time.time()
+        self.checked_at = time.monotonic()
+
+    @property
+    def table_names(self):
+        return list(self.tables)
+
+
+class SchemaCache:
+    def __init__(self, connection_factory, check_interval=5.0):
+        # connection_factory(db_name) must return a context manager yielding a
+        # connection, e.g. app.db_connection.
+        self.connection_factory = connection_factory
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'loads': 0,
+            'stale_reloads': 0,
+            'freshness_checks': 0,
+            'invalidations': 0,
+            'create_statement_loads': 0,
+        }
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _load_lock(self, db_name):
+        with self._lock:
+            return self._load_locks.setdefault(db_name, threading.Lock())
+
+    @staticmethod
+    def _fingerprint(cursor, db_name):
+        cursor.execute(FINGERPRINT_SQL, (db_name, db_name, db_name))
+        count, created, checksum = cursor.fetchone()
+        return (int(count or 0), str(created), int(checksum or 0))
+
+    def _load(self, conn, db_name):
+        cursor = conn.cursor()
+        fingerprint = self._fingerprint(cursor, db_name)
+        cursor.execute(
+            "SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME",
+            (db_name,))
+        tables = {row[0]: TableSchema(row[0]) for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, COLUMN_DEFAULT, EXTRA "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, ORDINAL_POSITION",
+            (db_name,))
+        for table, field, typ, nullable, key, default, extra in cursor.fetchall():
+            if table in tables:
+                tables[table].columns.append({
+                    'Field': field, 'Type': typ, 'Null': nullable,
+                    'Key': key, 'Default': default, 'Extra': extra,
+                })
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME, CONSTRAINT_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+            "FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = %s "
+            "AND (CONSTRAINT_NAME = 'PRIMARY' OR REFERENCED_TABLE_NAME IS NOT NULL) "
+            "ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION",
+            (db_name,))
+        for table, column, constraint, ref_table, ref_column in cursor.fetchall():
+            if table not in tables:
+                continue
+            if constraint == 'PRIMARY':
+                tables[table].primary_key.append(column)
+            else:
+                tables[table].foreign_keys.append((column, ref_table, ref_column))
+        cursor.close()
+        return DatabaseSchema(db_name, fingerprint, tables)
+
+    def get(self, db_name, force_check=False):
+        with self._lock:
+            entry = self._entries.get(db_name)
+        if entry is not None:
+            if not force_check and time.monotonic() - entry.checked_at < self.check_interval:
+                self._count('hits')
+                return entry
+        with self._load_lock(db_name):
+            # Another request may have refreshed the entry while we waited.
+            with self._lock:
+                current = self._entries.get(db_name)
+            if current is not None and current is not entry and not force_check:
+                self._count('hits')
+                return current
+            entry = current
+            with tracing.span('schema'), self.connection_factory(db_name) as conn:
+                if entry is not None:
+                    cursor = conn.cursor()
+                    fingerprint = self._fingerprint(cursor, db_name)
+                    cursor.close()
+                    self._count('freshness_checks')
+                    if fingerprint == entry.fingerprint:
+                        entry.checked_at = time.monotonic()
+                        self._count('hits')
+                        return entry
+                    self._count('stale_reloads')
+                self._count('misses')
+                entry = self._load(conn, db_name)
+            self._count('loads')
+            with self._lock:
+                self._entries[db_name] = entry
+            return entry
+
+    def table(self, db_name, table_name):
+        entry = self.get(db_name)
+        table = entry.tables.get(table_name)
+        if table is None:
+            # The table may have been created outside this process since the
+            # last check; look once more before reporting it missing.
+            table = self.get(db_name, force_check=True).tables.get(table_name)
+        return table
+
+    def create_statements(self, db_name, table_names=None):
+        entry = self.get(db_name)
+        names = entry.table_names if table_names is None else [t for t in table_names if t in entry.tables]
+        missing = [t for t in names if entry.tables[t].create_statement is None]
+        if missing:
+            with tracing.span('schema'), self.connection_factory(db_name) as conn:
+                cursor = conn.cursor()
+                for t in missing:
+                    cursor.execute(f"SHOW CREATE TABLE `{t}`")
+                    entry.tables[t].create_statement = cursor.fetchone()[1]
+                cursor.close()
+            self._count('create_statement_loads', len(missing))
+        return [entry.tables[t].create_statement for t in names]
+
+    def invalidate(self, db_name=None):
+        with self._lock:
+            if db_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(db_name, None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['databases'] = {
+                name: {'tables': len(entry.tables), 'loaded_at': entry.loaded_at}
+                for name, entry in self._entries.items()
+            }
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
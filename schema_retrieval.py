@@ -0,0 +1,135 @@
+"""Question-relevance ranking of tables so large schemas fit the prompt."""
+import math
+import re
+from collections import Counter
+
+from prompt_budget import fit_to_budget
+
+_WORD = re.compile(r'[A-Za-z][a-z]*|[A-Z]+(?![a-z])|\d+')
+_STOPWORDS = {
+    'a', 'an', 'the', 'of', 'for', 'in', 'on', 'by', 'to', 'and', 'or', 'with', 'from', 'at', 'is', 'are',
+    'me', 'show', 'list', 'all', 'get', 'find', 'give', 'what', 'which', 'who', 'how', 'many', 'much',
+    'each', 'per', 'their', 'there', 'that', 'this', 'those', 'these', 'be', 'was', 'were', 'do', 'does',
+    'id', 'ids', 'number', 'count', 'total', 'table', 'tables', 'data', 'record', 'records', 'row', 'rows',
+}
+
+# Field weights: a hit on the table name says more than a hit on a column.
+TABLE_WEIGHT = 3
+COLUMN_WEIGHT = 1
+REFERENCE_WEIGHT = 1
+
+
+def _stem(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('es') and word[-3] in 'sxz':
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    tokens = []
+    for part in re.split(r'[^A-Za-z0-9]+', text):
+        for word in _WORD.findall(part):
+            word = word.lower()
+            if word not in _STOPWORDS:
+                tokens.append(_stem(word))
+    return tokens
+
+
+class SchemaIndex:
+    # BM25 over one pseudo-document per table (table name, column names and the
+    # tables it references), plus the FK graph used for neighbourhood expansion.
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, schema):
+        self.docs = {}
+        self.neighbours = {name: set() for name in schema.tables}
+        for name, table in schema.tables.items():
+            terms = Counter()
+            for tok in tokenize(name):
+                terms[tok] += TABLE_WEIGHT
+            for col in table.column_names:
+                for tok in tokenize(col):
+                    terms[tok] += COLUMN_WEIGHT
+            for _, ref_table, _ in table.foreign_keys:
+                for tok in tokenize(ref_table):
+                    terms[tok] += REFERENCE_WEIGHT
+                if ref_table in self.neighbours:
+                    self.neighbours[name].add(ref_table)
+                    self.neighbours[ref_table].add(name)
+            self.docs[name] = terms
+        self.doc_len = {name: sum(terms.values()) for name, terms in self.docs.items()}
+        self.avg_len = (sum(self.doc_len.values()) / len(self.docs)) if self.docs else 0
+        df = Counter()
+        for terms in self.docs.values():
+            df.update(terms.keys())
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def score(self, question):
+        query = Counter(tokenize(question))
+        scores = {}
+        for name, terms in self.docs.items():
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[name] / (self.avg_len or 1))
+            total = 0.0
+            for term, qf in query.items():
+                tf = terms.get(term)
+                if tf:
+                    total += qf * self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if total:
+                scores[name] = total
+        return scores
+
+
+def get_index(schema):
+    # Built once per loaded schema; a reload produces a new DatabaseSchema.
+    index = getattr(schema, 'retrieval_index', None)
+    if index is None:
+        index = SchemaIndex(schema)
+        schema.retrieval_index = index
+    return index
+
+
+def select_tables(schema, question, load_statements, top_k=8, token_budget=6000, min_tables=12,
+                  summarize=None):
+    """Pick the tables to describe in the prompt for `question`.
+
+    load_statements(tables) returns the prompt text for each table, in order;
+    summarize(table), if given, a shorter text used when the full one does
+    not fit the budget. Returns (tables, statements, report) in prompt order.
+    """
+    names = schema.table_names
+    report = {'total_tables': len(names), 'pruned': False, 'scores': {}}
+    if len(names) <= min_tables:
+        candidates = names
+    else:
+        index = get_index(schema)
+        scores = index.score(question)
+        ranked = sorted(scores, key=lambda t: (-scores[t], t))
+        seeds = ranked[:top_k]
+        if not seeds:
+            # Nothing matched lexically; let the budget decide from the full list.
+            candidates = names
+        else:
+            candidates = list(seeds)
+            seen = set(seeds)
+            for table in seeds:
+                for neighbour in sorted(index.neighbours[table]):
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        candidates.append(neighbour)
+            report['pruned'] = True
+        report['scores'] = {t: round(scores[t], 3) for t in ranked[:top_k]}
+    included, statements, summarized, used = fit_to_budget(
+        candidates, load_statements(candidates), token_budget, summarize)
+    if len(included) < len(candidates) or summarized:
+        report['pruned'] = True
+    report['included'] = included
+    report['omitted'] = len(names) - len(included)
+    report['summarized'] = summarized
+    report['estimated_tokens'] = used
+    return included, statements, report
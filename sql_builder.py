@@ -0,0 +1,119 @@
+"""Deterministic SQL statement builders for the table editor routes."""
+import base64
+import json
+
+
+def quote_identifier(name):
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+def build_update(table_name, set_columns, where_columns, null_safe=False, limit=None):
+    # null_safe compares with <=> so rows can be matched on NULL cells, which is
+    # what the editor needs when a table has no primary key.
+    op = '<=>' if null_safe else '='
+    set_clause = ', '.join(f"{quote_identifier(col)} = %s" for col in set_columns)
+    where_clause = ' AND '.join(f"{quote_identifier(col)} {op} %s" for col in where_columns)
+    sql = f"UPDATE {quote_identifier(table_name)} SET {set_clause} WHERE {where_clause}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return sql
+
+
+def group_statements(statements):
+    # Collapse (sql, params) pairs into one executemany batch per distinct
+    # statement text, keeping first-seen order so writes stay predictable.
+    batches = {}
+    for sql, params in statements:
+        batches.setdefault(sql, []).append(params)
+    return list(batches.items())
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(state, dict):
+        raise ValueError('Invalid cursor')
+    return state
+
+
+def _row_compare(columns, op):
+    if len(columns) == 1:
+        return f"{quote_identifier(columns[0])} {op} %s"
+    cols = ', '.join(quote_identifier(col) for col in columns)
+    marks = ', '.join(['%s'] * len(columns))
+    return f"({cols}) {op} ({marks})"
+
+
+def build_keyset_select(table_name, order_column, pk_columns, descending=False, after=None, limit=100):
+    # Keyset pagination over (order_column, pk...). `after` holds the values of
+    # the last row of the previous page in that same order. MySQL sorts NULLs
+    # first ascending and last descending, so a NULL sort value needs its own
+    # branch instead of a plain row comparison.
+    key_columns = [order_column] + [col for col in pk_columns if col != order_column]
+    direction = 'DESC' if descending else 'ASC'
+    op = '<' if descending else '>'
+    where = ''
+    params = []
+    if after is not None:
+        if len(after) != len(key_columns):
+            raise ValueError('Cursor does not match the requested ordering')
+        order_value, tie_values = after[0], list(after[1:])
+        col = quote_identifier(order_column)
+        if len(key_columns) == 1:
+            if order_value is None:
+                raise ValueError('Cursor does not match the requested ordering')
+            where = f" WHERE {col} {op} %s"
+            params = [order_value]
+        elif order_value is None:
+            tie = _row_compare(key_columns[1:], op)
+            if descending:
+                where = f" WHERE {col} IS NULL AND {tie}"
+            else:
+                where = f" WHERE ({col} IS NULL AND {tie}) OR {col} IS NOT NULL"
+            params = tie_values
+        else:
+            compare = _row_compare(key_columns, op)
+            where = f" WHERE ({compare} OR {col} IS NULL)" if descending else f" WHERE {compare}"
+            params = [order_value] + tie_values
+    order_clause = ', '.join(f"{quote_identifier(col)} {direction}" for col in key_columns)
+    sql = f"SELECT * FROM {quote_identifier(table_name)}{where} ORDER BY {order_clause}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params, key_columns
+
+
+def build_offset_select(table_name, order_column=None, descending=False, offset=0, limit=100):
+    order_clause = ''
+    if order_column:
+        order_clause = f" ORDER BY {quote_identifier(order_column)} {'DESC' if descending else 'ASC'}"
+    sql = f"SELECT * FROM {quote_identifier(table_name)}{order_clause}"
+    if limit is not None or offset:
+        # MySQL has no OFFSET without LIMIT; this is its documented "all rows" value.
+        sql += f" LIMIT {int(limit) if limit is not None else 18446744073709551615} OFFSET {int(offset)}"
+    return sql, []
+
+
+def build_delete_in(table_name, key_columns, count):
+    # DELETE for `count` keys in one statement; composite keys use a row
+    # constructor: WHERE (a, b) IN ((%s, %s), ...).
+    if len(key_columns) == 1:
+        target = quote_identifier(key_columns[0])
+        item = '%s'
+    else:
+        target = '(' + ', '.join(quote_identifier(col) for col in key_columns) + ')'
+        item = '(' + ', '.join(['%s'] * len(key_columns)) + ')'
+    return f"DELETE FROM {quote_identifier(table_name)} WHERE {target} IN ({', '.join([item] * count)})"
+
+
+def build_delete_match(table_name, columns):
+    # One row matched on all of its values, NULLs included.
+    where_clause = ' AND '.join(f"{quote_identifier(col)} <=> %s" for col in columns)
+    return f"DELETE FROM {quote_identifier(table_name)} WHERE {where_clause} LIMIT 1"
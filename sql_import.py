@@ -0,0 +1,285 @@
+"""Streaming reader and batched importer for MySQL dump files."""
+import codecs
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+_QUOTE_END = {
+    "'": re.compile(r"[^'\\]*(?:\\[\s\S][^'\\]*)*'"),
+    '"': re.compile(r'[^"\\]*(?:\\[\s\S][^"\\]*)*"'),
+    '`': re.compile(r"[^`]*`"),
+}
+# Plain text and complete quoted strings up to the next delimiter, comment or
+# unterminated quote; lets the reader skip most of a statement in one match.
+_PLAIN = r"""[^'"`#/\-%s]*"""
+_SKIP = (r"""(?:'[^'\\]*(?:\\[\s\S][^'\\]*)*'|"[^"\\]*(?:\\[\s\S][^"\\]*)*"|`[^`]*`"""
+         r"""|/(?=[^*])|-(?=[^-]))""")
+_DELIMITER_COMMAND = re.compile(r"DELIMITER[ \t]+(\S+)[ \t]*(?:\r?\n|$)", re.IGNORECASE)
+_COMMENT_START = re.compile(r"--(?:[ \t\r\n]|$)|#|/\*(?![!+])")
+_WHITESPACE = re.compile(r"\s*")
+
+
+def _special(delimiter):
+    return re.compile(re.escape(delimiter) + r"""|['"`#]|--|/\*""")
+
+
+def _skip(delimiter):
+    if len(delimiter) != 1 or delimiter in '\'"`#/-':
+        return None
+    plain = _PLAIN % re.escape(delimiter)
+    return re.compile(f"{plain}(?:{_SKIP}{plain})*")
+
+
+class SqlStatementReader:
+    # Splits a dump into statements while reading it in chunks. Quoted strings
+    # and identifiers, `--`/`#`/`/* */` comments and the client-side DELIMITER
+    # command are understood; plain comments are dropped, while MySQL
+    # executable comments (/*! ... */) and optimizer hints are kept.
+    def __init__(self, stream, chunk_size=1 << 20):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.delimiter = ';'
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def _read(self):
+        # Returns '' only at end of input, even if a chunk ends mid-character.
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            self.bytes_read += len(chunk)
+            if not isinstance(chunk, bytes):
+                return chunk
+            text = self._decoder.decode(chunk, final=not chunk)
+            if text or not chunk:
+                return text
+
+    def __iter__(self):
+        buf = ''
+        pos = 0
+        seg = 0       # start of statement text in buf not yet moved to parts
+        parts = []
+        eof = False
+        need_more = True
+        at_start = True
+        special = _special(self.delimiter)
+        skip = _skip(self.delimiter)
+
+        while True:
+            if need_more and not eof:
+                # Keep the unscanned tail (which may hold half a token) and read on.
+                parts.append(buf[seg:pos])
+                chunk = self._read()
+                buf = buf[pos:] + chunk
+                pos = seg = 0
+                eof = not chunk
+            need_more = False
+
+            if at_start:
+                # Only whitespace and comments so far: a DELIMITER command may follow.
+                pos = _WHITESPACE.match(buf, pos).end()
+                parts = []
+                seg = pos
+                if buf[pos:pos + 1] in ('d', 'D', ''):
+                    head = buf[pos:pos + 10]
+                    if not eof and (len(head) < 10 or head.upper().startswith('DELIMITER') and buf.find('\n', pos) == -1):
+                        need_more = True
+                        continue
+                    if pos == len(buf):
+                        break
+                    m = _DELIMITER_COMMAND.match(buf, pos)
+                    if m:
+                        self.delimiter = m.group(1)
+                        special = _special(self.delimiter)
+                        skip = _skip(self.delimiter)
+                        pos = seg = m.end()
+                        continue
+                if not _COMMENT_START.match(buf, pos):
+                    at_start = False
+
+            if skip is not None:
+                pos = skip.match(buf, pos).end()
+            m = special.search(buf, pos)
+            if m is None:
+                if eof:
+                    break
+                # Nothing special here; leave room for a token split across chunks.
+                pos = max(pos, len(buf) - len(self.delimiter) - 1)
+                need_more = True
+                continue
+            token = m.group()
+            if token == self.delimiter:
+                statement = (''.join(parts) + buf[seg:m.start()]).strip()
+                parts = []
+                pos = seg = m.end()
+                at_start = True
+                if statement:
+                    yield statement
+                continue
+
+            if token in _QUOTE_END:
+                end = _QUOTE_END[token].match(buf, m.end())
+                end = end and end.end()
+            elif token == '/*':
+                end = buf.find('*/', m.end())
+                end = end + 2 if end != -1 else None
+            else:
+                # '--' only starts a comment when followed by whitespace.
+                if token == '--' and m.end() == len(buf) and not eof:
+                    pos = m.start()
+                    need_more = True
+                    continue
+                if token == '--' and m.end() < len(buf) and buf[m.end()] not in ' \t\r\n':
+                    pos = m.end()
+                    continue
+                end = buf.find('\n', m.end())
+                end = end if end != -1 else (len(buf) if eof else None)
+            if end is None:
+                if eof:
+                    pos = len(buf)
+                    break
+                pos = m.start()
+                need_more = True
+                continue
+
+            if token in _QUOTE_END or buf.startswith(('/*!', '/*+'), m.start()):
+                pos = end
+            else:
+                # Plain comment: drop it (a block comment still separates tokens).
+                parts.append(buf[seg:m.start()] + (' ' if token == '/*' else ''))
+                pos = seg = end
+
+        statement = (''.join(parts) + buf[seg:]).strip()
+        if statement:
+            yield statement
+
+
+_INSERT = re.compile(
+    r"INSERT\s+(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY)\s+)?(?:IGNORE\s+)?INTO\s+"
+    r"(?:`[^`]*`|\w+)(?:\s*\.\s*(?:`[^`]*`|\w+))?\s*(?:\([^()]*\)\s*)?VALUES?(?=\s*\()",
+    re.IGNORECASE)
+_MAYBE_DUPLICATE = re.compile(r"(?i)duplicate")
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+
+
+def _values(statement, prefix):
+    values = statement[len(prefix):].lstrip()
+    if not (values.startswith('(') and values.endswith(')')):
+        return None
+    if _MAYBE_DUPLICATE.search(values) and _ON_DUPLICATE.search(values):
+        return None
+    return values
+
+
+def split_insert(statement):
+    # (prefix, values) for a plain INSERT ... VALUES (...), (...) statement,
+    # or None if it cannot safely be merged with its neighbours.
+    m = _INSERT.match(statement)
+    if m is None:
+        return None
+    values = _values(statement, m.group())
+    return (m.group(), values) if values else None
+
+
+def coalesce_inserts(statements, max_bytes=1 << 20):
+    # Yields (sql, source_statements). Consecutive INSERTs into the same table
+    # and column list are merged into one multi-row INSERT of at most
+    # max_bytes; every other statement passes through unchanged and in order.
+    prefix = None
+    values = []
+    size = 0
+    for statement in statements:
+        # Dumps repeat the same prefix verbatim, so try that before the regex.
+        more = _values(statement, prefix) if prefix is not None and statement.startswith(prefix) else None
+        if more is not None and size + len(more) + 1 <= max_bytes:
+            values.append(more)
+            size += len(more) + 1
+            continue
+        if prefix is not None:
+            yield f"{prefix} {','.join(values)}", len(values)
+            prefix = None
+        parsed = split_insert(statement)
+        if parsed:
+            prefix, values = parsed[0], [parsed[1]]
+            size = len(prefix) + len(parsed[1]) + 1
+        else:
+            yield statement, 1
+    if prefix is not None:
+        yield f"{prefix} {','.join(values)}", len(values)
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+class DumpImportError(Exception):
+    def __init__(self, message, statement_number, statement):
+        super().__init__(f"Statement {statement_number} failed: {message} (near: {statement[:120]})")
+        self.statement_number = statement_number
+
+
+def import_dump(conn, reader, handle_statement=None, commit_every=5000, batch_bytes=1 << 20,
+                progress=None, progress_interval=2.0, cancelled=None):
+    """Execute the statements of a SqlStatementReader over `conn`.
+
+    handle_statement(cursor, sql) may execute a statement itself (e.g. to
+    switch databases) and return True. Work is committed every
+    `commit_every` source statements; progress(stats) is called at most every
+    `progress_interval` seconds and once at the end. If cancelled() turns
+    true the uncommitted chunk is rolled back and ImportCancelled is raised;
+    chunks that were already committed (and any DDL) stay in place.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT @@max_allowed_packet")
+    # Leave headroom for the protocol overhead around the statement text.
+    batch_bytes = max(1024, min(batch_bytes, int(cursor.fetchone()[0]) - 4096))
+    conn.autocommit = False
+    stats = {'statements': 0, 'executed': 0, 'merged_inserts': 0, 'rows_inserted': 0, 'commits': 0,
+             'bytes_read': 0, 'elapsed': 0.0}
+    started = last_report = time.monotonic()
+    uncommitted = 0
+    try:
+        for sql, count in coalesce_inserts(reader, batch_bytes):
+            if cancelled and cancelled():
+                conn.rollback()
+                if progress:
+                    stats['bytes_read'] = reader.bytes_read
+                    stats['elapsed'] = round(time.monotonic() - started, 3)
+                    progress(dict(stats))
+                raise ImportCancelled(f"Import cancelled after {stats['statements']} statements")
+            first = stats['statements'] + 1
+            stats['statements'] += count
+            try:
+                if not (handle_statement and handle_statement(cursor, sql)):
+                    cursor.execute(sql)
+                    if cursor.with_rows:
+                        cursor.fetchall()
+                    elif sql[:6].upper() == 'INSERT' and cursor.rowcount > 0:
+                        stats['rows_inserted'] += cursor.rowcount
+            except Exception as e:
+                conn.rollback()
+                raise DumpImportError(str(e), first, sql) from e
+            stats['executed'] += 1
+            if count > 1:
+                stats['merged_inserts'] += count
+            uncommitted += count
+            if uncommitted >= commit_every:
+                conn.commit()
+                stats['commits'] += 1
+                uncommitted = 0
+            now = time.monotonic()
+            if progress and now - last_report >= progress_interval:
+                last_report = now
+                stats['bytes_read'] = reader.bytes_read
+                stats['elapsed'] = round(now - started, 3)
+                progress(dict(stats))
+        conn.commit()
+        stats['commits'] += 1
+    finally:
+        cursor.close()
+    stats['bytes_read'] = reader.bytes_read
+    stats['elapsed'] = round(time.monotonic() - started, 3)
+    if progress:
+        progress(dict(stats))
+    return stats
@@ -0,0 +1,225 @@
+"""Checks table and column references in SQL against the cached schema."""
+import difflib
+import logging
+
+# Parsing needs sqlglot; without it (or for SQL it cannot parse) validation
+# is skipped and MySQL remains the judge. Only references that are certainly
+# wrong are reported, so a valid query is never held back.
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import SqlglotError
+    from sqlglot.optimizer.scope import Scope, traverse_scope
+except ImportError:  # optional dependency
+    sqlglot = None
+
+logger = logging.getLogger(__name__)
+
+# Table names that never come from the schema.
+_BUILTIN_TABLES = {'dual'}
+
+
+def available():
+    return sqlglot is not None
+
+
+def column_map(schema):
+    # {table: set(columns)}, lower-cased (MySQL column names are case
+    # insensitive); built once per loaded DatabaseSchema.
+    columns = getattr(schema, 'validator_columns', None)
+    if columns is None:
+        columns = {name.lower(): {col['Field'].lower() for col in table.columns}
+                   for name, table in schema.tables.items()}
+        schema.validator_columns = columns
+    return columns
+
+
+def _suggest(name, choices):
+    return difflib.get_close_matches(name, sorted(choices), n=3, cutoff=0.6)
+
+
+def _issue(kind, name, message, table=None, suggestions=None):
+    issue = {'kind': kind, 'name': name, 'message': message}
+    if table:
+        issue['table'] = table
+    if suggestions:
+        issue['suggestions'] = suggestions
+    return issue
+
+
+class _Checker:
+    def __init__(self, columns, db_name):
+        self.columns = columns
+        self.db_name = (db_name or '').lower()
+        self.issues = []
+        self._seen = set()
+        # Tables created by earlier statements of the same batch.
+        self.created = set()
+
+    def add(self, issue):
+        key = (issue['kind'], issue.get('table'), issue['name'])
+        if key not in self._seen:
+            self._seen.add(key)
+            self.issues.append(issue)
+
+    def table_name(self, table):
+        # Lower-cased schema table name, or None for other databases, CTEs
+        # and built-ins (which are not checked).
+        if table.catalog or (table.db and table.db.lower() != self.db_name):
+            return None
+        name = table.name.lower()
+        return None if not name or name in _BUILTIN_TABLES else name
+
+    def check_tables(self, tree):
+        # CTE names and aliases (multi-table DELETE lists its targets by alias).
+        local = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        local |= {table.alias.lower() for table in tree.find_all(exp.Table) if table.alias}
+        # CREATE and DROP targets need not exist (and for CREATE, must not).
+        targets = set()
+        if isinstance(tree, exp.Drop):
+            targets = {id(table) for table in tree.find_all(exp.Table) if table.parent is tree}
+        elif isinstance(tree, exp.Create):
+            target = tree.this.this if isinstance(tree.this, exp.Schema) else tree.this
+            if isinstance(target, exp.Table):
+                targets.add(id(target))
+                name = self.table_name(target)
+                if name:
+                    self.created.add(name)
+        for table in tree.find_all(exp.Table):
+            name = self.table_name(table)
+            if name is None or id(table) in targets or name in local or name in self.columns \
+                    or name in self.created:
+                continue
+            self.add(_issue('unknown_table', table.name, f"Unknown table '{table.name}'",
+                            suggestions=_suggest(name, self.columns)))
+
+    def source_columns(self, source):
+        # Column names a FROM source provides, or None when they are unknown.
+        if isinstance(source, exp.Table):
+            name = self.table_name(source)
+            return self.columns.get(name) if name else None
+        if isinstance(source, Scope):
+            if any(isinstance(e, exp.Star) or (isinstance(e, exp.Column) and isinstance(e.this, exp.Star))
+                   for e in getattr(source.expression, 'selects', [])):
+                return None
+            return {name.lower() for name in source.expression.named_selects}
+        return None
+
+    def check_scope(self, scope):
+        # Select aliases may be used in GROUP BY / HAVING / ORDER BY, and a
+        # UNION's ORDER BY refers to its output columns.
+        if isinstance(scope.expression, exp.Select):
+            aliases = {e.alias.lower() for e in scope.expression.selects if isinstance(e, exp.Alias)}
+        else:
+            aliases = {name.lower() for name in getattr(scope.expression, 'named_selects', [])}
+        # USING / NATURAL joins merge same-named columns.
+        merged = any(join.args.get('using') or join.args.get('method') == 'NATURAL'
+                     for join in scope.expression.args.get('joins') or [])
+        for column in scope.columns:
+            # Unqualified columns of nested subqueries are listed here too;
+            # they are checked in their own scope.
+            if isinstance(column.this, exp.Star) or \
+                    column.find_ancestor(exp.Select, exp.SetOperation) is not scope.expression:
+                continue
+            name = column.name.lower()
+            if column.table:
+                self.check_qualified(scope, column.table.lower(), column.name, name)
+            else:
+                self.check_unqualified(scope, column.name, name, aliases, merged)
+
+    def find_source(self, scope, alias):
+        while scope is not None:
+            for key, source in scope.sources.items():
+                if key.lower() == alias:
+                    return source
+            scope = scope.parent
+        return None
+
+    def check_qualified(self, scope, alias, original, name):
+        source = self.find_source(scope, alias)
+        if source is None:
+            self.add(_issue('unknown_table', alias, f"Unknown table or alias '{alias}' in '{alias}.{original}'"))
+            return
+        columns = self.source_columns(source)
+        if columns is not None and name not in columns:
+            table = source.name if isinstance(source, exp.Table) else alias
+            self.add(_issue('unknown_column', original, f"Unknown column '{original}' in '{table}'",
+                            table=table, suggestions=_suggest(name, columns)))
+
+    def check_unqualified(self, scope, original, name, aliases, merged):
+        if name in aliases:
+            return
+        level = scope
+        nearby = set()
+        while level is not None:
+            known = [(key, self.source_columns(source)) for key, source in level.sources.items()]
+            if any(columns is None for _, columns in known):
+                return    # some source's columns are unknown; cannot judge
+            owners = [key for key, columns in known if name in columns]
+            if len(owners) > 1 and level is scope and not merged:
+                self.add(_issue('ambiguous_column', original,
+                                f"Column '{original}' is ambiguous; it exists in {', '.join(owners)}"))
+                return
+            if owners:
+                return
+            for _, columns in known:
+                nearby |= columns
+            level = level.parent
+        self.add(_issue('unknown_column', original, f"Unknown column '{original}'",
+                        suggestions=_suggest(name, nearby)))
+
+    def check_target_columns(self, table, names):
+        # INSERT column lists and single-table UPDATE ... SET targets.
+        name = self.table_name(table)
+        columns = self.columns.get(name) if name else None
+        if columns is None:
+            return
+        for original in names:
+            if original.lower() not in columns:
+                self.add(_issue('unknown_column', original, f"Unknown column '{original}' in '{table.name}'",
+                                table=table.name, suggestions=_suggest(original.lower(), columns)))
+
+    def check(self, tree):
+        self.check_tables(tree)
+        if isinstance(tree, exp.Insert) and isinstance(tree.this, exp.Schema):
+            self.check_target_columns(tree.this.this, [col.name for col in tree.this.expressions])
+        elif isinstance(tree, exp.Update) and isinstance(tree.this, exp.Table) and not tree.args.get('from') \
+                and not tree.args.get('joins'):
+            targets = [eq.this.name for eq in tree.expressions
+                       if isinstance(eq, exp.EQ) and isinstance(eq.this, exp.Column) and not eq.this.table]
+            self.check_target_columns(tree.this, targets)
+        for scope in traverse_scope(tree):
+            self.check_scope(scope)
+
+
+def validate_sql(sql, schema, db_name=None):
+    """Unknown tables/columns and ambiguous columns in `sql`.
+
+    Returns a list of issue dicts (kind, name, message and, where known,
+    table and suggestions), or None when the SQL could not be checked.
+    """
+    if sqlglot is None:
+        return None
+    try:
+        trees = [tree for tree in sqlglot.parse(sql, read='mysql') if tree is not None]
+    except SqlglotError:
+        return None
+    checker = _Checker(column_map(schema), db_name or getattr(schema, 'db_name', None))
+    try:
+        for tree in trees:
+            checker.check(tree)
+    except SqlglotError as e:
+        logger.debug(f"SQL validation skipped: {e}")
+        return None
+    return checker.issues
+
+
+def format_issues(issues):
+    # One line per issue, for error messages and correction prompts.
+    lines = []
+    for issue in issues:
+        line = issue['message']
+        if issue.get('suggestions'):
+            line += f" (did you mean: {', '.join(issue['suggestions'])}?)"
+        lines.append(line)
+    return '\n'.join(lines)
@@ -25,60 +25,278 @@ async function getTableSchema(tableName) {
     return [];
 }
 
-async function loadTableData() {
+// Rows as loaded from the server (the grid's row store) and the text of
+// edited cells by row index; only the rows in view are in the DOM.
+let gridState = newGridState(null);
+
+function newGridState(tableName, orderBy = null, order = 'asc') {
+    return {
+        tableName, pkColumns: [], headers: [], original: [], nextCursor: null, hasMore: false, orderBy, order,
+        approxTotal: null, loading: false, columnTypes: {}, columnClasses: [], editable: [], edits: new Map(),
+        rowHeight: 0, renderedFirst: -1, renderedLast: -1
+    };
+}
+
+function cellText(value) {
+    return value === null || value === undefined ? '' : String(value);
+}
+
+function escapeHtml(text) {
+    return text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+}
+
+// jsonify renders DATE/DATETIME values as "Mon, 01 Jan 2024 00:00:00 GMT"
+const HTTP_DATE_RE = /^[A-Z][a-z]{2}, \d{2} [A-Z][a-z]{2} \d{4} \d{2}:\d{2}:\d{2} GMT$/;
+
+function normalizeCellValue(value) {
+    if (typeof value === 'string' && HTTP_DATE_RE.test(value)) {
+        return new Date(value).toISOString().slice(0, 19).replace('T', ' ');
+    }
+    return value;
+}
+
+// Bit i of a base64 null bitmap is set when row i is NULL
+function decodeNullBitmap(encoded) {
+    if (!encoded) return null;
+    const text = atob(encoded);
+    const bits = new Uint8Array(text.length);
+    for (let i = 0; i < text.length; i++) bits[i] = text.charCodeAt(i);
+    return bits;
+}
+
+// Rows of a format=columnar response as objects keyed by column name
+function decodeColumnar(result) {
+    const { columns, values, row_count: rowCount } = result;
+    const nulls = result.nulls.map(decodeNullBitmap);
+    const rows = new Array(rowCount);
+    for (let i = 0; i < rowCount; i++) {
+        const row = {};
+        for (let c = 0; c < columns.length; c++) {
+            const bits = nulls[c];
+            row[columns[c]] = bits && (bits[i >> 3] >> (i & 7)) & 1 ? null : values[c][i];
+        }
+        rows[i] = row;
+    }
+    return rows;
+}
+
+async function fetchTablePage(state, withCount) {
+    const params = new URLSearchParams({ format: 'columnar', limit: GRID_PAGE_SIZE });
+    if (state.orderBy) {
+        params.set('order_by', state.orderBy);
+        params.set('order', state.order);
+    }
+    if (state.nextCursor) params.set('cursor', state.nextCursor);
+    if (withCount) params.set('count', 'approx');
+    const response = await fetch(`/api/table/${encodeURIComponent(state.tableName)}?${params}`);
+    const result = await response.json();
+    if (result.format === 'columnar') result.data = decodeColumnar(result);
+    return result;
+}
+
+// Rows rendered above and below the visible ones, so short scrolls need no redraw
+const GRID_OVERSCAN = 20;
+const GRID_DEFAULT_ROW_HEIGHT = 46;
+const NUMERIC_TYPES = new Set(['int', 'float', 'decimal']);
+// Rows per request as the grid scrolls (the server caps it at TABLE_PAGE_MAX)
+const GRID_PAGE_SIZE = 500;
+
+// Per-column CSS class and editability, worked out once per table from the
+// column types the server sent (binary values are shown as base64, so they
+// are never edited as text)
+function buildColumnMaps(state) {
+    state.columnClasses = state.headers.map(h => NUMERIC_TYPES.has(state.columnTypes[h]) ? 'num' : '');
+    state.editable = state.headers.map(h => !state.pkColumns.includes(h) && state.columnTypes[h] !== 'binary');
+}
+
+function gridRowHtml(index) {
+    const { headers, original, edits, columnClasses, editable } = gridState;
+    const row = original[index];
+    const rowEdits = edits.get(index);
+    const cells = headers.map((h, c) => {
+        const edited = rowEdits !== undefined && h in rowEdits;
+        const text = edited ? rowEdits[h] : cellText(row[h]);
+        const cls = (columnClasses[c] + (edited && text !== cellText(row[h]) ? ' cell-edited' : '') +
+            (editable[c] ? '' : ' cell-locked')).trim();
+        return `<td contenteditable="${editable[c]}" data-col="${c}" class="${cls}">${escapeHtml(text)}</td>`;
+    }).join('');
+    return `<tr data-index="${index}"${index % 2 ? ' class="stripe"' : ''}>${cells}</tr>`;
+}
+
+// Renders the rows in view plus GRID_OVERSCAN on either side, with spacer
+// rows standing in for the rest, so the DOM size does not grow with the table
+function renderVisibleRows(force = false) {
+    const viewport = document.getElementById('table-viewport');
+    const tbody = document.getElementById('table-data').querySelector('tbody');
+    const count = gridState.original.length;
+    if (!viewport || count === 0) return;
+    const rowHeight = gridState.rowHeight || GRID_DEFAULT_ROW_HEIGHT;
+    const first = Math.max(0, Math.floor(viewport.scrollTop / rowHeight) - GRID_OVERSCAN);
+    const last = Math.min(count, Math.ceil((viewport.scrollTop + viewport.clientHeight) / rowHeight) + GRID_OVERSCAN);
+    if (!force && first === gridState.renderedFirst && last === gridState.renderedLast) return;
+    gridState.renderedFirst = first;
+    gridState.renderedLast = last;
+    const colspan = gridState.headers.length;
+    const spacer = height => `<tr class="grid-spacer"><td colspan="${colspan}" style="height:${height}px"></td></tr>`;
+    let html = first > 0 ? spacer(first * rowHeight) : '';
+    for (let i = first; i < last; i++) html += gridRowHtml(i);
+    if (last < count) html += spacer((count - last) * rowHeight);
+    tbody.innerHTML = html;
+    if (!gridState.rowHeight) {
+        const tr = tbody.querySelector('tr[data-index]');
+        if (tr && tr.offsetHeight) {
+            gridState.rowHeight = tr.offsetHeight;
+            renderVisibleRows(true);
+        }
+    }
+}
+
+// Fixes the column widths at those of the first rows rendered, so columns do
+// not jump as rows with longer values scroll into view
+function freezeColumnWidths(table) {
+    const ths = Array.from(table.querySelectorAll('thead th'));
+    const widths = ths.map(th => th.offsetWidth);
+    ths.forEach((th, i) => { th.style.width = `${widths[i]}px`; });
+    table.style.tableLayout = 'fixed';
+}
+
+// Fetches the next page once the user is within a screen of the loaded rows
+function loadMoreIfNearEnd() {
+    const viewport = document.getElementById('table-viewport');
+    if (!viewport || !gridState.hasMore || gridState.loading) return;
+    if (viewport.scrollTop + 2 * viewport.clientHeight >= viewport.scrollHeight) loadMoreRows();
+}
+
+let gridScrollPending = false;
+
+function onGridScroll() {
+    if (gridScrollPending) return;
+    gridScrollPending = true;
+    requestAnimationFrame(() => {
+        gridScrollPending = false;
+        renderVisibleRows();
+        loadMoreIfNearEnd();
+    });
+}
+
+// Single delegated listener for every editable cell; edits live in
+// gridState.edits so they survive the row being scrolled out of the DOM
+function onGridCellInput(event) {
+    const cell = event.target.closest('td[contenteditable="true"]');
+    if (!cell) return;
+    const index = Number(cell.parentElement.dataset.index);
+    const column = gridState.headers[cell.dataset.col];
+    const original = gridState.original[index];
+    if (!original || column === undefined) return;
+    let rowEdits = gridState.edits.get(index);
+    if (!rowEdits) gridState.edits.set(index, rowEdits = {});
+    rowEdits[column] = cell.textContent;
+    cell.classList.toggle('cell-edited', cell.textContent !== cellText(original[column]));
+}
+
+function renderGridPager() {
+    const pager = document.getElementById('table-pager');
+    if (!pager) return;
+    const loaded = gridState.original.length;
+    const total = gridState.approxTotal !== null ? ` of ~${gridState.approxTotal}` : '';
+    const more = gridState.hasMore ? (gridState.loading ? ', loading more...' : ', scroll for more') : '';
+    pager.querySelector('.pager-status').textContent = gridState.tableName && loaded ? `${loaded}${total} rows loaded${more}` : '';
+}
+
+function sortTable(column) {
+    const order = gridState.orderBy === column && gridState.order === 'asc' ? 'desc' : 'asc';
+    loadTableData(column, order);
+}
+
+async function loadTableData(orderBy = null, order = 'asc') {
     const tableSelect = document.getElementById('table-select');
     const tableName = tableSelect.value;
     const tableData = document.getElementById('table-data');
     const tableError = document.getElementById('table-error');
+    gridState = newGridState(tableName, orderBy, order);
+    tableData.querySelector('tbody').innerHTML = '';
+    tableData.style.tableLayout = '';
+    document.getElementById('table-viewport').scrollTop = 0;
+    renderGridPager();
     if (!tableName) {
         tableData.querySelector('thead tr').innerHTML = '';
-        tableData.querySelector('tbody').innerHTML = '';
         tableError.textContent = '';
         return;
     }
 
-    let pkColumns = await getPrimaryKeyColumns(tableName);
-
     try {
-        const response = await fetch(`/api/table/${encodeURIComponent(tableName)}`);
-        const result = await response.json();
+        const result = await fetchTablePage(gridState, true);
         if (result.error) {
             tableError.textContent = result.error;
             tableData.querySelector('thead tr').innerHTML = '';
-            tableData.querySelector('tbody').innerHTML = '';
             return;
         }
 
         tableError.textContent = '';
         const data = result.data;
+        gridState.pkColumns = result.primary_key || [];
+        gridState.orderBy = result.order_by;
+        gridState.order = result.order;
+        gridState.nextCursor = result.next_cursor;
+        gridState.hasMore = result.has_more;
+        gridState.approxTotal = result.approx_total ?? null;
+        if (result.types) {
+            result.columns.forEach((column, i) => { gridState.columnTypes[column] = result.types[i]; });
+        }
         if (data.length === 0) {
             tableData.querySelector('thead tr').innerHTML = '';
             tableData.querySelector('tbody').innerHTML = '<tr><td colspan="1">No data available</td></tr>';
+            renderGridPager();
             return;
         }
 
-        const headers = Object.keys(data[0]);
-        tableData.querySelector('thead tr').innerHTML = headers.map(h => `<th>${h}</th>`).join('');
-        tableData.querySelector('tbody').innerHTML = data.map((row, index) =>
-            `<tr data-index="${index}">${headers.map(h =>
-                pkColumns.includes(h)
-                    ? `<td data-column="${h}" style="background:#eee;" contenteditable="false">${row[h] || ''}</td>`
-                    : `<td contenteditable="true" data-column="${h}">${row[h] || ''}</td>`
-            ).join('')}</tr>`
-        ).join('');
-
-        tableData.querySelectorAll('td[contenteditable="true"]').forEach(cell => {
-            cell.addEventListener('input', () => {
-                const rowIndex = cell.parentElement.dataset.index;
-                const column = cell.dataset.column;
-                console.log(`Edited cell: Table=${tableName}, Row=${rowIndex}, Column=${column}, Value=${cell.textContent}`);
-            });
-        });
+        const headers = result.columns || Object.keys(data[0]);
+        gridState.headers = headers;
+        gridState.original = data;
+        buildColumnMaps(gridState);
+        tableData.querySelector('thead tr').innerHTML = headers.map((h, c) => {
+            const arrow = h === gridState.orderBy ? (gridState.order === 'desc' ? ' &#9660;' : ' &#9650;') : '';
+            return `<th data-col="${c}" style="cursor:pointer;" onclick="sortTable(gridState.headers[this.dataset.col])">${escapeHtml(h)}${arrow}</th>`;
+        }).join('');
+        renderVisibleRows(true);
+        freezeColumnWidths(tableData);
+        renderGridPager();
+        loadMoreIfNearEnd();
     } catch (error) {
         tableError.textContent = `Failed to load table data: ${error.message}`;
     }
 }
 
+async function loadMoreRows() {
+    const tableError = document.getElementById('table-error');
+    const state = gridState;
+    if (!state.tableName || !state.hasMore || state.loading) return;
+    state.loading = true;
+    renderGridPager();
+    let loaded = false;
+    try {
+        const result = await fetchTablePage(state, false);
+        if (state !== gridState) return;
+        if (result.error) {
+            tableError.textContent = result.error;
+            return;
+        }
+        for (const row of result.data) state.original.push(row);
+        state.nextCursor = result.next_cursor;
+        state.hasMore = result.has_more;
+        renderVisibleRows(true);
+        loaded = true;
+    } catch (error) {
+        tableError.textContent = `Failed to load more rows: ${error.message}`;
+    } finally {
+        state.loading = false;
+        if (state === gridState) {
+            renderGridPager();
+            if (loaded) loadMoreIfNearEnd();
+        }
+    }
+}
+
 function toMySQLDate(val) {
     const d = new Date(val);
     if (!isNaN(d.getTime())) {
@@ -93,55 +311,59 @@ function toMySQLDate(val) {
     return val;
 }
 
+// Summary of the cells the server could not convert and stored as NULL
+function invalidValuesText(invalid, label = 'Invalid values') {
+    if (!invalid) return '';
+    const parts = Object.entries(invalid).map(([col, e]) =>
+        `${col}: ${e.count} (e.g. "${e.examples[0].value}" - ${e.examples[0].reason})`);
+    return `. ${label}: ${parts.join('; ')}`;
+}
+
 async function updateTable() {
     const tableName = document.getElementById('table-select').value;
-    const tableData = document.getElementById('table-data');
     const tableError = document.getElementById('table-error');
     if (!tableName) {
         tableError.textContent = 'Please select a table';
         return;
     }
+    if (gridState.tableName !== tableName) {
+        tableError.textContent = 'Table data is not loaded yet.';
+        return;
+    }
 
-    const schema = await getTableSchema(tableName);
-    const pkColumns = await getPrimaryKeyColumns(tableName);
-    const rows = tableData.querySelectorAll('tbody tr');
-    const data = Array.from(rows).map(row => {
-        const cells = row.querySelectorAll('td');
-        const rowData = {};
-        const identifier = {};
-        let hasEmptyPK = false;
-        cells.forEach(cell => {
-            const column = cell.dataset.column;
-            let value = cell.textContent || null;
-            const colSchema = schema.find(col => col.Field === column);
-            if (colSchema) {
-                if (/int|decimal|float|double/.test(colSchema.Type) && (value === '' || value === null)) {
-                    value = null;
-                }
-            }
-            if (value && Date.parse(value) && !/^\d{4}-\d{2}-\d{2}/.test(value)) {
-                value = toMySQLDate(value);
-            }
-            rowData[column] = value;
-            if (pkColumns.includes(column)) {
-                if (!value) hasEmptyPK = true;
-                identifier[column] = value;
+    // Only send cells whose text differs from the loaded value, keyed by
+    // primary key (or by the original row when there is none).
+    const pkColumns = gridState.pkColumns;
+    const changes = [];
+    gridState.edits.forEach((rowEdits, index) => {
+        const original = gridState.original[index];
+        if (!original) return;
+        const set = {};
+        Object.entries(rowEdits).forEach(([column, value]) => {
+            if (value !== cellText(original[column])) {
+                set[column] = value === '' ? null : normalizeCellValue(value);
             }
         });
-        return pkColumns.length > 0 && !hasEmptyPK ? { pk: identifier, row: rowData } : { row_data: rowData };
-    }).filter(item => Object.keys(item.pk || item.row_data).length > 0);
+        if (Object.keys(set).length === 0) return;
+        const key = {};
+        (pkColumns.length > 0 ? pkColumns : gridState.headers).forEach(col => {
+            key[col] = normalizeCellValue(original[col]);
+        });
+        changes.push(pkColumns.length > 0 ? { pk: key, set } : { match: key, set });
+    });
 
-    if (data.length === 0) {
-        tableError.textContent = 'No valid rows to update.';
+    if (changes.length === 0) {
+        tableError.textContent = 'No changes to save.';
         return;
     }
 
-    console.log('Sending update request:', { table: tableName, data: data });
+    const llmFallbackBox = document.getElementById('llm-fallback');
+    const llm_fallback = llmFallbackBox ? llmFallbackBox.checked : false;
     try {
         const response = await fetch(`/api/update/${encodeURIComponent(tableName)}`, {
             method: 'PUT',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ data })
+            body: JSON.stringify({ changes, llm_fallback })
         });
         console.log('Response status:', response.status);
         console.log('Response headers:', response.headers.get('content-type'));
@@ -151,10 +373,12 @@ async function updateTable() {
             const result = JSON.parse(text);
             console.log('Parsed JSON:', result);
             if (response.ok) {
-                tableError.textContent = result.status || 'Table updated successfully';
-                loadTableData();
+                tableError.textContent = (result.status || 'Table updated successfully') +
+                    (result.updated !== undefined ? ` (${result.updated} row(s) changed)` : '');
+                loadTableData(gridState.orderBy, gridState.order);
             } else {
-                tableError.textContent = `Failed to update table: ${result.error || 'Unknown error'}`;
+                tableError.textContent = `Failed to update table: ${result.error || 'Unknown error'}` +
+                    invalidValuesText(result.invalid_values);
             }
         } catch (e) {
             console.error('JSON parse error:', e.message);
@@ -228,51 +452,63 @@ async function insertRow() {
     }
 }
 
+// "3", "1,4,7" or "10-20" -> sorted unique row indices, or null if invalid
+function parseRowIndices(text, rowCount) {
+    const indices = new Set();
+    for (const part of text.split(',').map(p => p.trim()).filter(Boolean)) {
+        const m = part.match(/^(\d+)(?:\s*-\s*(\d+))?$/);
+        if (!m) return null;
+        const from = Number(m[1]);
+        const to = m[2] !== undefined ? Number(m[2]) : from;
+        if (from > to || to >= rowCount) return null;
+        for (let i = from; i <= to; i++) indices.add(i);
+    }
+    return indices.size ? Array.from(indices).sort((a, b) => a - b) : null;
+}
+
 async function deleteRow() {
     const tableName = document.getElementById('table-select').value;
-    const rowIndex = document.getElementById('delete-row-index').value;
+    const rowText = document.getElementById('delete-row-index').value;
     const tableError = document.getElementById('table-error');
-    const tableData = document.getElementById('table-data');
-    if (!tableName || rowIndex === '') {
+    if (!tableName || rowText.trim() === '') {
         tableError.textContent = 'Please select a table and enter a row index';
         return;
     }
-
-    let pkColumns = await getPrimaryKeyColumns(tableName);
-    const rows = tableData.querySelectorAll('tbody tr');
-    if (rowIndex < 0 || rowIndex >= rows.length) {
+    if (gridState.tableName !== tableName) {
+        tableError.textContent = 'Table data is not loaded yet.';
+        return;
+    }
+    const indices = parseRowIndices(rowText, gridState.original.length);
+    if (!indices) {
         tableError.textContent = 'Row index out of range';
         return;
     }
-    const row = rows[rowIndex];
-    const cells = row.querySelectorAll('td');
-    const headers = Array.from(tableData.querySelectorAll('thead th')).map(th => th.textContent);
-
-    let pk = {};
-    let row_data = {};
-    headers.forEach((col, idx) => {
-        const value = cells[idx].textContent;
-        row_data[col] = value;
-        if (pkColumns.includes(col)) {
-            pk[col] = value;
-        }
-    });
 
-    const body = pkColumns.length > 0 ? { pk } : { row_data };
+    // Identify rows by their values as loaded, not by the (possibly edited) cell text.
+    const pkColumns = gridState.pkColumns;
+    const keys = indices.map(i => {
+        const original = gridState.original[i];
+        const key = {};
+        (pkColumns.length > 0 ? pkColumns : gridState.headers).forEach(col => {
+            key[col] = normalizeCellValue(original[col]);
+        });
+        return key;
+    });
+    const body = pkColumns.length > 0 ? { pks: keys } : { matches: keys };
 
     try {
-        const response = await fetch(`/api/delete/${encodeURIComponent(tableName)}`, {
-            method: 'DELETE',
+        const response = await fetch(`/api/delete/${encodeURIComponent(tableName)}/bulk`, {
+            method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(body)
         });
         const result = await response.json();
         if (result.error) {
-            tableError.textContent = result.error;
+            tableError.textContent = result.error + invalidValuesText(result.invalid_values);
             return;
         }
-        tableError.textContent = result.status;
-        loadTableData();
+        tableError.textContent = `${result.status} (${result.deleted} of ${result.requested} row(s))`;
+        loadTableData(gridState.orderBy, gridState.order);
     } catch (error) {
         tableError.textContent = `Failed to delete row: ${error.message}`;
     }
@@ -296,10 +532,149 @@ function ensureQueryUIElements() {
     }
 }
 
+function newQueryId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// Shows a button that cancels the running query (POST /api/queries/<id>/cancel),
+// or hides it when queryId is null
+function setQueryRunning(queryId) {
+    ensureQueryUIElements();
+    let button = document.getElementById('cancel-query-btn');
+    if (!button) {
+        const queryStatus = document.getElementById('query-status');
+        button = document.createElement('button');
+        button.id = 'cancel-query-btn';
+        button.type = 'button';
+        button.className = 'btn btn-sm btn-outline-danger mt-2';
+        button.textContent = 'Cancel query';
+        queryStatus.parentNode.insertBefore(button, queryStatus.nextSibling);
+    }
+    button.style.display = queryId ? 'inline-block' : 'none';
+    button.disabled = false;
+    button.onclick = queryId ? () => {
+        button.disabled = true;
+        fetch(`/api/queries/${encodeURIComponent(queryId)}/cancel`, { method: 'POST' });
+    } : null;
+}
+
+async function readNdjson(response, onFrame) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        let newline;
+        while ((newline = buffered.indexOf('\n')) >= 0) {
+            const line = buffered.slice(0, newline).trim();
+            buffered = buffered.slice(newline + 1);
+            if (line) onFrame(JSON.parse(line));
+        }
+    }
+    buffered += decoder.decode();
+    if (buffered.trim()) onFrame(JSON.parse(buffered));
+}
+
+function isNdjson(response) {
+    return (response.headers.get('content-type') || '').includes('application/x-ndjson');
+}
+
+function clearTableSections(queryResult) {
+    queryResult.querySelectorAll('tbody.table-section-body').forEach(el => el.remove());
+}
+
+// Renders an NDJSON result stream into a table as batches arrive. Multi-table
+// snapshots get one <tbody> per table; their frames may arrive interleaved.
+async function renderQueryStream(response, queryResult, onMeta) {
+    const thead = queryResult.querySelector('thead tr');
+    const tbody = queryResult.querySelector('tbody');
+    thead.innerHTML = '';
+    tbody.innerHTML = '';
+    clearTableSections(queryResult);
+    const sections = {};
+    let headers = [];
+    let total = 0;
+    let error = null;
+    let truncated = false;
+    await readNdjson(response, frame => {
+        if (frame.event === 'meta') {
+            onMeta(frame);
+            if (frame.columns && frame.columns.length) {
+                headers = frame.columns;
+                thead.innerHTML = headers.map(h => `<th>${h}</th>`).join('');
+            }
+        } else if (frame.event === 'table') {
+            const body = document.createElement('tbody');
+            body.className = 'table-section-body';
+            body.innerHTML =
+                `<tr class="table-section"><th colspan="${frame.columns.length || 1}">${frame.table}</th></tr>` +
+                `<tr>${frame.columns.map(h => `<th>${h}</th>`).join('')}</tr>`;
+            tbody.parentNode.appendChild(body);
+            sections[frame.table] = { body, headers: frame.columns };
+        } else if (frame.event === 'rows') {
+            const section = frame.table ? sections[frame.table] : { body: tbody, headers };
+            total += frame.data.length;
+            section.body.insertAdjacentHTML('beforeend', frame.data.map(row =>
+                `<tr>${section.headers.map(h => `<td>${cellText(row[h])}</td>`).join('')}</tr>`
+            ).join(''));
+        } else if (frame.event === 'table_end') {
+            if (frame.truncated) {
+                sections[frame.table].body.querySelector('.table-section th').textContent +=
+                    ` (first ${frame.row_count} rows)`;
+            }
+        } else if (frame.event === 'end') {
+            truncated = Boolean(frame.truncated);
+        } else if (frame.event === 'error') {
+            const message = frame.table ? `${frame.table}: ${frame.error}` : frame.error;
+            error = error ? `${error}; ${message}` : message;
+        }
+    });
+    if (total === 0 && !tbody.innerHTML && !Object.keys(sections).length) {
+        tbody.innerHTML = '<tr><td colspan="1">No results found</td></tr>';
+    }
+    return { total, error, truncated };
+}
+
+function queryStatusText(result) {
+    let text = result.status || '';
+    if (result.cached) text += ' (cached SQL)';
+    if (result.cached_result) text += ' (cached result)';
+    if (result.truncated) text += ` (output stopped after ${result.row_count} rows)`;
+    if (result.validation_errors) {
+        text += ` (fixed before running: ${result.validation_errors.map(issue => issue.message).join('; ')})`;
+    }
+    if (result.guard_warning) text += ` (warning: ${result.guard_warning})`;
+    if (result.schema_omitted) {
+        text += ` (prompt used ${result.schema_tables.length} of ${result.schema_tables.length + result.schema_omitted} tables: ${result.schema_tables.join(', ')})`;
+    }
+    return text;
+}
+
+function showGeneratedSql(aiSqlDiv, sql) {
+    if (!sql) {
+        aiSqlDiv.innerHTML = '';
+        return;
+    }
+    aiSqlDiv.innerHTML = `<div class='alert alert-info'><strong>AI Generated SQL:</strong><textarea id='ai-sql-textarea' class='form-control mt-2' rows='3' style='font-family:monospace;'>${sql}</textarea><button id='execute-sql-btn' class='btn btn-sm btn-primary mt-2'>Execute SQL</button></div>`;
+    // Add event listener for the execute button
+    setTimeout(() => {
+        const execBtn = document.getElementById('execute-sql-btn');
+        const sqlTextarea = document.getElementById('ai-sql-textarea');
+        if (execBtn && sqlTextarea) {
+            execBtn.onclick = () => executeSqlDirect(sqlTextarea.value);
+        }
+    }, 0);
+}
+
 async function runQuery() {
     ensureQueryUIElements();
     const query = document.getElementById('question').value;
     const isNaturalLanguage = document.getElementById('is-natural-language').checked;
+    const bypassCacheBox = document.getElementById('bypass-cache');
+    const bypassCache = bypassCacheBox ? bypassCacheBox.checked : false;
     const queryResult = document.getElementById('query-result');
     let queryStatus = document.getElementById('query-status');
     let aiSqlDiv = document.getElementById('ai-sql-response');
@@ -310,13 +685,30 @@ async function runQuery() {
         return;
     }
 
+    const queryId = newQueryId();
+    setQueryRunning(queryId);
     try {
         const response = await fetch('/api/query', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ query, is_natural_language: isNaturalLanguage })
+            body: JSON.stringify({ query, is_natural_language: isNaturalLanguage, bypass_cache: bypassCache, stream: 'ndjson', query_id: queryId })
         });
+        if (isNdjson(response)) {
+            const { total, error, truncated } = await renderQueryStream(response, queryResult, meta => {
+                ensureQueryUIElements();
+                document.getElementById('query-status').textContent = queryStatusText(meta);
+                showGeneratedSql(aiSqlDiv, meta.query);
+            });
+            if (truncated) {
+                document.getElementById('query-status').textContent += ` (output stopped after ${total} rows)`;
+            }
+            if (error) {
+                document.getElementById('query-status').textContent += ` (stopped early: ${error})`;
+            }
+            return;
+        }
         const result = await response.json();
+        if (queryResult) clearTableSections(queryResult);
         if (result.error) {
             let errorHtml = `<div class='alert alert-danger'><strong>Error:</strong> ${result.error}`;
             if (result.traceback) {
@@ -331,21 +723,9 @@ async function runQuery() {
             return;
         }
         ensureQueryUIElements();
-        document.getElementById('query-status').textContent = result.status || '';
+        document.getElementById('query-status').textContent = queryStatusText(result);
         // Show the AI-generated SQL if present
-        if (result.query) {
-            aiSqlDiv.innerHTML = `<div class='alert alert-info'><strong>AI Generated SQL:</strong><textarea id='ai-sql-textarea' class='form-control mt-2' rows='3' style='font-family:monospace;'>${result.query}</textarea><button id='execute-sql-btn' class='btn btn-sm btn-primary mt-2'>Execute SQL</button></div>`;
-            // Add event listener for the execute button
-            setTimeout(() => {
-                const execBtn = document.getElementById('execute-sql-btn');
-                const sqlTextarea = document.getElementById('ai-sql-textarea');
-                if (execBtn && sqlTextarea) {
-                    execBtn.onclick = () => executeSqlDirect(sqlTextarea.value);
-                }
-            }, 0);
-        } else {
-            aiSqlDiv.innerHTML = '';
-        }
+        showGeneratedSql(aiSqlDiv, result.query);
         if (result.data && result.data.length > 0 && queryResult) {
             const headers = Object.keys(result.data[0]);
             queryResult.querySelector('thead tr').innerHTML = headers.map(h => `<th>${h}</th>`).join('');
@@ -360,6 +740,8 @@ async function runQuery() {
         aiSqlDiv.innerHTML = `<div class='alert alert-danger'><strong>Request failed:</strong> ${error.message}</div>`;
         ensureQueryUIElements();
         document.getElementById('query-status').textContent = `Failed to execute query: ${error.message}`;
+    } finally {
+        setQueryRunning(null);
     }
 }
 
@@ -369,15 +751,37 @@ async function executeSqlDirect(sql) {
     let queryStatus = document.getElementById('query-status');
     let aiSqlDiv = document.getElementById('ai-sql-response');
     let noResultsMsg = document.getElementById('no-results-msg');
+    const queryId = newQueryId();
+    setQueryRunning(queryId);
     try {
         console.log('[DEBUG] Executing SQL:', sql);
         const response = await fetch('/api/query', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ query: sql, is_natural_language: false })
+            body: JSON.stringify({ query: sql, is_natural_language: false, stream: 'ndjson', query_id: queryId })
         });
+        if (isNdjson(response)) {
+            if (noResultsMsg) noResultsMsg.remove();
+            const { total, error, truncated } = await renderQueryStream(response, queryResult, meta => {
+                ensureQueryUIElements();
+                document.getElementById('query-status').textContent = meta.status || '';
+            });
+            if (truncated) {
+                document.getElementById('query-status').textContent += ` (output stopped after ${total} rows)`;
+            }
+            if (error) {
+                document.getElementById('query-status').textContent += ` (stopped early: ${error})`;
+            }
+            queryResult.scrollIntoView({ behavior: 'smooth', block: 'center' });
+            if (total > 0) {
+                queryResult.classList.add('table-highlight');
+                setTimeout(() => queryResult.classList.remove('table-highlight'), 1200);
+            }
+            return;
+        }
         const result = await response.json();
         console.log('[DEBUG] API response:', result);
+        if (queryResult) clearTableSections(queryResult);
         if (result.error) {
             let errorHtml = `<div class='alert alert-danger'><strong>Error:</strong> ${result.error}`;
             if (result.traceback) {
@@ -428,9 +832,75 @@ async function executeSqlDirect(sql) {
         aiSqlDiv.innerHTML = `<div class='alert alert-danger'><strong>Request failed:</strong> ${error.message}</div>`;
         ensureQueryUIElements();
         document.getElementById('query-status').textContent = `Failed to execute query: ${error.message}`;
+    } finally {
+        setQueryRunning(null);
+    }
+}
+
+// Upload the dump, then follow the background import until it finishes
+async function uploadSqlFile(form) {
+    const status = document.getElementById('upload-status');
+    status.innerHTML = 'Uploading...';
+    try {
+        const response = await fetch(form.action, {
+            method: 'POST',
+            body: new FormData(form),
+            headers: { 'Accept': 'application/json' }
+        });
+        if (response.status !== 202) {
+            status.innerHTML = `<span class="error">Upload failed (HTTP ${response.status}).</span>`;
+            return;
+        }
+        const { job_id } = await response.json();
+        await pollImportJob(job_id);
+    } catch (error) {
+        status.innerHTML = `<span class="error">Upload failed: ${error.message}</span>`;
     }
 }
 
+async function pollImportJob(jobId) {
+    const status = document.getElementById('upload-status');
+    while (true) {
+        const job = await (await fetch(`/api/jobs/${jobId}`)).json();
+        const p = job.progress || {};
+        if (job.status === 'succeeded') {
+            status.textContent = `Import finished: ${p.statements || 0} statements, ${p.rows_inserted || 0} rows in ${job.elapsed}s.`;
+            window.location.reload();
+            return;
+        }
+        if (job.status === 'failed') {
+            status.innerHTML = `<span class="error">Import failed: ${job.error}</span>`;
+            return;
+        }
+        if (job.status === 'cancelled') {
+            status.textContent = `Import cancelled after ${p.statements || 0} statements (already committed work is kept).`;
+            return;
+        }
+        const percent = p.percent !== undefined ? `${p.percent}%` : job.status;
+        status.innerHTML = `Importing: ${percent} &middot; ${p.statements || 0} statements &middot; ${p.rows_inserted || 0} rows &middot; ${job.elapsed}s ` +
+            `<button type="button" class="btn btn-sm btn-outline-danger ms-2" onclick="cancelImportJob('${jobId}')">Cancel</button>`;
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
+async function cancelImportJob(jobId) {
+    await fetch(`/api/jobs/${jobId}/cancel`, { method: 'POST' });
+}
+
+const gridViewport = document.getElementById('table-viewport');
+if (gridViewport) {
+    gridViewport.addEventListener('scroll', onGridScroll, { passive: true });
+    gridViewport.addEventListener('input', onGridCellInput);
+}
+
+const uploadForm = document.getElementById('upload-form');
+if (uploadForm) {
+    uploadForm.addEventListener('submit', function(e) {
+        e.preventDefault();
+        uploadSqlFile(uploadForm);
+    });
+}
+
 // Prevent form submit from reloading the page for the query form
 const queryForm = document.getElementById('query-form');
 if (queryForm) {
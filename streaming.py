@@ -0,0 +1,284 @@
+"""Incremental JSON / NDJSON responses for large query results."""
+import contextvars
+import json
+import queue
+import threading
+
+from flask import Response, current_app
+
+import tracing
+from sql_builder import quote_identifier
+
+STREAM_FORMATS = ('ndjson', 'json')
+
+
+def _dumps(obj):
+    # Same encoders as jsonify (dates as HTTP dates, Decimal as str, ...) so
+    # streamed rows render exactly like buffered ones.
+    return json.dumps(obj, default=current_app.json.default, separators=(',', ':'))
+
+
+def iter_batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+class EncodedBatches:
+    # Serialized batches (row objects joined by commas, without brackets) read
+    # from a cursor until it is exhausted or max_rows / max_bytes is reached.
+    # `truncated` is only set when rows were actually left behind.
+    def __init__(self, cursor, batch_size, dumps=None, max_rows=None, max_bytes=None):
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self.dumps = dumps or _dumps
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.count = 0
+        self.bytes = 0
+        self.truncated = False
+        self.exhausted = False
+        # Serialization is timed against the request that ran the query, also
+        # when the body is written after the view has returned.
+        self.trace = tracing.current()
+
+    @property
+    def columns(self):
+        return [d[0] for d in self.cursor.description or []]
+
+    def __iter__(self):
+        for rows in iter_batches(self.cursor, self.batch_size):
+            if self.max_rows is not None and self.count + len(rows) > self.max_rows:
+                rows = rows[:self.max_rows - self.count]
+                self.truncated = True
+            if rows:
+                with tracing.span('serialize', trace=self.trace):
+                    data = self.dumps(rows)[1:-1]
+                self.count += len(rows)
+                self.bytes += len(data)
+                yield data, len(rows)
+            if self.truncated:
+                return
+            if self.max_bytes is not None and self.bytes >= self.max_bytes:
+                self.truncated = bool(self.cursor.fetchmany(1))
+                self.exhausted = not self.truncated
+                return
+        self.exhausted = True
+
+
+def _ndjson_frames(batches, head, dumps, collector=None):
+    yield dumps(dict(head, event='meta', columns=batches.columns)) + '\n'
+    try:
+        for data, count in batches:
+            if collector is not None:
+                collector.add(data, count)
+            yield '{"event":"rows","data":[' + data + ']}\n'
+    except Exception as e:
+        yield dumps({'event': 'error', 'error': str(e), 'row_count': batches.count}) + '\n'
+        return
+    end = {'event': 'end', 'row_count': batches.count}
+    if batches.truncated:
+        end['truncated'] = True
+    elif collector is not None:
+        collector.finish(batches.columns)
+    yield dumps(end) + '\n'
+
+
+def _json_array_frames(batches, head, dumps, collector=None):
+    # A single JSON document whose "data" array is written as rows arrive. An
+    # error after the first byte can only be reported in a trailing key.
+    prefix = dumps(head)[:-1]
+    yield prefix + (',' if head else '') + '"data":['
+    error = None
+    try:
+        for data, count in batches:
+            if collector is not None:
+                collector.add(data, count)
+            yield (',' if batches.count > count else '') + data
+    except Exception as e:
+        error = str(e)
+    tail = {'row_count': batches.count}
+    if error:
+        tail['error'] = error
+    elif batches.truncated:
+        tail['truncated'] = True
+    elif collector is not None:
+        collector.finish(batches.columns)
+    yield '],' + dumps(tail)[1:]
+
+
+_DONE = object()
+
+
+def snapshot_frames(acquire, tables, max_rows, workers=4, batch_size=500):
+    # Reads tables concurrently, each worker on its own pooled connection
+    # from acquire(), and yields table / rows / table_end / error frames as
+    # they arrive. Rows frames of different tables interleave; every frame
+    # names its table. At most max_rows rows are read per table, and workers
+    # block once a few batches are waiting, so memory stays bounded by
+    # workers x batch_size rows. Closing the generator stops the workers.
+    pending = queue.SimpleQueue()
+    for table in tables:
+        pending.put(table)
+    out = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+
+    def put(frame):
+        while not stop.is_set():
+            try:
+                out.put(frame, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read_table(table):
+        conn = acquire()
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(f"SELECT * FROM {quote_identifier(table)} LIMIT {int(max_rows) + 1}")
+                if not put({'event': 'table', 'table': table, 'columns': [d[0] for d in cursor.description or []]}):
+                    return
+                count = 0
+                truncated = False
+                for rows in iter_batches(cursor, batch_size):
+                    if count + len(rows) > max_rows:
+                        rows = rows[:max_rows - count]
+                        truncated = True
+                    count += len(rows)
+                    if rows and not put({'event': 'rows', 'table': table, 'data': rows}):
+                        return
+                    if truncated:
+                        break
+                put({'event': 'table_end', 'table': table, 'row_count': count, 'truncated': truncated})
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+        finally:
+            # The pool discards any unread rows on release.
+            conn.close()
+
+    def worker():
+        try:
+            while not stop.is_set():
+                try:
+                    table = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    read_table(table)
+                except Exception as e:
+                    put({'event': 'error', 'table': table, 'error': str(e)})
+        finally:
+            put(_DONE)
+
+    # Workers run in a copy of the caller's context so their queries are
+    # timed as part of the request.
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True)
+               for _ in range(max(1, min(workers, len(tables))))]
+    for thread in threads:
+        thread.start()
+    try:
+        done = 0
+        while done < len(threads):
+            frame = out.get()
+            if frame is _DONE:
+                done += 1
+            else:
+                yield frame
+    finally:
+        stop.set()
+
+
+def collect_snapshot(frames):
+    # Buffers a snapshot for plain JSON responses: ({table: rows}, truncated, errors).
+    data = {}
+    truncated = []
+    errors = {}
+    for frame in frames:
+        if frame['event'] == 'table':
+            data[frame['table']] = []
+        elif frame['event'] == 'rows':
+            data[frame['table']].extend(frame['data'])
+        elif frame['event'] == 'table_end' and frame['truncated']:
+            truncated.append(frame['table'])
+        elif frame['event'] == 'error':
+            errors[frame['table']] = frame['error']
+    return data, truncated, errors
+
+
+def _stream(frames, release, mimetype):
+    app = current_app._get_current_object()
+
+    def generate():
+        with app.app_context():
+            try:
+                yield from frames
+            finally:
+                release()
+
+    response = Response(generate(), mimetype=mimetype)
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(release)
+    return response
+
+
+def stream_snapshot(frames, head):
+    # NDJSON sections from snapshot_frames(); the workers own their
+    # connections and are stopped if the client goes away.
+    trace = tracing.current()
+
+    def generate(dumps):
+        yield dumps(dict(head, event='meta')) + '\n'
+        for frame in frames:
+            with tracing.span('serialize', trace=trace):
+                line = dumps(frame) + '\n'
+            yield line
+        yield dumps({'event': 'end'}) + '\n'
+    return _stream(generate(_dumps), frames.close, 'application/x-ndjson')
+
+
+def stream_cursor(conn, cursor, head, fmt='ndjson', batch_size=500, collector=None,
+                  max_rows=None, max_bytes=None):
+    # Takes ownership of an executed (unbuffered) cursor and its pooled
+    # connection; both are released when the body is exhausted or the client
+    # goes away. A collector (see result_cache) is handed every serialized
+    # batch and told when the result was sent completely. Output stops after
+    # max_rows rows or max_bytes of row JSON.
+    batches = EncodedBatches(cursor, batch_size, _dumps, max_rows, max_bytes)
+
+    def release():
+        if not batches.exhausted and hasattr(conn, 'discard'):
+            # Reading the rest of an abandoned result just to drop it could
+            # take longer than the query; close the connection instead.
+            conn.discard()
+            return
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+    frames = _ndjson_frames if fmt == 'ndjson' else _json_array_frames
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return _stream(frames(batches, head, _dumps, collector), release, mimetype)
+
+
+def rows_response(head, columns, rows_json, row_count, fmt=None):
+    # Response for rows that are already serialized (a cached result), in the
+    # same shape as jsonify / stream_cursor would have produced.
+    if fmt == 'ndjson':
+        body = _dumps(dict(head, event='meta', columns=columns)) + '\n'
+        if row_count:
+            body += '{"event":"rows","data":' + rows_json + '}\n'
+        body += _dumps({'event': 'end', 'row_count': row_count}) + '\n'
+        return Response(body, mimetype='application/x-ndjson')
+    prefix = _dumps(head)[:-1] + (',' if head else '') + '"data":' + rows_json
+    if fmt == 'json':
+        prefix += ',"row_count":' + str(row_count)
+    return Response(prefix + '}', mimetype='application/json')
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+# app builds its LLM client at import time; the tests never call it.
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+
+class FakeCursor:
+    rowcount = 1
+
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.db.statements.append((sql, params))
+        self.rows = list(self.db.respond(sql, params) or [])
+        self.with_rows = bool(self.rows)
+        self.description = [(name, 253) for name in self.rows[0]] if self.rows else None
+
+    def executemany(self, sql, params_list):
+        self.db.statements.extend((sql, params) for params in params_list)
+        self.rowcount = len(params_list)
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    unread_result = False
+    in_transaction = False
+    autocommit = False
+    connection_id = 1
+
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.db.statements.append(('COMMIT', None))
+
+    def rollback(self):
+        self.db.statements.append(('ROLLBACK', None))
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    # Stands in for MySQL behind app.db_pools: records every statement and
+    # answers with respond(sql, params), a list of dict rows (or raises).
+    def __init__(self):
+        self.statements = []
+        self.respond = lambda sql, params: []
+
+    def executed(self, prefix):
+        return [(sql, params) for sql, params in self.statements if sql.lstrip().upper().startswith(prefix)]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    import app as app_module
+    from db_pool import ConnectionPool, PoolRegistry
+
+    database = FakeDatabase()
+    monkeypatch.setattr(ConnectionPool, '_connect', lambda self: FakeConnection(database))
+    monkeypatch.setattr(app_module, 'db_pools', PoolRegistry({}))
+    return database
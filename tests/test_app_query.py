@@ -0,0 +1,67 @@
+import pytest
+
+import app as app_module
+import sql_validator
+from schema_loader import DatabaseSchema, TableSchema
+
+pytestmark = pytest.mark.skipif(not sql_validator.available(), reason='sqlglot is not installed')
+
+
+def table(name, columns):
+    t = TableSchema(name)
+    t.columns = [{'Field': field, 'Type': 'int', 'Null': 'YES', 'Key': '', 'Default': None, 'Extra': ''}
+                 for field in columns]
+    return t
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    schema = DatabaseSchema('shop', None, {'items': table('items', ['id', 'qty']),
+                                           'orders': table('orders', ['id', 'item_id'])})
+    checks = []
+
+    def get(db_name, force_check=False):
+        checks.append(force_check)
+        return schema
+
+    monkeypatch.setattr(app_module.schema_cache, 'get', get)
+    monkeypatch.setattr(app_module, 'GUARD_MODE', 'off')
+    prompts = []
+    monkeypatch.setattr(app_module, 'ask_llm_for_sql', lambda prompt, kind: prompts.append(prompt) or 'SELECT id FROM items')
+    db.respond = lambda sql, params: [{'id': 1}] if 'FROM items' in sql else []
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s['db_name'] = 'shop'
+    client.prompts = prompts
+    client.checks = checks
+    return client
+
+
+def run(client, sql):
+    # Closing the response finishes the request's entry in running_queries.
+    r = client.post('/api/query', json={'query': sql})
+    r.get_data()
+    r.close()
+    return r
+
+
+def test_unknown_table_is_corrected_without_a_failed_round_trip(client, db):
+    r = run(client, 'SELECT id FROM itemz')
+    assert r.status_code == 200
+    assert r.get_json()['validation_errors'][0]['kind'] == 'unknown_table'
+    assert not any('itemz' in sql for sql, _ in db.statements)
+    assert True in client.checks    # confirmed against a fresh schema check
+    assert "Unknown table 'itemz'" in client.prompts[0]
+
+
+def test_ambiguous_column_is_left_to_mysql(client, db):
+    r = run(client, 'SELECT id FROM items, orders')
+    assert r.get_json()['status'] == 'Query executed'
+    assert db.executed('SELECT')
+    assert client.prompts == []
+
+
+def test_scripts_with_ddl_are_not_prechecked(client, db):
+    r = run(client, 'ALTER TABLE items ADD COLUMN note INT; UPDATE items SET note = 1')
+    assert r.status_code == 200 and r.get_json()['status'] == 'Query executed'
+    assert client.prompts == []
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+import app as app_module
+
+
+def session_client(client_id):
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s['client_id'] = client_id
+    return client
+
+
+@pytest.fixture
+def running():
+    query = app_module.running_queries.start('shop', '/api/query', 'alice', question='secret question')
+    yield query
+    app_module.running_queries.finish(query)
+
+
+def test_queries_are_listed_for_their_own_session_only(running):
+    ids = [q['id'] for q in session_client('alice').get('/api/queries').get_json()['queries']]
+    assert running.id in ids
+    assert session_client('bob').get('/api/queries').get_json()['queries'] == []
+
+
+def test_listing_every_session_needs_the_operator_setting(running, monkeypatch):
+    assert session_client('bob').get('/api/queries?all=1').status_code == 403
+    monkeypatch.setattr(app_module, 'SHOW_ALL_SESSIONS', True)
+    queries = session_client('bob').get('/api/queries?all=1').get_json()['queries']
+    assert {q['id']: q['mine'] for q in queries}[running.id] is False
+
+
+def test_only_the_owner_can_cancel_a_query(running):
+    assert session_client('bob').post(f'/api/queries/{running.id}/cancel').status_code == 404
+    assert not running.cancelled
+    r = session_client('alice').post(f'/api/queries/{running.id}/cancel')
+    assert r.status_code == 200 and r.get_json()['cancel_reason'] == 'user'
+
+
+def test_jobs_belong_to_the_session_that_started_them():
+    release = threading.Event()
+    job = app_module.jobs.submit('import', lambda job: release.wait(5), owner='alice')
+    try:
+        bob = session_client('bob')
+        assert bob.get(f'/api/jobs/{job.id}').status_code == 404
+        assert bob.post(f'/api/jobs/{job.id}/cancel').status_code == 404
+        assert job.id not in [j['id'] for j in bob.get('/api/jobs').get_json()['jobs']]
+        assert not job.cancelled
+        alice = session_client('alice')
+        assert alice.get(f'/api/jobs/{job.id}').status_code == 200
+        assert alice.post(f'/api/jobs/{job.id}/cancel').get_json()['cancel_requested']
+    finally:
+        release.set()
@@ -0,0 +1,54 @@
+import pytest
+
+import app as app_module
+from schema_loader import DatabaseSchema, TableSchema
+
+
+def table(name, columns, primary_key=()):
+    t = TableSchema(name)
+    t.columns = [{'Field': field, 'Type': typ, 'Null': 'YES', 'Key': 'PRI' if field in primary_key else '',
+                  'Default': None, 'Extra': ''} for field, typ in columns]
+    t.primary_key = list(primary_key)
+    return t
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    schema = DatabaseSchema('shop', None, {
+        'items': table('items', [('id', 'int'), ('qty', 'int'), ('name', 'varchar(20)')], ['id']),
+        'log': table('log', [('day', 'date'), ('qty', 'int'), ('note', 'varchar(20)')]),
+    })
+    monkeypatch.setattr(app_module.schema_cache, 'get', lambda db_name, force_check=False: schema)
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s['db_name'] = 'shop'
+    return client
+
+
+def test_invalid_set_value_is_rejected_not_written_as_null(client, db):
+    r = client.put('/api/update/items', json={'changes': [
+        {'pk': {'id': 1}, 'set': {'qty': 'many'}},
+        {'pk': {'id': 2}, 'set': {'qty': '3'}},
+    ]})
+    assert r.status_code == 400
+    assert r.get_json()['invalid_values']['qty']['count'] == 1
+    assert db.executed('UPDATE') == []
+
+
+def test_invalid_match_value_is_rejected(client, db):
+    r = client.put('/api/update/log', json={'changes': [
+        {'match': {'day': 'not a date', 'qty': '1', 'note': None}, 'set': {'note': 'x'}},
+    ]})
+    assert r.status_code == 400
+    assert 'day' in r.get_json()['invalid_values']
+    assert db.executed('UPDATE') == []
+
+
+def test_valid_changes_are_written(client, db):
+    r = client.put('/api/update/log', json={'changes': [
+        {'match': {'day': '2024-01-05', 'qty': '1', 'note': None}, 'set': {'qty': '2'}},
+    ]})
+    assert r.status_code == 200, r.get_json()
+    [(sql, params)] = db.executed('UPDATE')
+    assert '<=>' in sql and sql.rstrip().endswith('LIMIT 1')
+    assert params == (2, '2024-01-05', 1, None)
@@ -0,0 +1,128 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from bulk_load import coerce_frame, load_file, widen_type
+from coercion import CoercionReport
+
+TYPES = {'id': 'int unsigned', 'price': 'decimal(5,2)', 'size': "enum('S','M','L')", 'day': 'date',
+         'flag': 'tinyint(1)'}
+MAPPING = {'ID': 'id', 'Price': 'price', 'Size': 'size', 'Day': 'day', 'Flag': 'flag'}
+
+
+def test_csv_cells_are_coerced_with_the_column_rules():
+    frame = pd.DataFrame({
+        'ID': ['1', ' 2 ', '-3', None],
+        'Price': ['9.999', '1000', 'abc', ''],
+        'Size': ['m', 'L', 'XL', 'S'],
+        'Day': ['2024-01-05', '2024-01-05T10:00:00Z', 'soon', '  '],
+        'Flag': ['true', '0', 'yes', '2'],
+    })
+    report = CoercionReport()
+    rows = coerce_frame(frame, MAPPING, TYPES, report, first_row=10)
+    assert rows == [
+        (1, Decimal('10.00'), 'M', '2024-01-05', 1),
+        (2, None, 'L', '2024-01-05', 0),
+        (None, None, None, None, 1),
+        (None, None, 'S', None, 2),
+    ]
+    errors = report.to_dict()
+    assert {col: entry['count'] for col, entry in errors.items()} == {'id': 1, 'price': 2, 'size': 1, 'day': 1}
+    assert errors['id']['examples'][0]['row'] == 12
+
+
+def test_typed_parquet_columns_are_coerced():
+    frame = pd.DataFrame({
+        'ID': pd.array([1, None, 300], dtype='Int64'),
+        'Day': [datetime(2024, 1, 5, 10, 30), pd.NaT, datetime(2023, 12, 31)],
+    })
+    report = CoercionReport()
+    rows = coerce_frame(frame, {'ID': 'id', 'Day': 'day'}, TYPES, report)
+    assert rows == [(1, '2024-01-05'), (None, None), (300, '2023-12-31')]
+    assert not report
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+        if sql.startswith('LOAD DATA'):
+            raise RuntimeError('local_infile is disabled')
+
+    def executemany(self, sql, rows):
+        if self.conn.fail_inserts:
+            raise RuntimeError('Data too long')
+        self.conn.statements.append(sql)
+        self.conn.rows.extend(rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    autocommit = True
+
+    def __init__(self, fail_inserts=False):
+        self.statements = []
+        self.rows = []
+        self.fail_inserts = fail_inserts
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def write_csv(tmp_path, text):
+    path = tmp_path / 'people.csv'
+    path.write_text(text)
+    return str(path)
+
+
+def test_widen_type():
+    assert widen_type('INT', 'BIGINT') == 'BIGINT'
+    assert widen_type('DECIMAL(65,0)', 'INT') == 'DECIMAL(65,0)'
+    assert widen_type('DATE', 'DATETIME') == 'DATETIME'
+    assert widen_type('VARCHAR(255)', 'TEXT') == 'TEXT'
+    assert widen_type('INT', 'DATE') == 'VARCHAR(255)'
+    assert widen_type('BIGINT', 'TEXT') == 'TEXT'
+
+
+def test_types_are_widened_when_later_chunks_need_it(tmp_path):
+    path = write_csv(tmp_path, 'id,name\n1,ab\n2,cd\n3000000000,' + 'x' * 300 + '\n4,\n')
+    conn = FakeConnection()
+    report = load_file(conn, path, 'csv', 'people', chunk_rows=2)
+    assert report['schema'] == [('id', 'BIGINT'), ('name', 'TEXT')]
+    assert report['rows_loaded'] == 4 and not report['invalid_values']
+    alters = [sql for sql in conn.statements if sql.startswith('ALTER')]
+    assert len(alters) == 2 and 'BIGINT' in alters[0] and 'TEXT' in alters[1]
+    assert conn.rows[2] == (3000000000, 'x' * 300)
+    assert conn.statements[-1].startswith('RENAME TABLE `people__load_') and conn.statements[-1].endswith('TO `people`')
+
+
+def test_replace_swaps_in_a_staging_table(tmp_path):
+    path = write_csv(tmp_path, 'id\n1\n')
+    conn = FakeConnection()
+    load_file(conn, path, 'csv', 'people', [{'Field': 'id', 'Type': 'int'}], if_exists='replace')
+    assert conn.statements[0].startswith('CREATE TABLE `people__load_')
+    assert not any(sql == 'DROP TABLE `people`' for sql in conn.statements)
+    rename, drop = conn.statements[-2:]
+    assert rename.startswith('RENAME TABLE `people` TO `people__old_') and rename.endswith('TO `people`')
+    assert drop.startswith('DROP TABLE `people__old_')
+
+
+def test_failed_replace_keeps_the_existing_table(tmp_path):
+    path = write_csv(tmp_path, 'id\n1\n')
+    conn = FakeConnection(fail_inserts=True)
+    with pytest.raises(RuntimeError):
+        load_file(conn, path, 'csv', 'people', [{'Field': 'id', 'Type': 'int'}], if_exists='replace')
+    assert not any('`people`' in sql for sql in conn.statements)
+    assert conn.statements[-1].startswith('DROP TABLE IF EXISTS `people__load_')
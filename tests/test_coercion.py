@@ -0,0 +1,92 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from coercion import TableCoercer, compile_column, get_coercer, parse_type
+from schema_loader import TableSchema
+
+
+@pytest.mark.parametrize('type_str, value, expected', [
+    ('int', ' 42 ', 42),
+    ('int', 7.0, 7),
+    ('tinyint(1)', 'yes', 1),
+    ('tinyint(1)', 'Off', 0),
+    ('int unsigned', '4294967295', 4294967295),
+    ('bigint', '-9223372036854775808', -9223372036854775808),
+    ('decimal(10,2)', '3.145', Decimal('3.15')),
+    ('decimal(65,30)', '1' * 34 + '.5', Decimal('1' * 34 + '.5')),
+    ('double', '1e3', 1000.0),
+    ('date', '2024-02-29T10:00:00', '2024-02-29'),
+    ('date', date(2024, 1, 2), '2024-01-02'),
+    ('datetime', 'Tue, 02 Jan 2024 03:04:05 GMT', '2024-01-02 03:04:05'),
+    ('datetime(3)', '2024-01-02T03:04:05.123456Z', '2024-01-02 03:04:05.123'),
+    ('timestamp', datetime(2038, 1, 19, 3, 14, 7), '2038-01-19 03:14:07'),
+    ('year', '2155', 2155),
+    ("enum('Small','it''s')", 'small', 'Small'),
+    ("enum('Small','it''s')", "IT'S", "it's"),
+    ("set('a','b','c')", 'c, A', 'c,a'),
+    ('json', {'a': [1]}, '{"a": [1]}'),
+    ('varchar(20)', 12, '12'),
+    ('blob', b'\x00', b'\x00'),
+])
+def test_values_that_fit(type_str, value, expected):
+    assert compile_column(type_str)(value) == expected
+
+
+@pytest.mark.parametrize('type_str, value', [
+    ('tinyint', '128'),
+    ('int unsigned', '-1'),
+    ('int', '1.5'),
+    ('int', 2.5),
+    ('tinyint', 'yes'),
+    ('decimal(5,2)', '1000'),
+    ('decimal(5,2) unsigned', '-1'),
+    ('decimal(65,30)', '1' * 36),
+    ('decimal(10,2)', 'abc'),
+    ('double', 'nan'),
+    ('date', 'yesterday'),
+    ('timestamp', '1960-01-01 00:00:00'),
+    ('year', '1800'),
+    ("enum('a','b')", 'c'),
+    ("set('a','b')", 'a,z'),
+    ('json', '{oops'),
+])
+def test_values_that_do_not_fit(type_str, value):
+    with pytest.raises((ValueError, TypeError, ArithmeticError)):
+        compile_column(type_str)(value)
+
+
+def test_parse_type():
+    assert parse_type('decimal(10, 2) unsigned zerofill') == ('decimal', ['10', '2'], 'unsigned zerofill')
+    assert parse_type("enum('a,b','c')") == ('enum', ['a,b', 'c'], '')
+    assert parse_type('TEXT') == ('text', [], '')
+
+
+def test_coerce_rows_reports_failures_per_column():
+    coercer = TableCoercer([{'Field': 'id', 'Type': 'int'}, {'Field': 'qty', 'Type': 'smallint'},
+                            {'Field': 'note', 'Type': 'text'}])
+    rows, report = coercer.coerce_rows([{'id': '1', 'qty': '', 'note': 'x'},
+                                        {'id': '2', 'qty': 'lots', 'extra': 1},
+                                        {'id': '3', 'qty': '99999'},
+                                        {'id': '4', 'qty': 'many'},
+                                        {'id': '5', 'qty': 'all'}])
+    assert rows[0] == {'id': 1, 'qty': None, 'note': 'x'}
+    assert rows[1] == {'id': 2, 'qty': None, 'note': None}
+    assert report.total == 4
+    assert report.summary() == 'qty (smallint): 4'
+    examples = report.to_dict()['qty']['examples']
+    assert [e['row'] for e in examples] == [1, 2, 3]
+
+
+def test_coerce_rows_without_filling_missing_columns():
+    coercer = TableCoercer([{'Field': 'id', 'Type': 'int'}, {'Field': 'note', 'Type': 'text'}])
+    rows, report = coercer.coerce_rows([{'note': 5}], fill_missing=False)
+    assert rows == [{'note': '5'}]
+    assert not report
+
+
+def test_coercer_is_built_once_per_table_schema():
+    table = TableSchema('t')
+    table.columns = [{'Field': 'id', 'Type': 'int'}]
+    assert get_coercer(table) is get_coercer(table)
@@ -0,0 +1,92 @@
+import base64
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from mysql.connector.constants import FieldType
+
+from columnar import ColumnarBatches, ColumnarEncoder, arrow_available, column_kind, null_bitmap
+
+DESCRIPTION = [
+    ('id', FieldType.LONG), ('price', FieldType.NEWDECIMAL), ('born', FieldType.DATE),
+    ('seen', FieldType.DATETIME), ('took', FieldType.TIME), ('name', FieldType.VAR_STRING),
+    ('raw', FieldType.BLOB, None, None, None, None, 1, 0, 63),
+]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.description = DESCRIPTION
+        self.rows = list(rows)
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+def decode(fragment):
+    # What the browser does: read the bitmaps and put the NULLs back.
+    result = json.loads('{' + fragment + '}')
+    columns = []
+    for bitmap, values in zip(result['nulls'], result['values']):
+        bits = base64.b64decode(bitmap) if bitmap else b''
+        columns.append([None if bits and bits[i >> 3] >> (i & 7) & 1 else v for i, v in enumerate(values)])
+    return result, [list(row) for row in zip(*columns)]
+
+
+def test_null_bitmap_sets_one_bit_per_null_row():
+    assert null_bitmap([], 5) is None
+    assert base64.b64decode(null_bitmap([0, 3, 9], 10)) == bytes([0b1001, 0b10])
+
+
+def test_columns_round_trip_with_nulls_across_batches():
+    rows = [
+        (1, Decimal('9.99'), date(2024, 1, 2), datetime(2024, 1, 2, 3, 4, 5), timedelta(hours=-26, seconds=1),
+         'ab', b'\x00\xff'),
+        (None, None, None, None, None, None, None),
+        (3, Decimal('0.10'), None, datetime(2024, 1, 2, 3, 4, 5, 6), timedelta(0), None, b''),
+    ] * 4
+    encoder = ColumnarEncoder(DESCRIPTION)
+    for start in range(0, len(rows), 5):
+        encoder.add(rows[start:start + 5])
+    result, decoded = decode(encoder.fragment())
+
+    assert result['types'] == ['int', 'decimal', 'date', 'datetime', 'time', 'string', 'binary']
+    assert result['row_count'] == 12
+    # NULL slots hold a zero of the column's type so each array stays uniform.
+    assert result['values'][0][1] == 0 and result['values'][5][1] == ''
+    assert decoded[0] == [1, '9.99', '2024-01-02', '2024-01-02 03:04:05', '-25:59:59', 'ab', 'AP8=']
+    assert decoded[1] == [None] * 7
+    assert decoded[2] == [3, '0.10', None, '2024-01-02 03:04:05.000006', '00:00:00', None, '']
+    assert decoded[3:] == decoded[:3] * 3
+
+
+def test_column_without_nulls_has_no_bitmap():
+    encoder = ColumnarEncoder(DESCRIPTION[:1])
+    encoder.add([(1,), (2,)])
+    assert json.loads('{' + encoder.fragment() + '}')['nulls'] == [None]
+
+
+def test_column_kind_treats_binary_charset_text_as_binary():
+    assert column_kind(('name', FieldType.BLOB, None, None, None, None, 1, 0, 33)) == 'string'
+    assert column_kind(DESCRIPTION[6]) == 'binary'
+    assert column_kind(('n', FieldType.YEAR)) == 'int'
+
+
+def test_batches_stop_at_max_rows():
+    batches = ColumnarBatches(FakeCursor([(i,) * 7 for i in range(10)]), batch_size=4, max_rows=6)
+    batches.read()
+    assert (batches.count, batches.truncated, batches.exhausted) == (6, True, False)
+
+
+@pytest.mark.skipif(not arrow_available(), reason='pyarrow is not installed')
+def test_arrow_round_trip(monkeypatch):
+    import pyarrow as pa
+    import columnar
+    monkeypatch.setattr(columnar, '_head_json', json.dumps)
+    encoder = ColumnarEncoder(DESCRIPTION[:2], keep_values=True)
+    encoder.add([(1, Decimal('1.50')), (None, None)])
+    table = pa.ipc.open_stream(encoder.arrow({'row_count': 2})).read_all()
+    assert table.column('id').to_pylist() == [1, None]
+    assert json.loads(table.schema.metadata[b'result']) == {'row_count': 2}
@@ -0,0 +1,60 @@
+import db_pool
+from db_pool import ConnectionPool
+
+
+class FakeConnection:
+    unread_result = False
+    in_transaction = False
+    autocommit = False
+
+    def __init__(self):
+        self.pings = 0
+        self.alive = True
+        self.closed = False
+
+    def is_connected(self):
+        self.pings += 1
+        return self.alive
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.alive:
+            raise OSError('gone')
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(monkeypatch, **kwargs):
+    opened = []
+
+    def connect(self):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(ConnectionPool, '_connect', connect)
+    return ConnectionPool({}, size=2, **kwargs), opened
+
+
+def test_recently_used_connection_is_reused_without_a_ping(monkeypatch):
+    pool, opened = make_pool(monkeypatch, ping_after=30)
+    pool.acquire().close()
+    pool.acquire().close()
+    assert len(opened) == 1
+    assert opened[0].pings == 0
+
+
+def test_connection_idle_past_ping_after_is_pinged(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db_pool.time, 'monotonic', lambda: now[0])
+    pool, opened = make_pool(monkeypatch, ping_after=30)
+    pool.acquire().close()
+    now[0] += 60
+    pool.acquire().close()
+    assert opened[0].pings == 1
+    opened[0].alive = False
+    now[0] += 60
+    conn = pool.acquire()
+    assert len(opened) == 2 and opened[0].closed
+    assert pool.stats()['health_check_failures'] == 1
+    conn.close()
@@ -0,0 +1,101 @@
+import json
+
+from query_guard import add_row_limit, add_time_limit, check_estimate, is_select, plan_estimate, row_limit
+
+
+def test_limit_after_trailing_literal():
+    assert add_row_limit('SELECT * FROM t WHERE id = 5', 50001) == (
+        'SELECT * FROM t WHERE id = 5 LIMIT 50001', True)
+    assert add_row_limit("SELECT * FROM t WHERE name = 'x'", 10) == (
+        "SELECT * FROM t WHERE name = 'x' LIMIT 10", True)
+    assert add_row_limit('SELECT * FROM t WHERE price > 1.5e3', 10) == (
+        'SELECT * FROM t WHERE price > 1.5e3 LIMIT 10', True)
+
+
+def test_limit_before_trailing_semicolon():
+    assert add_row_limit('SELECT * FROM t WHERE age > 30;', 10) == (
+        'SELECT * FROM t WHERE age > 30 LIMIT 10;', True)
+    assert add_row_limit('SELECT * FROM t ;  \n', 10) == ('SELECT * FROM t LIMIT 10 ;  \n', True)
+
+
+def test_limit_before_trailing_comment():
+    assert add_row_limit('SELECT * FROM t WHERE id = 5 -- newest', 10) == (
+        'SELECT * FROM t WHERE id = 5 LIMIT 10 -- newest', True)
+    assert add_row_limit('SELECT * FROM t WHERE id IN (1, 2) /* ids */;', 10) == (
+        'SELECT * FROM t WHERE id IN (1, 2) LIMIT 10 /* ids */;', True)
+
+
+def test_limit_after_union():
+    assert add_row_limit('SELECT 1 UNION SELECT 2', 11) == ('SELECT 1 UNION SELECT 2 LIMIT 11', True)
+
+
+def test_existing_limit_and_non_selects_are_left_alone():
+    assert add_row_limit('SELECT * FROM t LIMIT 5;', 10) == ('SELECT * FROM t LIMIT 5;', False)
+    assert add_row_limit('SELECT * FROM t WHERE id IN (SELECT id FROM u LIMIT 3)', 10)[1]
+    assert add_row_limit('UPDATE t SET a = 1', 10) == ('UPDATE t SET a = 1', False)
+
+
+def test_time_limit_and_is_select():
+    assert add_time_limit('SELECT a FROM t WHERE b = 2', 500) == (
+        'SELECT /*+ MAX_EXECUTION_TIME(500) */ a FROM t WHERE b = 2')
+    assert is_select('WITH x AS (SELECT 1) SELECT * FROM x')
+    assert not is_select("DELETE FROM t WHERE a = 'SELECT'")
+
+
+class ExplainCursor:
+    def __init__(self, plan):
+        self.plan = plan
+        self.sql = None
+
+    def execute(self, sql, params=None):
+        self.sql = sql
+
+    def fetchone(self):
+        return {'EXPLAIN': json.dumps(self.plan)}
+
+    def fetchall(self):
+        return []
+
+
+def scan(table, rows, access_type='ALL'):
+    return {'table': {'table_name': table, 'access_type': access_type,
+                      'rows_examined_per_scan': rows, 'rows_produced_per_join': rows}}
+
+
+def explain(sql, block):
+    return plan_estimate(ExplainCursor({'query_block': dict({'cost_info': {'query_cost': '1000.5'}}, **block)}), sql)
+
+
+def test_row_limit():
+    assert row_limit('SELECT * FROM t LIMIT 50001') == 50001
+    assert row_limit('SELECT * FROM t LIMIT 10, 20;') == 30
+    assert row_limit('SELECT * FROM t LIMIT 20 OFFSET 5') == 25
+    assert row_limit('SELECT * FROM (SELECT * FROM t LIMIT 3) x') is None
+
+
+def test_streaming_scan_is_capped_at_the_limit():
+    estimate = explain('SELECT * FROM big LIMIT 50001', scan('big', 8000000))
+    assert estimate['streams'] and estimate['rows'] == 50001
+    assert estimate['full_scans'] == ['big']
+    assert check_estimate(estimate, max_rows=5000000) == []
+
+
+def test_sorted_single_table_scan_is_left_to_the_cost_check():
+    block = {'ordering_operation': dict({'using_filesort': True}, **scan('big', 8000000))}
+    estimate = explain('SELECT * FROM big ORDER BY name LIMIT 50001', block)
+    assert not estimate['streams'] and estimate['rows'] == 0
+    assert check_estimate(estimate, max_rows=5000000) == []
+    assert check_estimate(estimate, max_cost=500)
+
+
+def test_join_fan_out_is_still_rejected_without_streaming():
+    block = {'grouping_operation': {'using_temporary_table': True, 'nested_loop': [
+        scan('a', 10000), scan('b', 100000000, 'ALL')]}}
+    estimate = explain('SELECT a.x, COUNT(*) FROM a, b GROUP BY a.x LIMIT 50001', block)
+    assert estimate['rows'] == 100000000
+    assert check_estimate(estimate, max_rows=5000000)
+
+
+def test_without_a_limit_the_scan_size_counts():
+    estimate = explain('SELECT * FROM big INTO OUTFILE "/tmp/x"', scan('big', 8000000))
+    assert estimate['limit'] is None and estimate['rows'] == 8000000
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from query_registry import EXECUTING, QueryCancelled, QueryRegistry, parse_deadlines
+
+
+class FakeConnection:
+    connection_id = 42
+
+    def __init__(self):
+        self.on_release_callback = None
+
+    def on_release(self, callback):
+        self.on_release_callback = callback
+
+    def release(self):
+        # Like PooledConnection: True means close the connection instead of pooling it.
+        callback, self.on_release_callback = self.on_release_callback, None
+        return bool(callback and callback())
+
+
+@pytest.fixture
+def kills():
+    return []
+
+
+@pytest.fixture
+def registry(kills):
+    # A long watchdog interval keeps the background thread out of the way.
+    return QueryRegistry(kill=kills.append, check_interval=3600)
+
+
+def test_cancel_before_executing_stops_the_query_without_a_kill(registry, kills):
+    query = registry.start('shop', '/api/query', 'session-a')
+    assert registry.cancel(query.id) is query
+    conn = FakeConnection()
+    with pytest.raises(QueryCancelled, match='Query cancelled'):
+        registry.executing(query, conn, 'SELECT 1')
+    assert kills == []
+    assert conn.on_release_callback is None
+    assert query.connection_id is None
+
+
+def test_cancel_after_executing_kills_the_connection(registry, kills):
+    query = registry.start('shop', '/api/query', 'session-a')
+    conn = FakeConnection()
+    registry.executing(query, conn, 'SELECT SLEEP(10)')
+    assert (query.phase, query.connection_id, query.sql) == (EXECUTING, 42, 'SELECT SLEEP(10)')
+
+    registry.cancel(query.id)
+    registry.cancel(query.id)
+    assert kills == [42, 42]
+    assert registry.stats()['cancelled'] == 1
+    # The killed connection is closed rather than pooled.
+    assert conn.release() is True
+    assert query.connection_id is None
+
+    registry.cancel(query.id)
+    assert kills == [42, 42]
+    registry.finish(query)
+    assert registry.cancel(query.id) is None
+
+
+def test_connection_released_without_a_cancel_goes_back_to_the_pool(registry, kills):
+    query = registry.start('shop', '/api/query', 'session-a')
+    conn = FakeConnection()
+    registry.executing(query, conn, 'SELECT 1')
+    assert conn.release() is False
+    registry.finish(query)
+    assert registry.stats()['running'] == 0
+    assert kills == []
+
+
+def test_failed_kill_is_counted():
+    def kill(connection_id):
+        raise RuntimeError('gone')
+    registry = QueryRegistry(kill=kill, check_interval=3600)
+    query = registry.start('shop', '/api/query', 'session-a')
+    registry.executing(query, FakeConnection(), 'SELECT 1')
+    registry.cancel(query.id)
+    assert registry.stats()['kill_errors'] == 1
+
+
+def test_watchdog_cancels_queries_past_their_deadline(kills):
+    registry = QueryRegistry(kill=kills.append, deadlines={'/api/query': 0.05}, check_interval=0.01)
+    query = registry.start('shop', '/api/query', 'session-a')
+    registry.executing(query, FakeConnection(), 'SELECT SLEEP(10)')
+    waited = time.monotonic()
+    while not kills and time.monotonic() - waited < 5:
+        time.sleep(0.01)
+    assert query.cancel_reason == 'deadline'
+    assert kills[0] == 42
+    assert str(QueryCancelled(query)) == 'Query cancelled after the 50 ms deadline for /api/query'
+
+
+def test_query_ids_are_validated(registry):
+    registry.start('shop', '/api/query', 'session-a', query_id='q-1')
+    with pytest.raises(ValueError):
+        registry.start('shop', '/api/query', 'session-a', query_id='q-1')
+    with pytest.raises(ValueError):
+        registry.start('shop', '/api/query', 'session-a', query_id='bad id')
+
+
+def test_parse_deadlines():
+    assert parse_deadlines('/api/query=60000, /api/table/<table_name>=1500,/x=0') == \
+        {'/api/query': 60.0, '/api/table/<table_name>': 1.5}
+    with pytest.raises(ValueError):
+        parse_deadlines('/api/query=soon')
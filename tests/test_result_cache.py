@@ -0,0 +1,89 @@
+import pytest
+
+from result_cache import (QueryResultCache, dependent_tables, is_cacheable, normalize_sql, referenced_tables)
+from schema_loader import DatabaseSchema, TableSchema
+
+
+def store(cache, sql, tables, db_name='shop'):
+    return cache.put(db_name, sql, tables, ['n'], '[[1]]', 1, cache.version(db_name))
+
+
+def test_lookup_ignores_whitespace_and_trailing_semicolon():
+    cache = QueryResultCache()
+    assert store(cache, "SELECT *  FROM orders\n WHERE note = 'a  b'", {'orders'})
+    assert cache.get('shop', "SELECT * FROM orders WHERE note = 'a  b';") is not None
+    assert cache.get('shop', "SELECT * FROM orders WHERE note = 'a b'") is None
+    assert cache.get('other', "SELECT * FROM orders WHERE note = 'a  b'") is None
+
+
+def test_invalidation_drops_only_results_that_read_the_table():
+    cache = QueryResultCache()
+    store(cache, 'SELECT * FROM orders', {'orders'})
+    store(cache, 'SELECT * FROM orders JOIN users USING (id)', {'orders', 'users'})
+    store(cache, 'SELECT * FROM products', {'products'})
+    store(cache, 'SELECT * FROM orders', {'orders'}, db_name='archive')
+
+    assert cache.invalidate('shop', ['Orders']) == 2
+    assert cache.get('shop', 'SELECT * FROM orders') is None
+    assert cache.get('shop', 'SELECT * FROM orders JOIN users USING (id)') is None
+    assert cache.get('shop', 'SELECT * FROM products') is not None
+    assert cache.get('archive', 'SELECT * FROM orders') is not None
+
+    assert cache.invalidate('shop') == 1
+    assert cache.stats()['entries'] == 1
+
+
+def test_result_that_raced_a_write_is_not_stored():
+    cache = QueryResultCache()
+    version = cache.version('shop')
+    collector = cache.collector('shop', 'SELECT * FROM orders', {'orders'}, version)
+    collector.add('[1]', 1)
+    # A write lands while the query is still streaming.
+    cache.invalidate('shop', ['orders'])
+    collector.add('[2]', 1)
+    collector.finish(['n'])
+    assert cache.get('shop', 'SELECT * FROM orders') is None
+    assert cache.stats()['stale'] == 1
+
+    collector = cache.collector('shop', 'SELECT * FROM orders', {'orders'}, cache.version('shop'))
+    collector.add('[1],[2]', 2)
+    collector.finish(['n'])
+    entry = cache.get('shop', 'SELECT * FROM orders')
+    assert (entry.rows_json, entry.row_count) == ('[[1],[2]]', 2)
+
+
+def test_least_recently_used_results_are_evicted_and_oversized_ones_skipped():
+    cache = QueryResultCache(max_bytes=700, max_entry_bytes=300)
+    for table in ('a', 'b', 'c'):
+        store(cache, f'SELECT * FROM {table}', {table})
+    cache.get('shop', 'SELECT * FROM a')
+    store(cache, 'SELECT * FROM d', {'d'})
+    assert cache.get('shop', 'SELECT * FROM b') is None
+    assert cache.get('shop', 'SELECT * FROM a') is not None
+    assert not cache.put('shop', 'SELECT * FROM e', {'e'}, ['n'], 'x' * 300, 1, cache.version('shop'))
+
+
+@pytest.mark.parametrize('sql, cacheable', [
+    ('SELECT * FROM orders', True),
+    ('WITH x AS (SELECT 1) SELECT * FROM x', True),
+    ("SELECT 'NOW()' FROM orders", True),
+    ('SELECT NOW()', False),
+    ('SELECT * FROM orders FOR UPDATE', False),
+    ('SELECT @total', False),
+    ('SELECT * FROM information_schema.tables', False),
+    ('SELECT 1; DELETE FROM orders', False),
+    ('SHOW TABLES', False),
+])
+def test_is_cacheable(sql, cacheable):
+    assert is_cacheable(sql) is cacheable
+
+
+def test_referenced_and_dependent_tables():
+    orders, items, users = TableSchema('orders'), TableSchema('order_items'), TableSchema('users')
+    orders.foreign_keys.append(('user_id', 'users', 'id'))
+    items.foreign_keys.append(('order_id', 'orders', 'id'))
+    schema = DatabaseSchema('shop', None, {t.name: t for t in (orders, items, users)})
+
+    assert referenced_tables("SELECT `Users`.id FROM users WHERE note = 'orders'", schema.table_names) == {'users'}
+    assert dependent_tables(schema, ['users']) == {'users', 'orders', 'order_items'}
+    assert normalize_sql('  SELECT 1 ;') == 'SELECT 1'
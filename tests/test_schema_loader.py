@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+
+import tracing
+from schema_loader import FINGERPRINT_SQL, SchemaCache
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+        if sql == FINGERPRINT_SQL:
+            self.rows = [(1, '2024-01-01 00:00:00', 12345)]
+        elif 'information_schema.TABLES' in sql:
+            self.rows = [('users',)]
+        elif 'information_schema.COLUMNS' in sql:
+            self.rows = [('users', 'id', 'int', 'NO', 'PRI', None, 'auto_increment'),
+                         ('users', 'name', 'varchar(50)', 'YES', '', None, '')]
+        elif 'KEY_COLUMN_USAGE' in sql:
+            self.rows = [('users', 'id', 'PRIMARY', None, None)]
+        elif sql.startswith('SHOW CREATE TABLE'):
+            self.rows = [('users', 'CREATE TABLE `users` (...)')]
+        else:
+            self.rows = []
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+
+def make_cache():
+    conn = FakeConnection()
+
+    @contextmanager
+    def factory(db_name):
+        yield conn
+
+    return SchemaCache(factory), conn
+
+
+def test_get_loads_schema_through_the_cache():
+    cache, conn = make_cache()
+    schema = cache.get('x')
+    assert schema.table_names == ['users']
+    assert schema.tables['users'].column_names == ['id', 'name']
+    assert schema.tables['users'].primary_key == ['id']
+    assert cache.get('x') is schema
+    assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 1
+
+
+def test_create_statements_are_loaded_once():
+    cache, conn = make_cache()
+    assert cache.create_statements('x') == ['CREATE TABLE `users` (...)']
+    assert cache.create_statements('x') == ['CREATE TABLE `users` (...)']
+    assert sum(sql.startswith('SHOW CREATE TABLE') for sql in conn.statements) == 1
+
+
+def test_schema_load_is_traced():
+    cache, conn = make_cache()
+    trace = tracing.start('test')
+    try:
+        cache.get('x')
+    finally:
+        tracing.stop()
+    assert 'schema' in trace.snapshot()[0]
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+from sql_import import SqlStatementReader, coalesce_inserts, split_insert
+
+DUMP = """-- MySQL dump
+/*!40101 SET NAMES utf8mb4 */;
+CREATE TABLE `t;x` (id INT, name VARCHAR(20)); # trailing comment
+INSERT INTO `t;x` VALUES (1,'a;b'),(2,'it\\'s');
+INSERT INTO `t;x` VALUES (3,'café -- not a comment');
+SELECT 1--1;
+DELIMITER $$
+CREATE TRIGGER trg BEFORE INSERT ON `t;x` FOR EACH ROW BEGIN SET NEW.id = NEW.id + 1; END$$
+DELIMITER ;
+/* plain */ SELECT "a\\"b;";
+"""
+
+STATEMENTS = [
+    "/*!40101 SET NAMES utf8mb4 */",
+    "CREATE TABLE `t;x` (id INT, name VARCHAR(20))",
+    "INSERT INTO `t;x` VALUES (1,'a;b'),(2,'it\\'s')",
+    "INSERT INTO `t;x` VALUES (3,'café -- not a comment')",
+    "SELECT 1--1",
+    "CREATE TRIGGER trg BEFORE INSERT ON `t;x` FOR EACH ROW BEGIN SET NEW.id = NEW.id + 1; END",
+    'SELECT "a\\"b;"',
+]
+
+
+def read(text, chunk_size):
+    return list(SqlStatementReader(io.BytesIO(text.encode('utf-8')), chunk_size))
+
+
+def test_reader_splits_statements():
+    assert read(DUMP, 1 << 20) == STATEMENTS
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 24))
+def test_reader_is_independent_of_chunk_boundaries(chunk_size):
+    # Small chunks split quotes, comments, DELIMITER lines and multi-byte
+    # characters at every possible position.
+    assert read(DUMP, chunk_size) == STATEMENTS
+
+
+def test_reader_handles_multi_character_delimiter_at_end_of_input():
+    assert read("DELIMITER //\nSELECT 1//SELECT 2", 3) == ['SELECT 1', 'SELECT 2']
+
+
+def test_coalesce_merges_consecutive_inserts_into_the_same_table():
+    statements = [
+        "INSERT INTO t VALUES (1)",
+        "INSERT INTO t VALUES (2),(3)",
+        "INSERT INTO u VALUES (4)",
+        "DELETE FROM t",
+        "INSERT INTO t VALUES (5)",
+    ]
+    assert list(coalesce_inserts(statements)) == [
+        ("INSERT INTO t VALUES (1),(2),(3)", 2),
+        ("INSERT INTO u VALUES (4)", 1),
+        ("DELETE FROM t", 1),
+        ("INSERT INTO t VALUES (5)", 1),
+    ]
+
+
+def test_coalesce_respects_the_batch_size():
+    statements = [f"INSERT INTO t VALUES ({i})" for i in range(5)]
+    batches = list(coalesce_inserts(statements, max_bytes=len("INSERT INTO t VALUES (0),(1)")))
+    assert [count for _, count in batches] == [2, 2, 1]
+    assert all(len(sql) <= len("INSERT INTO t VALUES (0),(1)") for sql, _ in batches)
+
+
+def test_inserts_that_cannot_be_merged():
+    assert split_insert("INSERT INTO t VALUES (1) ON DUPLICATE KEY UPDATE a = 1") is None
+    assert split_insert("INSERT INTO t SELECT * FROM u") is None
+    assert split_insert("INSERT INTO t (a, b) VALUES (1, 2)") == ("INSERT INTO t (a, b) VALUES", "(1, 2)")
@@ -0,0 +1,32 @@
+import pytest
+
+import sql_validator
+from schema_loader import DatabaseSchema, TableSchema
+
+pytestmark = pytest.mark.skipif(not sql_validator.available(), reason='sqlglot is not installed')
+
+
+def make_schema():
+    users = TableSchema('users')
+    users.columns = [{'Field': 'id'}, {'Field': 'name'}]
+    return DatabaseSchema('shop', None, {'users': users})
+
+
+def kinds(sql):
+    return [(issue['kind'], issue['name']) for issue in sql_validator.validate_sql(sql, make_schema(), 'shop')]
+
+
+def test_unknown_tables_and_columns_are_reported():
+    assert kinds('SELECT nam FROM users') == [('unknown_column', 'nam')]
+    assert kinds('SELECT * FROM user') == [('unknown_table', 'user')]
+
+
+def test_create_and_drop_targets_are_not_unknown_tables():
+    assert kinds('CREATE TABLE orders (id INT, user_id INT)') == []
+    assert kinds('CREATE TABLE archive AS SELECT id FROM users') == []
+    assert kinds('DROP TABLE IF EXISTS orders, archive') == []
+    assert kinds('CREATE TABLE copy AS SELECT * FROM user') == [('unknown_table', 'user')]
+
+
+def test_tables_created_earlier_in_the_batch_are_known():
+    assert kinds('CREATE TABLE orders (id INT); INSERT INTO orders (id) VALUES (1)') == []
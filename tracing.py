@@ -0,0 +1,130 @@
+"""Per-request phase timing: spans, database round trips and Server-Timing headers."""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Phases reported for every request, in Server-Timing order.
+PHASES = ('connect', 'schema', 'llm', 'execute', 'fetch', 'serialize')
+
+_current = contextvars.ContextVar('trace', default=None)
+# Whether a span is open in this thread/context. Nested spans belong to the
+# outermost one (a schema load's connect and queries are schema time), so
+# phases never overlap; their round trips are still counted.
+_in_span = contextvars.ContextVar('in_span', default=False)
+
+
+class Trace:
+    # Time per phase and database round trips for one request. Snapshot
+    # workers record into their request's trace from other threads, hence
+    # the lock.
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.phases = {}            # phase -> [seconds, spans]
+        self.round_trips = 0
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds, round_trips=0):
+        with self._lock:
+            entry = self.phases.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+            self.round_trips += round_trips
+
+    @contextmanager
+    def span(self, phase, round_trip=False):
+        if _in_span.get():
+            if round_trip:
+                with self._lock:
+                    self.round_trips += 1
+            yield
+            return
+        token = _in_span.set(True)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            _in_span.reset(token)
+            self.add(phase, time.perf_counter() - started, 1 if round_trip else 0)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def snapshot(self):
+        with self._lock:
+            return {phase: tuple(entry) for phase, entry in self.phases.items()}, self.round_trips
+
+    def server_timing(self):
+        # e.g. 'connect;dur=0.4, llm;dur=812.3, execute;dur=5.1, db;desc="round trips: 3", total;dur=830.2'
+        phases, round_trips = self.snapshot()
+        parts = [f"{phase};dur={phases[phase][0] * 1000:.1f}" for phase in PHASES if phase in phases]
+        parts += [f"{phase};dur={seconds * 1000:.1f}" for phase, (seconds, _) in phases.items() if phase not in PHASES]
+        parts.append(f'db;desc="round trips: {round_trips}"')
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ', '.join(parts)
+
+
+def start(name):
+    trace = Trace(name)
+    _current.set(trace)
+    return trace
+
+
+def stop():
+    _current.set(None)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def span(phase, round_trip=False, trace=None):
+    # Times the block as `phase` of `trace` (default: the current request's);
+    # outside a request it does nothing.
+    trace = trace or _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(phase, round_trip):
+        yield
+
+
+class TracedCursor:
+    # Wraps a mysql.connector cursor so statement execution and row fetching
+    # are timed as execute / fetch spans of the trace it was created under.
+    def __init__(self, cursor, trace):
+        self._cursor = cursor
+        self._trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, *args, **kwargs):
+        with self._trace.span('execute', round_trip=True):
+            return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        with self._trace.span('execute', round_trip=True):
+            return self._cursor.executemany(*args, **kwargs)
+
+    def fetchone(self):
+        with self._trace.span('fetch'):
+            return self._cursor.fetchone()
+
+    def fetchmany(self, *args, **kwargs):
+        with self._trace.span('fetch'):
+            return self._cursor.fetchmany(*args, **kwargs)
+
+    def fetchall(self):
+        with self._trace.span('fetch'):
+            return self._cursor.fetchall()
+
+
+def traced_cursor(cursor):
+    trace = _current.get()
+    return cursor if trace is None else TracedCursor(cursor, trace)